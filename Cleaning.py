@@ -1,41 +1,281 @@
+import argparse
+import os
+import tempfile
+import numpy as np
 import pandas as pd
+from sketches import KLLSketch
 
-# Load data
-file_path = 'path_to_your_file.csv'  # Update with your actual file path
-df = pd.read_csv(r"C:\Users\sande\.cache\kagglehub\datasets\iveeaten3223times\massive-yahoo-finance-dataset\versions\2\stock_details_5_years.csv")
-
-# Display column names
-print("Original Columns:")
-print(df.columns)
-
-# Cleaning column names
-df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('[^a-zA-Z0-9_]', '')
-print("\nCleaned Columns:")
-print(df.columns)
-
-# Handling missing values
-print("\nMissing Values Before Cleaning:")
-print(df.isnull().sum())
-df = df.dropna()  # Remove rows with missing values
-
-# Convert date column if present
-if 'date' in df.columns:
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df = df.dropna(subset=['date'])
-
-# Removing duplicates
-df = df.drop_duplicates()
-
-# Handling outliers using IQR method
-numeric_cols = df.select_dtypes(include=['float64', 'int64']).columns
-for col in numeric_cols:
-    Q1 = df[col].quantile(0.25)
-    Q3 = df[col].quantile(0.75)
+# Raw Kaggle export (iveeaten3223times/massive-yahoo-finance-dataset)
+RAW_DATA_PATH = r"C:\Users\sande\.cache\kagglehub\datasets\iveeaten3223times\massive-yahoo-finance-dataset\versions\2\stock_details_5_years.csv"
+
+# Row hashes are spilled to 2**HASH_PARTITION_BITS files, split by their top bits
+HASH_PARTITION_BITS = 6
+
+# A spilled row: its hash and its number among the rows of the file
+_SPILL_DTYPE = np.dtype([('hash', '<u8'), ('row', '<u8')])
+
+def clean_column_names(df):
+    """
+    Normalise column names to lower_snake_case.
+
+    Args:
+        df (pd.DataFrame): Raw data
+
+    Returns:
+        pd.DataFrame: Data with cleaned column names
+    """
+    df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_').str.replace('[^a-zA-Z0-9_]', '')
+    return df
+
+def clean_dataframe(df):
+    """
+    Clean the full dataset in memory.
+
+    Args:
+        df (pd.DataFrame): Raw data
+
+    Returns:
+        pd.DataFrame: Cleaned data
+    """
+    # Display column names
+    print("Original Columns:")
+    print(df.columns)
+
+    # Cleaning column names
+    df = clean_column_names(df)
+    print("\nCleaned Columns:")
+    print(df.columns)
+
+    # Handling missing values
+    print("\nMissing Values Before Cleaning:")
+    print(df.isnull().sum())
+    df = df.dropna()  # Remove rows with missing values
+
+    # Convert date column if present; in UTC, like `clean_streaming`
+    if 'date' in df.columns:
+        df['date'] = pd.to_datetime(df['date'], errors='coerce', utc=True)
+        df = df.dropna(subset=['date'])
+
+    # Removing duplicates
+    df = df.drop_duplicates()
+
+    # Handling outliers using per-company IQR bounds, applied as one mask
+    numeric_cols = list(df.select_dtypes(include=['float64', 'int64']).columns)
+    keep, removed = iqr_outlier_mask(df, numeric_cols)
+    df = df[keep]
+    print("\nRows Outside IQR Bounds per Column:")
+    print(removed)
+    print("Rows Removed as Outliers:", int((~keep).sum()))
+
+    print("\nData Cleaning Complete. Final Data Shape:", df.shape)
+    return df
+
+def _group_keys(df, by):
+    return df[by] if by in df.columns else pd.Series(0, index=df.index, name=by)
+
+def iqr_outlier_mask(df, columns, by='company', quartiles=None):
+    """
+    Flag rows outside the 1.5 * IQR fences of their group, for all columns at once.
+
+    The quartiles of every column are computed in one grouped pass (per
+    company, so cheap and expensive tickers are judged against their own
+    history) and broadcast back to the rows, giving one boolean mask that
+    does not depend on column order.
+
+    Args:
+        df (pd.DataFrame): Data to check
+        columns (list): Numeric columns to check
+        by (str): Grouping column; the whole frame is one group if absent
+        quartiles (pd.DataFrame): Optional precomputed quartiles indexed by
+            (group, quantile) with quantile levels 0.25 and 0.75
+
+    Returns:
+        tuple: Boolean keep-mask (np.ndarray) and a dict of rows outside the
+            bounds per column (a row can break several rules)
+    """
+    keys = _group_keys(df, by)
+    if quartiles is None:
+        quartiles = df[columns].groupby(keys).quantile([0.25, 0.75])
+    Q1 = quartiles.xs(0.25, level=-1)[columns].reindex(keys).to_numpy()
+    Q3 = quartiles.xs(0.75, level=-1)[columns].reindex(keys).to_numpy()
     IQR = Q3 - Q1
-    df = df[(df[col] >= (Q1 - 1.5 * IQR)) & (df[col] <= (Q3 + 1.5 * IQR))]
+    values = df[columns].to_numpy(dtype='float64')
+    inside = (values >= Q1 - 1.5 * IQR) & (values <= Q3 + 1.5 * IQR)
+    removed = dict(zip(columns, (~inside).sum(axis=0).tolist()))
+    return inside.all(axis=1), removed
+
+def _prepare_chunk(chunk):
+    chunk = clean_column_names(chunk).dropna()
+    if 'date' in chunk.columns:
+        # UTC keeps the column type identical across chunks
+        chunk = chunk.assign(date=pd.to_datetime(chunk['date'], errors='coerce', utc=True))
+        chunk = chunk.dropna(subset=['date'])
+    return chunk
+
+def _row_hashes(chunk, numeric_cols):
+    # Numeric columns are hashed as floats, so a repeated row matches even
+    # if its chunk parsed the column as integers and another as floats
+    return pd.util.hash_pandas_object(chunk.astype(dict.fromkeys(numeric_cols, 'float64')), index=False).to_numpy()
+
+def _spill_hashes(row_hashes, first_row, paths):
+    # Append each (hash, row number) to the partition file of the hash's top bits
+    records = np.empty(len(row_hashes), dtype=_SPILL_DTYPE)
+    records['hash'] = row_hashes
+    records['row'] = np.arange(first_row, first_row + len(row_hashes), dtype=np.uint64)
+    records.sort(order='hash')
+    partitions = records['hash'] >> np.uint64(64 - HASH_PARTITION_BITS)
+    bounds = np.searchsorted(partitions, np.arange(1, len(paths), dtype=np.uint64))
+    for path, part in zip(paths, np.split(records, bounds)):
+        if len(part):
+            with open(path, 'ab') as spill:
+                part.tofile(spill)
+
+def _write_repeated_rows(spill_path, repeated_path):
+    # Within one partition, the rows whose hash already appeared on an
+    # earlier row, written in row order; False if there are none
+    records = np.fromfile(spill_path, dtype=_SPILL_DTYPE)
+    records.sort(order=['hash', 'row'])
+    repeated = np.sort(records['row'][1:][records['hash'][1:] == records['hash'][:-1]])
+    if not len(repeated):
+        return False
+    repeated.tofile(repeated_path)
+    return True
+
+def _rows_in(repeated, first_row, n_rows):
+    # Positions within a chunk of the repeated rows it holds, merged over
+    # the sorted per-partition row files
+    first_row, end_row = np.uint64(first_row), np.uint64(first_row + n_rows)
+    return np.concatenate([
+        rows[np.searchsorted(rows, first_row):np.searchsorted(rows, end_row)] - first_row
+        for rows in repeated
+    ] + [np.empty(0, dtype=np.uint64)]).astype(np.int64)
+
+def clean_streaming(input_path, output_path, chunksize=250_000, output_format='csv'):
+    """
+    Clean a CSV of any size in two chunked passes with bounded memory.
+
+    Pass 1 feeds every numeric column of every company into a mergeable
+    KLL quantile sketch and spills a 64-bit hash and the row number of
+    every row to temporary files, partitioned by the hash's top bits.
+    Each partition is then sorted on its own, so only 1/64 of the hashes
+    is in memory at once, and the numbers of the rows repeating an earlier
+    row are written to one sorted file per partition. Pass 2 re-reads the
+    file, drops those rows (looked up in the memory-mapped row files) and
+    per-company IQR outliers (see `iqr_outlier_mask`), and appends each
+    filtered chunk to the output. Besides one chunk, the only state held
+    in memory is the sketches (a few KB per company and column).
+    Duplicates are still counted in the sketches.
+
+    The output matches `clean_dataframe`, with dates in UTC, except that
+    the outlier fences come from the sketches' quartiles.
+
+    Parquet output is written with one schema for every chunk: columns
+    whose type differs between chunks (e.g. integers in one, floats in
+    another) take the widest type seen in pass 1.
+
+    Args:
+        input_path (str): Raw CSV file
+        output_path (str): Destination file
+        chunksize (int): Rows read per chunk
+        output_format (str): 'csv' or 'parquet'
+
+    Returns:
+        int: Number of rows written
+    """
+    if output_format == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+    numeric_cols = None
+    sketches = {}
+    schema = None
+    rows_written = 0
+    writer = None
+    with tempfile.TemporaryDirectory() as spill_dir:
+        # Pass 1: per-company quantile sketches, row hashes and the output schema
+        spill_paths = [os.path.join(spill_dir, f"hashes-{i:03d}.bin") for i in range(1 << HASH_PARTITION_BITS)]
+        first_row = 0
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            chunk = _prepare_chunk(chunk)
+            if numeric_cols is None:
+                numeric_cols = list(chunk.select_dtypes(include=['float64', 'int64']).columns)
+            for key, group in chunk[numeric_cols].groupby(_group_keys(chunk, 'company')):
+                for col in numeric_cols:
+                    sketches.setdefault((key, col), KLLSketch(seed=0)).update(group[col].to_numpy())
+            _spill_hashes(_row_hashes(chunk, numeric_cols), first_row, spill_paths)
+            first_row += len(chunk)
+            if output_format == 'parquet':
+                chunk_schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                schema = chunk_schema if schema is None else pa.unify_schemas([schema, chunk_schema], promote_options='permissive')
+
+        # Duplicates, found one partition at a time
+        repeated = []
+        for spill_path in filter(os.path.exists, spill_paths):
+            repeated_path = spill_path.replace('hashes-', 'repeated-')
+            if _write_repeated_rows(spill_path, repeated_path):
+                repeated.append(np.memmap(repeated_path, dtype=np.uint64, mode='r'))
+            os.remove(spill_path)
+
+        quartiles = pd.Series(
+            {(key, col, q): value
+             for (key, col), sketch in sketches.items()
+             for q, value in zip([0.25, 0.75], sketch.quantiles([0.25, 0.75]))}
+        ).unstack(level=1)
+        del sketches
+
+        # Pass 2: filter and write incrementally
+        removed = dict.fromkeys(numeric_cols or [], 0)
+        first_row = 0
+        for chunk in pd.read_csv(input_path, chunksize=chunksize):
+            chunk = _prepare_chunk(chunk)
+            keep = np.ones(len(chunk), dtype=bool)
+            keep[_rows_in(repeated, first_row, len(chunk))] = False
+            first_row += len(chunk)
+            inside, chunk_removed = iqr_outlier_mask(chunk, numeric_cols, quartiles=quartiles)
+            keep &= inside
+            for col, count in chunk_removed.items():
+                removed[col] += count
+            chunk = chunk[keep]
+
+            if output_format == 'parquet':
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            else:
+                chunk.to_csv(output_path, mode='w' if rows_written == 0 else 'a', header=rows_written == 0, index=False)
+            rows_written += len(chunk)
+
+        # Unmap the row files so the directory can be removed
+        del repeated
+
+    if writer is not None:
+        writer.close()
+
+    print("\nRows Outside IQR Bounds per Column:")
+    print(removed)
+    print("\nStreaming Cleaning Complete. Rows written:", rows_written)
+    return rows_written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Clean the raw stock details CSV.")
+    parser.add_argument('input', nargs='?', default=RAW_DATA_PATH, help="Raw CSV file")
+    parser.add_argument('--streaming', action='store_true', help="Clean in chunks with bounded memory")
+    parser.add_argument('--chunksize', type=int, default=250_000, help="Rows per chunk in streaming mode")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help="Output format in streaming mode")
+    args = parser.parse_args()
+
+    if args.streaming:
+        output_path = f"cleaned_data.{args.format}"
+        clean_streaming(args.input, output_path, args.chunksize, args.format)
+        print(f"Cleaned data saved to {output_path}")
+    else:
+        # Load data
+        df = clean_dataframe(pd.read_csv(args.input))
 
-print("\nData Cleaning Complete. Final Data Shape:", df.shape)
+        # Save cleaned data
+        df.to_csv('cleaned_data.csv', index=False)
+        print("Cleaned data saved to cleaned_data.csv")
 
-# Save cleaned data
-df.to_csv('cleaned_data.csv', index=False)
-print("Cleaned data saved to cleaned_data.csv")
+        # Columnar copy served by the local query backend (STOCK_BACKEND=local)
+        df.to_parquet('cleaned_data.parquet', index=False)
+        print("Cleaned data saved to cleaned_data.parquet")
@@ -1,8 +1,5 @@
 import streamlit as st
-from google.cloud import bigquery
-
-# Set up BigQuery client
-client = bigquery.Client()
+from volume_index import top_companies_by_volume
 
 # Streamlit app
 st.title("Top 10 Companies by Trading Volume")
@@ -12,16 +9,8 @@ start_date = st.date_input("Start Date")
 end_date = st.date_input("End Date")
 
 if st.button("Get Data"):
-    query = f"""
-    SELECT company, SUM(volume) AS total_volume
-    FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
-    WHERE date BETWEEN TIMESTAMP('{start_date}') AND TIMESTAMP('{end_date}')
-    GROUP BY company
-    ORDER BY total_volume DESC
-    LIMIT 10;
-    """
-    query_job = client.query(query)
-    results = query_job.to_dataframe()
+    # Answered from the in-memory prefix-sum volume index (see volume_index.py)
+    results = top_companies_by_volume(start_date, end_date, k=10)
 
     # Display results
     st.write(results)
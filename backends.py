@@ -0,0 +1,279 @@
+import glob
+import os
+import re
+import queue
+import datetime
+import threading
+from contextlib import contextmanager
+from config import BACKEND, DISK_CACHE, PARQUET_PATH, POOL_SIZE, STOCK_TABLE, logger
+from disk_cache import DiskCachedBackend, disk_cache
+from instrumentation import result_size, span
+
+class BigQueryBackend:
+    """
+    Run queries against the hosted `stock_details` table in BigQuery.
+
+    The client is thread-safe and pools its HTTPS connections (see
+    `config.setup_bigquery_client`), so one instance serves every thread.
+    """
+    name = 'bigquery'
+
+    def __init__(self, client=None):
+        if client is None:
+            from config import get_bigquery_client
+            client = get_bigquery_client()
+        self.client = client
+
+    def query(self, sql, **params):
+        """
+        Run a BigQuery Standard SQL query with named parameters.
+
+        Args:
+            sql (str): Query text using `@name` parameter markers
+            **params: Parameter values; lists bind as STRING arrays, dates as
+                DATE, ints as INT64, floats as FLOAT64 and strings as STRING
+
+        Returns:
+            pd.DataFrame: Query result
+        """
+        from google.cloud import bigquery
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[_bigquery_parameter(name, value) for name, value in params.items()]
+        )
+        with span('query', backend=self.name) as record:
+            job = self.client.query(sql, job_config=job_config)
+            df = job.to_dataframe()
+            record['rows'], record['result_bytes'] = result_size(df)
+            record['bytes_processed'] = job.total_bytes_processed
+            return df
+
+    def query_batches(self, sql, batch_rows=100_000, **params):
+        """
+        Run a query and stream its result page by page.
+
+        Args:
+            sql (str): Query text using `@name` parameter markers
+            batch_rows (int): Rows per result page
+            **params: Parameter values, bound as in `query`
+
+        Yields:
+            pyarrow.RecordBatch: Consecutive slices of the result
+        """
+        from google.cloud import bigquery
+        job_config = bigquery.QueryJobConfig(
+            query_parameters=[_bigquery_parameter(name, value) for name, value in params.items()]
+        )
+        job = self.client.query(sql, job_config=job_config)
+        yield from job.result(page_size=batch_rows).to_arrow_iterable()
+
+    def table_version(self, table=STOCK_TABLE):
+        """
+        Identify the current contents of the table from its metadata, without
+        a query: any load, DML statement or streaming insert changes it.
+
+        Returns:
+            str: Last modification time, row count and rows in the streaming buffer
+        """
+        metadata = self.client.get_table(table.strip('`'))
+        buffered = metadata.streaming_buffer.estimated_rows if metadata.streaming_buffer else 0
+        return f"{metadata.modified.isoformat()}/{metadata.num_rows}/{buffered}"
+
+class LocalBackend:
+    """
+    Run the same queries locally with DuckDB over a Parquet copy of the
+    cleaned dataset, exposed under the view name `stock_details`.
+
+    Queries run on pooled cursors (independent connections to the same
+    in-memory database), so concurrent callers never share statement state
+    and do not pay for a new connection per query.
+    """
+    name = 'local'
+
+    def __init__(self, parquet_path=PARQUET_PATH, pool_size=POOL_SIZE):
+        import duckdb
+        self.parquet_path = parquet_path
+        self._con = duckdb.connect(database=':memory:')
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._set_time_zone(self._con)
+        self._sources = None
+        self._view_lock = threading.Lock()
+        self._refresh_view()
+
+    def _refresh_view(self):
+        # A single file gains a directory of delta parts on its first load
+        # (see `parquet_sources`); point the view at it once it appears
+        sources = parquet_sources(self.parquet_path)
+        if sources != self._sources:
+            with self._view_lock:
+                if sources != self._sources:
+                    self._con.execute(f"CREATE OR REPLACE VIEW stock_details AS SELECT * FROM {read_parquet_sql(sources)}")
+                    self._sources = sources
+
+    @staticmethod
+    def _set_time_zone(con):
+        try:
+            # BigQuery evaluates DATE(timestamp) in UTC; match it locally
+            con.execute("SET TimeZone = 'UTC'")
+        except Exception as e:
+            logger.warning(f"Could not set DuckDB time zone to UTC: {e}")
+
+    @contextmanager
+    def _cursor(self):
+        try:
+            cursor = self._pool.get_nowait()
+        except queue.Empty:
+            cursor = self._con.cursor()
+            self._set_time_zone(cursor)
+        try:
+            yield cursor
+        finally:
+            try:
+                self._pool.put_nowait(cursor)
+            except queue.Full:
+                cursor.close()
+
+    def query(self, sql, **params):
+        """
+        Translate a BigQuery Standard SQL query to DuckDB and run it.
+
+        Args:
+            sql (str): Query text using `@name` parameter markers
+            **params: Parameter values
+
+        Returns:
+            pd.DataFrame: Query result
+        """
+        self._refresh_view()
+        with self._cursor() as cursor, span('query', backend=self.name) as record:
+            df = cursor.execute(translate_sql(sql), params).df()
+            record['rows'], record['result_bytes'] = result_size(df)
+            return df
+
+    def query_batches(self, sql, batch_rows=100_000, **params):
+        """
+        Translate a query to DuckDB and stream its result in Arrow batches.
+
+        The pooled cursor is held until the result is exhausted.
+
+        Args:
+            sql (str): Query text using `@name` parameter markers
+            batch_rows (int): Rows per batch
+            **params: Parameter values
+
+        Yields:
+            pyarrow.RecordBatch: Consecutive slices of the result
+        """
+        self._refresh_view()
+        with self._cursor() as cursor:
+            yield from cursor.execute(translate_sql(sql), params).fetch_record_batch(batch_rows)
+
+    def table_version(self):
+        """
+        Identify the current contents of the Parquet files behind the view.
+
+        Returns:
+            str: Name, size and modification time of every file
+        """
+        files = sorted(path for source in parquet_sources(self.parquet_path) for path in glob.glob(source))
+        return ";".join(f"{path}:{os.path.getsize(path)}:{os.path.getmtime(path)}" for path in files)
+
+def delta_directory(path):
+    """
+    Returns:
+        str: Directory of the part files loaded on top of a single Parquet file
+    """
+    return f"{path}.parts"
+
+def parquet_sources(path):
+    """
+    List the files and globs that make up the local `stock_details` table.
+
+    A directory is a dataset of part files written by loader.py. A single
+    file (such as the `cleaned_data.parquet` Cleaning.py writes) is read
+    together with its directory of delta parts, once loader.py has made one.
+
+    Args:
+        path (str): `config.PARQUET_PATH` or a loader location
+
+    Returns:
+        list: Paths and globs for DuckDB's `read_parquet`
+    """
+    if os.path.isdir(path):
+        return [os.path.join(path, '*.parquet')]
+    parts = delta_directory(path)
+    return [path, os.path.join(parts, '*.parquet')] if os.path.isdir(parts) else [path]
+
+def read_parquet_sql(sources):
+    """
+    Returns:
+        str: DuckDB table function reading `sources` as one table
+    """
+    # DDL statements cannot take prepared parameters, so quote the paths inline
+    quoted = ", ".join("'" + source.replace("'", "''") + "'" for source in sources)
+    return f"read_parquet([{quoted}], union_by_name = true)"
+
+# BigQuery-isms used in the app's queries and their DuckDB equivalents
+_SQL_REWRITES = [
+    (re.compile(r"`[^`]*\.stock_details`"), "stock_details"),
+    (re.compile(r"APPROX_QUANTILES\((.+?), 2\)\[OFFSET\(1\)\]"), r"MEDIAN(\1)"),
+    (re.compile(r"APPROX_QUANTILES\((.+?), 100\)\[OFFSET\((\d+)\)\]"), r"QUANTILE_DISC(\1, \2 / 100)"),
+    (re.compile(r"\bIN UNNEST\(@(\w+)\)"), r"IN (SELECT UNNEST($\1))"),
+    (re.compile(r"ARRAY_AGG\((.+?) IGNORE NULLS ORDER BY (.+?) DESC LIMIT 1\)\[OFFSET\(0\)\]"), r"ARG_MAX(\1, \2)"),
+    (re.compile(r"ARRAY_AGG\((.+?) IGNORE NULLS ORDER BY (.+?) LIMIT 1\)\[OFFSET\(0\)\]"), r"ARG_MIN(\1, \2)"),
+    (re.compile(r"DATE_TRUNC\((.+?), ISOWEEK\)"), r"CAST(DATE_TRUNC('WEEK', \1) AS DATE)"),
+    (re.compile(r"DATE_TRUNC\((.+?), (WEEK|MONTH|QUARTER|YEAR)\)"), r"CAST(DATE_TRUNC('\2', \1) AS DATE)"),
+    (re.compile(r"\bFLOAT64\b"), "DOUBLE"),
+    (re.compile(r"\bINT64\b"), "BIGINT"),
+    (re.compile(r"@(\w+)"), r"$\1"),
+]
+
+def translate_sql(sql):
+    """
+    Rewrite the BigQuery-specific syntax used by this app into DuckDB SQL.
+
+    Args:
+        sql (str): BigQuery Standard SQL query
+
+    Returns:
+        str: Equivalent DuckDB query
+    """
+    for pattern, replacement in _SQL_REWRITES:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+def _bigquery_parameter(name, value):
+    from google.cloud import bigquery
+    if isinstance(value, (list, tuple)):
+        return bigquery.ArrayQueryParameter(name, "STRING", list(value))
+    if isinstance(value, datetime.date):
+        return bigquery.ScalarQueryParameter(name, "DATE", value)
+    if isinstance(value, bool):
+        return bigquery.ScalarQueryParameter(name, "BOOL", value)
+    if isinstance(value, int):
+        return bigquery.ScalarQueryParameter(name, "INT64", value)
+    if isinstance(value, float):
+        return bigquery.ScalarQueryParameter(name, "FLOAT64", value)
+    return bigquery.ScalarQueryParameter(name, "STRING", value)
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def get_backend():
+    """
+    Return the process-wide query backend selected by `config.BACKEND`,
+    wrapped in the persistent result cache when `config.DISK_CACHE` is on
+    (the default for BigQuery only).
+
+    Returns:
+        BigQueryBackend | LocalBackend | DiskCachedBackend: Configured backend
+    """
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_cls = {'bigquery': BigQueryBackend, 'local': LocalBackend}[BACKEND]
+                logger.info(f"Initializing {BACKEND} query backend")
+                _backend = backend_cls()
+                if DISK_CACHE:
+                    _backend = DiskCachedBackend(_backend, disk_cache)
+    return _backend
@@ -0,0 +1,244 @@
+"""
+Headless batch generation of Quick Stats CSVs and chart HTMLs.
+
+A job spec lists company groups, date ranges and metrics; every
+(group, range) pair becomes one task that writes the group's stats CSV and
+one chart per metric and chart type. The daily rows of every group over
+every range are fetched once, written as a memory-mapped Arrow file and
+shared by a pool of worker processes, so the run scales with the number
+of cores without querying the backend again. Finished tasks are appended
+to a progress file; re-running the same spec resumes after them.
+
+Example spec:
+    {
+        "output_dir": "reports",
+        "groups": {"banks": ["JPM", "BAC", "C"], "all": "*"},
+        "ranges": [{"name": "2022", "start": "2022-01-01", "end": "2022-12-31"}],
+        "metrics": ["close", "volume"],
+        "chart_types": ["Line"],
+        "aggregation": "AVG"
+    }
+
+Usage:
+    python batch_reports.py spec.json --workers 8
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+METRIC_OPTIONS = {
+    'open': 'Opening Price',
+    'close': 'Closing Price',
+    'high': 'Highest Price',
+    'low': 'Lowest Price',
+    'volume': 'Trading Volume'
+}
+
+SHARED_ROWS_FILE = 'shared_rows.arrow'
+PROGRESS_FILE = 'progress.jsonl'
+
+def load_spec(path):
+    """
+    Read and validate a job spec.
+
+    Args:
+        path (str): JSON job spec
+
+    Returns:
+        dict: Spec with parsed dates and defaults filled in
+    """
+    with open(path) as spec_file:
+        spec = json.load(spec_file)
+    spec.setdefault('output_dir', 'reports')
+    spec.setdefault('metrics', ['close'])
+    spec.setdefault('chart_types', ['Line'])
+    spec.setdefault('aggregation', 'AVG')
+    for metric in spec['metrics']:
+        if metric not in METRIC_OPTIONS:
+            raise ValueError(f"Unknown metric: {metric}")
+    for chart_type in spec['chart_types']:
+        if chart_type not in ('Bar', 'Line', 'Area', 'Candlestick'):
+            raise ValueError(f"Unknown chart type: {chart_type}")
+    for date_range in spec['ranges']:
+        date_range['start'] = datetime.date.fromisoformat(date_range['start'])
+        date_range['end'] = datetime.date.fromisoformat(date_range['end'])
+        date_range.setdefault('name', f"{date_range['start']}_{date_range['end']}")
+    return spec
+
+def _slug(text):
+    return re.sub(r'[^A-Za-z0-9_.-]+', '_', str(text))
+
+def build_tasks(spec, all_companies):
+    """
+    Expand a spec into one task per (company group, date range).
+
+    Args:
+        spec (dict): Output of `load_spec`
+        all_companies (list): Companies substituted for the group "*"
+
+    Returns:
+        list: Task dicts with an `id`, companies, dates and output directory
+    """
+    tasks = []
+    for group, companies in spec['groups'].items():
+        companies = list(all_companies) if companies == '*' else list(companies)
+        for date_range in spec['ranges']:
+            tasks.append({
+                'id': f"{_slug(group)}/{_slug(date_range['name'])}",
+                'companies': companies,
+                'start_date': date_range['start'],
+                'end_date': date_range['end'],
+                'output_dir': os.path.join(spec['output_dir'], _slug(group), _slug(date_range['name'])),
+                'metrics': spec['metrics'],
+                'chart_types': spec['chart_types'],
+                'aggregation': spec['aggregation']
+            })
+    return tasks
+
+def fetch_shared_rows(tasks, path):
+    """
+    Fetch the daily rows every task needs once and save them for the workers.
+
+    Args:
+        tasks (list): Output of `build_tasks`
+        path (str): Arrow IPC file to write
+
+    Returns:
+        int: Number of rows shared
+    """
+    import pyarrow as pa
+    from database import fetch_daily_rows
+
+    companies = sorted({company for task in tasks for company in task['companies']})
+    start_date = min(task['start_date'] for task in tasks)
+    end_date = max(task['end_date'] for task in tasks)
+    rows = fetch_daily_rows(companies, start_date, end_date)
+    if rows.empty:
+        raise RuntimeError("No rows fetched for the job spec; check the backend and the spec")
+
+    # Dictionary-encoded companies keep each worker's copy small
+    table = pa.Table.from_pandas(rows.assign(company=rows['company'].astype('category')), preserve_index=False)
+    with pa.OSFile(path + '.tmp', 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(path + '.tmp', path)
+    return len(rows)
+
+# Shared rows of the current worker process
+_rows = None
+
+def _init_worker(shared_path):
+    import pyarrow as pa
+    global _rows
+    with pa.memory_map(shared_path, 'r') as source:
+        _rows = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+def _task_rows(task):
+    import pandas as pd
+    mask = _rows['company'].isin(task['companies']) & _rows['date'].between(
+        pd.Timestamp(task['start_date'], tz='UTC'), pd.Timestamp(task['end_date'], tz='UTC')
+    )
+    rows = _rows[mask]
+    return rows.assign(company=rows['company'].astype(str)).reset_index(drop=True)
+
+def run_task(task):
+    """
+    Write one task's stats CSV and charts (runs in a worker process).
+
+    Args:
+        task (dict): One entry of `build_tasks`
+
+    Returns:
+        dict: Task id, files written and elapsed seconds
+    """
+    from page_data import derive_main_frame, derive_stats
+    from visualization import plot_main_chart
+
+    started = time.perf_counter()
+    os.makedirs(task['output_dir'], exist_ok=True)
+    rows = _task_rows(task)
+    files = []
+    if rows.empty:
+        return {'id': task['id'], 'files': files, 'seconds': time.perf_counter() - started}
+
+    stats_path = os.path.join(task['output_dir'], 'stats.csv')
+    derive_stats(rows).to_csv(stats_path, index=False)
+    files.append(stats_path)
+
+    for metric in task['metrics']:
+        for chart_type in task['chart_types']:
+            df = derive_main_frame(rows, metric, task['aggregation'], chart_type)
+            fig = plot_main_chart(df, chart_type, metric, task['aggregation'], METRIC_OPTIONS)
+            chart_path = os.path.join(task['output_dir'], f"{metric}_{chart_type.lower()}.html")
+            fig.write_html(chart_path, include_plotlyjs='cdn')
+            files.append(chart_path)
+
+    return {'id': task['id'], 'files': files, 'seconds': time.perf_counter() - started}
+
+def _completed_tasks(progress_path):
+    if not os.path.exists(progress_path):
+        return set()
+    with open(progress_path) as progress_file:
+        return {json.loads(line)['id'] for line in progress_file if line.strip()}
+
+def run_batch(spec, workers=None, restart=False):
+    """
+    Run every task of a spec across a process pool.
+
+    Args:
+        spec (dict): Output of `load_spec`
+        workers (int): Worker processes (default: one per core)
+        restart (bool): Ignore the progress of a previous run
+
+    Returns:
+        int: Number of tasks run
+    """
+    from catalog import company_catalog
+
+    os.makedirs(spec['output_dir'], exist_ok=True)
+    progress_path = os.path.join(spec['output_dir'], PROGRESS_FILE)
+    shared_path = os.path.join(spec['output_dir'], SHARED_ROWS_FILE)
+    if restart and os.path.exists(progress_path):
+        os.remove(progress_path)
+
+    all_companies = company_catalog.companies() if any(c == '*' for c in spec['groups'].values()) else []
+    tasks = build_tasks(spec, all_companies)
+    done = _completed_tasks(progress_path)
+    pending = [task for task in tasks if task['id'] not in done]
+    print(f"{len(tasks)} tasks, {len(tasks) - len(pending)} already done")
+    if not pending:
+        return 0
+
+    shared_rows = fetch_shared_rows(pending, shared_path)
+    print(f"Shared {shared_rows} daily rows with the workers")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared_path,)) as pool, \
+            open(progress_path, 'a') as progress_file:
+        futures = {pool.submit(run_task, task): task['id'] for task in pending}
+        for count, future in enumerate(as_completed(futures), start=1):
+            task_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[{count}/{len(pending)}] {task_id} failed: {e}")
+                continue
+            progress_file.write(json.dumps({'id': task_id, 'files': result['files']}) + '\n')
+            progress_file.flush()
+            print(f"[{count}/{len(pending)}] {task_id} ({result['seconds']:.1f}s)")
+
+    os.remove(shared_path)
+    print(f"Finished in {time.perf_counter() - started:.1f}s")
+    return len(pending)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate stats CSVs and chart HTMLs for a job spec.")
+    parser.add_argument('spec', help="JSON job spec")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+    parser.add_argument('--restart', action='store_true', help="Ignore the progress of a previous run")
+    args = parser.parse_args()
+
+    run_batch(load_spec(args.spec), args.workers, args.restart)
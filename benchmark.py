@@ -0,0 +1,276 @@
+"""
+Reproducible performance benchmarks for the Stock Explorer data path.
+
+Generates a seeded synthetic dataset, points the local DuckDB backend at
+it and times the fetch functions, the cleaning pipeline and the figure
+construction. Every case reports latency percentiles, peak Python memory
+and throughput, and the results are saved as JSON so runs can be compared.
+
+Usage:
+    python benchmark.py --companies 100 --years 5 --output bench.json
+    python benchmark.py --compare bench.json
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from synthetic_data import generate_stock_details, to_raw_format
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def measure(func, repeat, setup=None):
+    """
+    Time a benchmark case and record its peak memory.
+
+    Args:
+        func (callable): Case to run; returns the number of rows it processed
+        repeat (int): Number of timed runs
+        setup (callable): Called before every run, e.g. to clear caches
+
+    Returns:
+        dict: Latency percentiles (ms), peak memory (MB) and rows per second
+    """
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        rows = func()
+        timings.append(time.perf_counter() - started)
+
+    # Memory is traced in a separate run so tracing does not skew the timings
+    if setup:
+        setup()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = np.array(timings)
+    return {
+        'runs': repeat,
+        'rows': int(rows),
+        'p50_ms': float(np.percentile(timings, 50) * 1000),
+        'p95_ms': float(np.percentile(timings, 95) * 1000),
+        'p99_ms': float(np.percentile(timings, 99) * 1000),
+        'mean_ms': float(timings.mean() * 1000),
+        'peak_memory_mb': peak / 2**20,
+        'rows_per_second': float(rows / np.median(timings)) if rows else 0.0
+    }
+
+def prepare_dataset(workdir, n_companies, years, seed):
+    """
+    Write the synthetic dataset as cleaned Parquet and as raw CSV.
+
+    Returns:
+        tuple: (parquet path, raw CSV path, number of rows)
+    """
+    df = generate_stock_details(n_companies, years, seed=seed)
+    parquet_path = os.path.join(workdir, 'stock_details.parquet')
+    raw_path = os.path.join(workdir, 'raw_stock_details.csv')
+    df.to_parquet(parquet_path, index=False)
+    to_raw_format(df).to_csv(raw_path, index=False)
+    return parquet_path, raw_path, len(df)
+
+def configure_local_backend(parquet_path, workdir, cache_mode='cold'):
+    """
+    Point the app at the local backend; must run before the app modules are imported.
+    """
+    os.environ['STOCK_BACKEND'] = 'local'
+    # The disk cache is off by default for the local backend; 'disk' measures it
+    os.environ['STOCK_DISK_CACHE'] = '1' if cache_mode == 'disk' else '0'
+    os.environ['STOCK_PARQUET_PATH'] = parquet_path
+    os.environ['STOCK_LOG_PATH'] = os.path.join(workdir, 'benchmark.log')
+    os.environ['STOCK_DISK_CACHE_DIR'] = os.path.join(workdir, 'query_cache')
+    os.environ['STOCK_SKETCH_PATH'] = os.path.join(workdir, 'quantile_sketches.parquet')
+
+def build_cases(raw_path, workdir, start_date, end_date, cache_mode='cold'):
+    """
+    Build the benchmark cases, importing the app modules lazily.
+
+    Args:
+        cache_mode (str): 'cold' clears every cache before each run, 'disk'
+            keeps only the persistent disk cache, 'warm' keeps all caches
+
+    Returns:
+        tuple: (dict of case name to callable, setup callable or None)
+    """
+    import pandas as pd
+    from cache import result_cache
+    from catalog import company_catalog
+    from Cleaning import clean_dataframe, clean_streaming
+    from disk_cache import disk_cache
+    from database import get_companies, fetch_data_from_bigquery, fetch_avg_metrics, fetch_daily_rows
+    from page_data import fetch_page_data
+    from price_store import invalidate_price_store
+    from quantile_sketches import fetch_range_quantiles, monthly_sketches
+    from rollups import monthly_rollup
+    from utils import fetch_stats_data
+    from visualization import plot_main_chart, plot_average_metrics_subplots
+    from volume_index import invalidate_volume_index, top_companies_by_volume
+
+    def reset_caches():
+        if cache_mode == 'cold':
+            disk_cache.clear()
+        result_cache.clear()
+        company_catalog.invalidate()
+        monthly_rollup.invalidate()
+        monthly_sketches.invalidate()
+        invalidate_price_store()
+        invalidate_volume_index()
+
+    companies = get_companies()
+    metric_options = {'open': 'Opening Price', 'close': 'Closing Price', 'high': 'Highest Price',
+                      'low': 'Lowest Price', 'volume': 'Trading Volume'}
+    raw_df = pd.read_csv(raw_path)
+
+    def quiet(func, *args):
+        # The cleaning functions print progress to stdout
+        with contextlib.redirect_stdout(io.StringIO()):
+            return func(*args)
+
+    def fetch_case(chart_type, aggregation, smoothing=False):
+        return lambda: len(fetch_data_from_bigquery(
+            companies, start_date, end_date, 'close', aggregation, chart_type, smoothing, 7
+        ))
+
+    def figure_case(chart_type, aggregation):
+        df, avg_metrics_df, _ = fetch_page_data(companies, start_date, end_date, 'close', aggregation, chart_type)
+
+        def build():
+            plot_main_chart(df, chart_type, 'close', aggregation, metric_options)
+            plot_average_metrics_subplots(avg_metrics_df, chart_type, {f'avg_{m}': m for m in metric_options})
+            return len(df) + len(metric_options) * len(avg_metrics_df)
+        return build
+
+    def startup_case(code):
+        # A fresh interpreter, so module imports and singletons start cold;
+        # the timing includes interpreter start-up
+        def run():
+            subprocess.run([sys.executable, '-c', code], cwd=APP_DIR, env=os.environ.copy(), check=True)
+            return 0
+        return run
+
+    def streaming_case():
+        output_path = os.path.join(workdir, 'cleaned_streaming.csv')
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        quiet(clean_streaming, raw_path, output_path)
+        return len(raw_df)
+
+    cases = {
+        'get_companies': lambda: len(get_companies()),
+        'fetch_data/bar_avg': fetch_case('Bar', 'AVG'),
+        'fetch_data/bar_median': fetch_case('Bar', 'APPROX_QUANTILES'),
+        'fetch_data/line': fetch_case('Line', 'AVG'),
+        'fetch_data/line_smoothed': fetch_case('Line', 'AVG', True),
+        'fetch_data/candlestick': fetch_case('Candlestick', 'AVG'),
+        'fetch_avg_metrics/bar': lambda: len(fetch_avg_metrics(companies, start_date, end_date, 'Bar')),
+        'fetch_avg_metrics/line': lambda: len(fetch_avg_metrics(companies, start_date, end_date, 'Line')),
+        'fetch_daily_rows': lambda: len(fetch_daily_rows(companies, start_date, end_date)),
+        'fetch_stats_data': lambda: len(fetch_stats_data(companies, start_date, end_date)),
+        'range_quantiles': lambda: len(fetch_range_quantiles(companies, start_date, end_date, 'close', (0.1, 0.5, 0.9))),
+        'top_volume': lambda: len(top_companies_by_volume(start_date, end_date, 10)),
+        'fetch_page_data/line': lambda: len(fetch_page_data(companies, start_date, end_date, 'close', 'AVG', 'Line')[0]),
+        'clean_dataframe': lambda: len(raw_df) if quiet(clean_dataframe, raw_df.copy()) is not None else 0,
+        'clean_streaming': streaming_case,
+        'startup/interpreter': startup_case("pass"),
+        'startup/import_main': startup_case("import main"),
+        'startup/first_page': startup_case(
+            "import datetime, main\n"
+            "from page_data import fetch_page_data\n"
+            f"fetch_page_data(main.get_companies(), datetime.date.fromisoformat('{start_date}'), "
+            f"datetime.date.fromisoformat('{end_date}'), 'close', 'AVG', 'Line')"
+        )
+    }
+    for chart_type, aggregation in [('Bar', 'AVG'), ('Line', 'AVG'), ('Area', 'AVG'), ('Candlestick', 'AVG')]:
+        cases[f'figures/{chart_type.lower()}'] = figure_case(chart_type, aggregation)
+    return cases, None if cache_mode == 'warm' else reset_caches
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=APP_DIR
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+def compare(results, baseline_path):
+    """
+    Print the p50 latency of each case relative to a saved run.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)['results']
+    print(f"{'case':32} {'baseline p50':>14} {'p50':>10} {'ratio':>7}")
+    for name, result in results.items():
+        if name in baseline:
+            before = baseline[name]['p50_ms']
+            print(f"{name:32} {before:12.1f}ms {result['p50_ms']:8.1f}ms {result['p50_ms'] / before:7.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Stock Explorer data path on synthetic data")
+    parser.add_argument("--companies", type=int, default=50, help="Number of synthetic companies")
+    parser.add_argument("--years", type=int, default=5, help="Years of daily rows per company")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic data")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--cache", choices=['cold', 'disk', 'warm'], default='cold',
+                        help="Caches kept between runs: none, only the persistent disk cache, or all")
+    parser.add_argument("--filter", default="", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to save the results")
+    parser.add_argument("--compare", help="Saved results to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='stock_bench_') as workdir:
+        parquet_path, raw_path, n_rows = prepare_dataset(workdir, args.companies, args.years, args.seed)
+        configure_local_backend(parquet_path, workdir, args.cache)
+
+        start_date = datetime.date(2019, 1, 1)
+        end_date = datetime.date(2018 + args.years, 6, 30)
+        cases, setup = build_cases(raw_path, workdir, start_date, end_date, args.cache)
+
+        results = {}
+        for name, func in cases.items():
+            if args.filter not in name:
+                continue
+            results[name] = measure(func, args.repeat, setup=setup)
+            r = results[name]
+            print(f"{name:32} p50 {r['p50_ms']:9.1f}ms  p95 {r['p95_ms']:9.1f}ms  "
+                  f"peak {r['peak_memory_mb']:8.1f}MB  {r['rows_per_second']:12,.0f} rows/s")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'companies': args.companies,
+            'years': args.years,
+            'seed': args.seed,
+            'rows': n_rows,
+            'repeat': args.repeat,
+            'cache': args.cache,
+            'date_range': [start_date.isoformat(), end_date.isoformat()]
+        },
+        'results': results
+    }
+    if args.compare:
+        compare(results, args.compare)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Saved results to {args.output}")
+
+if __name__ == "__main__":
+    main()
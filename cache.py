@@ -0,0 +1,187 @@
+import time
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config import CACHE_MAX_BYTES, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+from instrumentation import annotate, result_size
+
+class RangeCache:
+    """
+    Bounded in-memory cache of query results keyed on companies and date range.
+
+    Each entry is stored under a shape key (the non-range query parameters,
+    e.g. metric, chart type and aggregation) plus its company set and date
+    range. A lookup hits either an exact entry or, for row-level results, a
+    cached superset whose companies and range contain the request, which is
+    then sliced. Entries are evicted least-recently-used first, on expiry
+    after `ttl_seconds`, and whenever the total size exceeds `max_bytes`.
+    Sizes are shallow (see `instrumentation.result_size`), so storing a
+    result costs O(columns) rather than a walk over every string.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.subsumed_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, shape, companies, start_date, end_date):
+        """
+        Look up a result, slicing a cached superset when possible.
+
+        Args:
+            shape (tuple): Non-range query parameters
+            companies (list): Requested companies
+            start_date (date): Requested start date
+            end_date (date): Requested end date
+
+        Returns:
+            pd.DataFrame | None: Cached result, or None on a miss
+        """
+        companies = frozenset(companies)
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get((shape, companies, start_date, end_date))
+            if entry is not None:
+                self._entries.move_to_end(entry['key'])
+                self.hits += 1
+                annotate(cache='hit')
+                return entry['frame'].copy(deep=False)
+
+            for entry in reversed(self._entries.values()):
+                if (
+                    entry['sliceable']
+                    and entry['key'][0] == shape
+                    and companies <= entry['companies']
+                    and entry['start_date'] <= start_date
+                    and end_date <= entry['end_date']
+                ):
+                    self._entries.move_to_end(entry['key'])
+                    self.subsumed_hits += 1
+                    annotate(cache='subsumed')
+                    return _slice(entry['frame'], companies, start_date, end_date)
+
+            self.misses += 1
+            annotate(cache='miss')
+            return None
+
+    def put(self, shape, companies, start_date, end_date, frame, sliceable=False):
+        """
+        Store a result.
+
+        Args:
+            shape (tuple): Non-range query parameters
+            companies (list): Companies the result covers
+            start_date (date): Start date the result covers
+            end_date (date): End date the result covers
+            frame (pd.DataFrame): Query result; empty frames are not stored
+            sliceable (bool): Whether each row depends only on its own company
+                and date, so that subsets can be answered by filtering
+        """
+        # Fetch functions return an empty frame when the backend call fails
+        if frame.empty:
+            return
+
+        _, nbytes = result_size(frame)
+        if nbytes > self.max_bytes:
+            return
+
+        companies = frozenset(companies)
+        key = (shape, companies, start_date, end_date)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = {
+                'key': key,
+                'companies': companies,
+                'start_date': start_date,
+                'end_date': end_date,
+                'frame': frame,
+                'nbytes': nbytes,
+                'sliceable': sliceable,
+                'created': time.monotonic()
+            }
+            self._total_bytes += nbytes
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def entries_reaching(self, day):
+        """
+        List the entries whose date range ends on or after a day, e.g. the
+        ones new trading days would change.
+
+        Args:
+            day (date): First day of interest
+
+        Returns:
+            list: (shape, companies, start date, end date, frame, sliceable) tuples
+        """
+        with self._lock:
+            return [
+                (entry['key'][0], entry['companies'], entry['start_date'], entry['end_date'],
+                 entry['frame'], entry['sliceable'])
+                for entry in self._entries.values()
+                if entry['end_date'] >= day
+            ]
+
+    def discard(self, shape, companies, start_date, end_date):
+        """
+        Drop one entry, if cached.
+        """
+        with self._lock:
+            self._remove((shape, frozenset(companies), start_date, end_date))
+
+    def clear(self):
+        """
+        Drop every cached entry.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """
+        Report cache counters.
+
+        Returns:
+            dict: Hit, miss and eviction counts plus current size
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'subsumed_hits': self.subsumed_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes
+            }
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl_seconds]
+        for key in expired:
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry['nbytes']
+
+def _slice(frame, companies, start_date, end_date):
+    mask = frame['company'].isin(companies)
+    if 'date' in frame.columns:
+        mask &= frame['date'].between(
+            pd.Timestamp(start_date, tz='UTC'),
+            pd.Timestamp(end_date, tz='UTC')
+        )
+    return frame[mask].reset_index(drop=True)
+
+# Process-wide cache shared by every fetch function and Streamlit session
+result_cache = RangeCache()
@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import pandas as pd
+from backends import get_backend
+from cache import result_cache
+from config import LOAD_MARKER_PATH, STOCK_TABLE, logger
+from disk_cache import uncached
+from instrumentation import traced
+from price_store import invalidate_price_store
+from quantile_sketches import monthly_sketches
+from refresh import apply_delta, fetch_rows_since
+from rollups import monthly_rollup
+from volume_index import invalidate_volume_index
+
+class CompanyCatalog:
+    """
+    In-memory index of the companies in `stock_details`: first and last
+    trading day, row count and summary statistics per company.
+
+    Built with one grouped query on first use (which the disk result cache
+    persists across restarts) and served from memory afterwards. It is
+    kept current after a data load: `loader.py` rewrites `LOAD_MARKER_PATH`
+    when a load completes. If the load only appended rows after the table's
+    previous last day (its watermark), those rows are fetched and merged
+    into the catalog and every other in-memory cache derived from the table
+    (see refresh.py); otherwise those caches are dropped and rebuilt.
+    """
+
+    def __init__(self, backend=None, marker_path=LOAD_MARKER_PATH):
+        self._backend = backend
+        self.marker_path = marker_path
+        self._frame = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def frame(self):
+        """
+        Return the catalog, building it on first use or after a data load.
+
+        Returns:
+            pd.DataFrame: One row per company, ordered by company
+        """
+        version = _load_version(self.marker_path)
+        with self._lock:
+            if self._frame is not None and version != self._version:
+                if not self._apply_load(read_load_info(self.marker_path)):
+                    logger.info("Data load detected; dropping cached results")
+                    result_cache.clear()
+                    monthly_rollup.invalidate()
+                    monthly_sketches.invalidate()
+                    invalidate_price_store()
+                    invalidate_volume_index()
+                    self._frame = None
+                self._version = version
+            if self._frame is None:
+                self._frame = self._build()
+                self._version = version
+            return self._frame
+
+    def refresh(self):
+        """
+        Fetch and merge the rows dated after the catalog's last day, e.g.
+        after rows were written to the table outside `loader.py`.
+
+        Returns:
+            int: Number of new rows merged
+        """
+        self.frame()
+        with self._lock:
+            watermark = self._frame['last_date'].max()
+            rows = fetch_rows_since(watermark, uncached(self.backend))
+            if not rows.empty:
+                self._merge(rows, watermark)
+                # Other app processes merge the same rows from the marker
+                mark_data_loaded(self.marker_path, info={
+                    'watermark': watermark.isoformat(),
+                    'append_only': True,
+                    'rows_loaded': len(rows)
+                })
+                self._version = _load_version(self.marker_path)
+            return len(rows)
+
+    def _apply_load(self, info):
+        # Merge a completed load's rows in place; False when the load may
+        # have changed rows on or before the watermark
+        watermark = self._frame['last_date'].max()
+        if not info or not info.get('append_only') or info.get('watermark') != watermark.isoformat():
+            return False
+        try:
+            rows = fetch_rows_since(watermark, uncached(self.backend))
+        except Exception as e:
+            logger.error(f"Delta refresh failed: {e}")
+            return False
+        logger.info(f"Data load detected; merging rows after {watermark}")
+        self._merge(rows, watermark, sketches_saved=True)
+        return True
+
+    def _merge(self, rows, watermark, sketches_saved=False):
+        if rows.empty:
+            return
+        apply_delta(rows, watermark, rows['date'].max().date(), sketches_saved)
+        self._frame = _merge_catalog(self._frame, rows)
+
+    def invalidate(self):
+        """
+        Drop the catalog so the next request rebuilds it, e.g. after a data load.
+        """
+        with self._lock:
+            self._frame = None
+
+    @traced('catalog_build')
+    def _build(self):
+        logger.info("Building company catalog")
+        query = f"""
+            SELECT
+                company,
+                MIN(DATE(date)) AS first_date,
+                MAX(DATE(date)) AS last_date,
+                COUNT(*) AS row_count,
+                MIN(CAST(low AS FLOAT64)) AS min_low,
+                MAX(CAST(high AS FLOAT64)) AS max_high,
+                AVG(CAST(close AS FLOAT64)) AS avg_close,
+                AVG(CAST(volume AS FLOAT64)) AS avg_volume
+            FROM {STOCK_TABLE}
+            GROUP BY company
+            ORDER BY company
+            """
+        df = self.backend.query(query)
+        for col in ('first_date', 'last_date'):
+            df[col] = pd.to_datetime(df[col]).dt.date
+        return df
+
+    def companies(self):
+        """
+        Returns:
+            list: Every company, sorted
+        """
+        return self.frame()['company'].tolist()
+
+    def date_bounds(self, selected_companies=None):
+        """
+        Return the first and last trading day of some companies.
+
+        Args:
+            selected_companies (list): Companies to cover, or None for all
+
+        Returns:
+            tuple: (first date, last date), or None if no company is known
+        """
+        df = self.frame()
+        if selected_companies is not None:
+            df = df[df['company'].isin(selected_companies)]
+        if df.empty:
+            return None
+        return df['first_date'].min(), df['last_date'].max()
+
+    def companies_in_range(self, selected_companies, start_date, end_date):
+        """
+        Keep the companies that have rows between two dates.
+
+        Args:
+            selected_companies (list): Candidate companies
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
+
+        Returns:
+            list: Companies whose first and last days overlap the range, in
+                their original order
+        """
+        df = self.frame()
+        overlapping = df[(df['first_date'] <= end_date) & (df['last_date'] >= start_date)]
+        active = set(overlapping['company'])
+        return [company for company in selected_companies if company in active]
+
+def _load_version(marker_path):
+    try:
+        return os.stat(marker_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def _merge_catalog(frame, rows):
+    # Per-company stats of the old rows and the new ones, combined; the new
+    # rows all follow the old ones
+    new = rows.assign(day=rows['date'].dt.date).groupby('company', as_index=False).agg(
+        first_date=('day', 'min'),
+        last_date=('day', 'max'),
+        row_count=('day', 'size'),
+        min_low=('low', 'min'),
+        max_high=('high', 'max'),
+        sum_close=('close', 'sum'),
+        sum_volume=('volume', 'sum')
+    )
+    merged = frame.merge(new, on='company', how='outer', suffixes=('', '_new'), sort=True)
+    old_count = merged['row_count'].fillna(0)
+    new_count = merged['row_count_new'].fillna(0)
+    count = old_count + new_count
+    return pd.DataFrame({
+        'company': merged['company'],
+        'first_date': merged['first_date'].where(merged['first_date'].notna(), merged['first_date_new']),
+        'last_date': merged['last_date_new'].where(merged['last_date_new'].notna(), merged['last_date']),
+        'row_count': count.astype('int64'),
+        'min_low': merged[['min_low', 'min_low_new']].min(axis=1),
+        'max_high': merged[['max_high', 'max_high_new']].max(axis=1),
+        'avg_close': (merged['avg_close'].fillna(0) * old_count + merged['sum_close'].fillna(0)) / count,
+        'avg_volume': (merged['avg_volume'].fillna(0) * old_count + merged['sum_volume'].fillna(0)) / count
+    })
+
+def read_load_info(marker_path=LOAD_MARKER_PATH):
+    """
+    Returns:
+        dict: What the last load recorded in the marker, or None
+    """
+    try:
+        with open(marker_path) as marker_file:
+            return json.load(marker_file)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def mark_data_loaded(marker_path=LOAD_MARKER_PATH, info=None):
+    """
+    Record that a load has completed, so running apps refresh their catalog.
+
+    Args:
+        marker_path (str): Marker file watched by `CompanyCatalog`
+        info (dict): What the load changed: the table's previous last day
+            (`watermark`, ISO format), whether every loaded row followed
+            it (`append_only`) and `rows_loaded`
+    """
+    with open(marker_path + '.tmp', 'w') as marker_file:
+        json.dump(info or {}, marker_file)
+    os.replace(marker_path + '.tmp', marker_path)
+
+# Process-wide catalog shared by every Streamlit session
+company_catalog = CompanyCatalog()
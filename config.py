@@ -1,37 +1,127 @@
 import os
 import logging
-from google.cloud import bigquery
+import threading
+from logging.handlers import RotatingFileHandler
 
-def setup_logging(log_path=r'C:\Users\sande\Vir Env\stock_explorer.log'):
+# Fully qualified BigQuery table holding the cleaned daily stock rows
+STOCK_TABLE = "`lustrous-router-454110-h9.Sandeep01.stock_details`"
+
+# Query backend selection: 'bigquery' (default) or 'local' (DuckDB over Parquet)
+BACKEND = os.environ.get("STOCK_BACKEND", "bigquery").lower()
+PARQUET_PATH = os.environ.get("STOCK_PARQUET_PATH", "cleaned_data.parquet")
+
+# Bounds for the in-memory query result cache (see cache.py)
+CACHE_MAX_ENTRIES = int(os.environ.get("STOCK_CACHE_MAX_ENTRIES", 64))
+CACHE_MAX_BYTES = int(os.environ.get("STOCK_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CACHE_TTL_SECONDS = int(os.environ.get("STOCK_CACHE_TTL_SECONDS", 15 * 60))
+
+# Bounds for the figure cache (see figure_cache.py)
+FIGURE_CACHE_MAX_ENTRIES = int(os.environ.get("STOCK_FIGURE_CACHE_MAX_ENTRIES", 32))
+FIGURE_CACHE_MAX_BYTES = int(os.environ.get("STOCK_FIGURE_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+
+# Serve daily rows from one shared in-process PriceStore (loads the full table once)
+PRICE_STORE = os.environ.get("STOCK_PRICE_STORE", "0") == "1"
+
+# Persistent on-disk cache of query results in Arrow IPC files (see disk_cache.py);
+# on by default for BigQuery only, as local DuckDB queries are cheaper than the copy
+DISK_CACHE = os.environ.get("STOCK_DISK_CACHE", "1" if BACKEND == "bigquery" else "0") == "1"
+DISK_CACHE_DIR = os.environ.get("STOCK_DISK_CACHE_DIR", ".query_cache")
+DISK_CACHE_MAX_BYTES = int(os.environ.get("STOCK_DISK_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+DISK_CACHE_TTL_SECONDS = int(os.environ.get("STOCK_DISK_CACHE_TTL_SECONDS", 24 * 60 * 60))
+# How long the table's version (e.g. its BigQuery modification time) is trusted before re-checking
+DISK_CACHE_VERSION_SECONDS = int(os.environ.get("STOCK_DISK_CACHE_VERSION_SECONDS", 60))
+
+# Per-company, per-month quantile sketches, written at load time (see quantile_sketches.py)
+SKETCH_PATH = os.environ.get("STOCK_SKETCH_PATH", ".quantile_sketches.parquet")
+
+# Files generated on request by the export buttons (see exports.py)
+EXPORT_DIR = os.environ.get("STOCK_EXPORT_DIR", ".exports")
+EXPORT_TTL_SECONDS = int(os.environ.get("STOCK_EXPORT_TTL_SECONDS", 60 * 60))
+
+# Rewritten by loader.py after every completed load (see catalog.py)
+LOAD_MARKER_PATH = os.environ.get("STOCK_LOAD_MARKER", ".last_load")
+
+# Application log file and its size-based rotation
+LOG_PATH = os.environ.get("STOCK_LOG_PATH", r'C:\Users\sande\Vir Env\stock_explorer.log')
+LOG_MAX_BYTES = int(os.environ.get("STOCK_LOG_MAX_BYTES", 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get("STOCK_LOG_BACKUP_COUNT", 3))
+
+# Threads used to run a page's independent backend queries concurrently
+FETCH_WORKERS = int(os.environ.get("STOCK_FETCH_WORKERS", 8))
+
+# Open backend connections kept for concurrent queries (one per fetch thread)
+POOL_SIZE = int(os.environ.get("STOCK_POOL_SIZE", FETCH_WORKERS))
+
+# Connect to the backend and preload shared data in the background on startup
+WARMUP = os.environ.get("STOCK_WARMUP", "1") == "1"
+
+def setup_logging(log_path=LOG_PATH, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
     """
     Configure logging for the application.
     
+    The log file rotates once it reaches `max_bytes`, keeping
+    `backup_count` older files next to it (stock_explorer.log.1, ...).
+    It is only opened when the first event is logged.
+    
     Args:
         log_path (str): Path to the log file
+        max_bytes (int): Size at which the log file is rotated
+        backup_count (int): Number of rotated files to keep
     
     Returns:
         logging.Logger: Configured logger
     """
     logging.basicConfig(
-        filename=log_path,
+        handlers=[RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, delay=True)],
         level=logging.INFO,
         format='%(asctime)s - %(levelname)s - %(message)s'
     )
     return logging.getLogger('StockExplorer')
 
-def setup_bigquery_client(credentials_path=r"C:\Users\sande\Downloads\lustrous-router-454110-h9-0a05cb5bdaef.json"):
+def setup_bigquery_client(credentials_path=r"C:\Users\sande\Downloads\lustrous-router-454110-h9-0a05cb5bdaef.json", pool_size=POOL_SIZE):
     """
     Set up BigQuery client with specified credentials.
     
+    The client's HTTP session keeps up to `pool_size` connections open, so
+    concurrent queries from the fetch threads do not queue for a socket.
+    
     Args:
         credentials_path (str): Path to Google Cloud credentials JSON file
+        pool_size (int): Maximum number of pooled HTTPS connections
     
     Returns:
         bigquery.Client: Configured BigQuery client
     """
+    import google.auth
+    from google.auth.transport.requests import AuthorizedSession
+    from google.cloud import bigquery
+    from requests.adapters import HTTPAdapter
+
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = credentials_path
-    return bigquery.Client()
+    credentials, project = google.auth.default(scopes=["https://www.googleapis.com/auth/cloud-platform"])
+    session = AuthorizedSession(credentials)
+    session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+    return bigquery.Client(project=project, credentials=credentials, _http=session)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_bigquery_client():
+    """
+    Return the process-wide BigQuery client, creating it on first use.
+    
+    Every Streamlit rerun and session in the process shares this client;
+    the local backend never creates one.
+    
+    Returns:
+        bigquery.Client: Shared client
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = setup_bigquery_client()
+    return _client
 
-# Initialize logger and BigQuery client
-logger = setup_logging()
-client = setup_bigquery_client()
\ No newline at end of file
+# Initialize logger; the log file and the BigQuery client are created on first use
+logger = setup_logging()
\ No newline at end of file
@@ -1,22 +1,26 @@
 import pandas as pd
-from google.cloud import bigquery
-from config import client, logger
+from backends import get_backend
+from cache import result_cache
+from catalog import company_catalog
+from config import PRICE_STORE, STOCK_TABLE, logger
+from price_store import get_price_store
+from quantile_sketches import fetch_range_median
+from rollups import fetch_range_partials, partials_to_averages, partials_to_metric
+from smoothing import smooth
+from instrumentation import traced
+from ohlc import RESOLUTIONS, choose_resolution
 
+@traced('get_companies')
 def get_companies():
     """
-    Fetch list of distinct companies from BigQuery.
+    Fetch list of distinct companies, served from the in-memory company catalog.
     
     Returns:
         list: List of company names
     """
-    logger.info("Fetching company list")
-    query = """
-    SELECT DISTINCT company 
-    FROM `lustrous-router-454110-h9.Sandeep01.stock_details` 
-    ORDER BY company
-    """
-    return client.query(query).to_dataframe()['company'].tolist()
+    return company_catalog.companies()
 
+@traced('fetch_data_from_bigquery')
 def fetch_data_from_bigquery(
     selected_companies, 
     start_date, 
@@ -25,10 +29,11 @@ def fetch_data_from_bigquery(
     aggregation_method, 
     chart_type, 
     use_smoothing=False, 
-    window_size=7
+    window_size=7,
+    smoothing_method='sma'
 ):
     """
-    Fetch stock data from BigQuery with flexible querying options.
+    Fetch stock data from the configured backend with flexible querying options.
     
     Args:
         selected_companies (list): List of companies to fetch
@@ -39,25 +44,61 @@ def fetch_data_from_bigquery(
         chart_type (str): Type of chart to generate
         use_smoothing (bool): Apply moving average smoothing
         window_size (int): Size of smoothing window
+        smoothing_method (str): Moving average from `smoothing.SMOOTHING_METHODS`
     
     Returns:
         pd.DataFrame: Queried stock data
     """
+    if use_smoothing and window_size > 1 and chart_type in ('Line', 'Area'):
+        # Smooth the cached raw series locally, so a new window costs no query
+        shape = ('smoothed', metric, aggregation_method, chart_type, window_size, smoothing_method)
+        cached = result_cache.get(shape, selected_companies, start_date, end_date)
+        if cached is not None:
+            return cached
+        df = fetch_data_from_bigquery(
+            selected_companies, start_date, end_date, metric, aggregation_method, chart_type
+        )
+        if df.empty:
+            return df
+        df = df.assign(**{metric: smooth(df, metric, window_size, smoothing_method)})
+        # Each row's average depends on the rows before it in the range; a
+        # delta refresh recomputes only the tail (see refresh.py)
+        result_cache.put(shape, selected_companies, start_date, end_date, df)
+        return df
+
+    if chart_type == 'Bar':
+        if aggregation_method == 'APPROX_QUANTILES':
+            # Merged from the monthly quantile sketches (see quantile_sketches.py)
+            return fetch_range_median(selected_companies, start_date, end_date, metric)
+        # Served from the monthly rollup cube (see rollups.py)
+        partials = fetch_range_partials(selected_companies, start_date, end_date)
+        return partials_to_metric(partials, metric, aggregation_method) if not partials.empty else pd.DataFrame()
+
+    # Candlesticks widen from days to weeks, months or quarters on long ranges
+    resolution = choose_resolution(start_date, end_date, len(selected_companies)) if chart_type == 'Candlestick' else None
+    shape = ('data', metric, aggregation_method, chart_type, resolution)
+    cached = result_cache.get(shape, selected_companies, start_date, end_date)
+    if cached is not None:
+        return cached
+
     logger.info(f"Fetching data: companies={selected_companies}, metric={metric}, agg={aggregation_method}")
     
     try:
-        if chart_type == 'Bar':
-            # Bar chart query logic (similar to original code)
-            agg_expr = f"{aggregation_method}(CAST({metric} AS FLOAT64))" if aggregation_method != 'APPROX_QUANTILES' else f"APPROX_QUANTILES(CAST({metric} AS FLOAT64), 2)[OFFSET(1)]"
+        if chart_type == 'Candlestick' and resolution != 'daily':
+            # Bars resampled in the backend: first open, extreme high/low, last close (see ohlc.py)
             query = f"""
                 SELECT 
                     company,
-                    {agg_expr} AS {metric}
-                FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
+                    DATE_TRUNC(DATE(date), {RESOLUTIONS[resolution]['unit']}) AS period,
+                    ARRAY_AGG(CAST(open AS FLOAT64) IGNORE NULLS ORDER BY date LIMIT 1)[OFFSET(0)] AS open,
+                    MAX(CAST(high AS FLOAT64)) AS high,
+                    MIN(CAST(low AS FLOAT64)) AS low,
+                    ARRAY_AGG(CAST(close AS FLOAT64) IGNORE NULLS ORDER BY date DESC LIMIT 1)[OFFSET(0)] AS close
+                FROM {STOCK_TABLE}
                 WHERE company IN UNNEST(@companies)
                 AND DATE(date) BETWEEN @start_date AND @end_date
-                GROUP BY company
-                ORDER BY company
+                GROUP BY company, period
+                ORDER BY company, period
                 """
         elif chart_type == 'Candlestick':
             # Candlestick chart query logic (similar to original code)
@@ -69,48 +110,49 @@ def fetch_data_from_bigquery(
                     CAST(high AS FLOAT64) AS high,
                     CAST(low AS FLOAT64) AS low,
                     CAST(close AS FLOAT64) AS close
-                FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
+                FROM {STOCK_TABLE}
                 WHERE company IN UNNEST(@companies)
                 AND DATE(date) BETWEEN @start_date AND @end_date
                 ORDER BY company, DATE(date)
                 """
         else:  # Line or Area chart
-            # Line/Area chart query logic with optional smoothing
-            agg_clause = f"""
-                AVG(CAST({metric} AS FLOAT64)) OVER (PARTITION BY company ORDER BY DATE(date) ROWS BETWEEN {window_size - 1} PRECEDING AND CURRENT ROW)
-                """ if use_smoothing and window_size > 1 else f"CAST({metric} AS FLOAT64)"
+            # Line/Area chart query logic; smoothing is applied locally above
             query = f"""
                 SELECT 
                     company,
                     DATE(date) AS date,
-                    {agg_clause} AS {metric}
-                FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
+                    CAST({metric} AS FLOAT64) AS {metric}
+                FROM {STOCK_TABLE}
                 WHERE company IN UNNEST(@companies)
                 AND DATE(date) BETWEEN @start_date AND @end_date
                 ORDER BY company, DATE(date)
                 """
 
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ArrayQueryParameter("companies", "STRING", selected_companies),
-                bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
-                bigquery.ScalarQueryParameter("end_date", "DATE", end_date)
-            ]
+        df = get_backend().query(
+            query,
+            companies=list(selected_companies),
+            start_date=start_date,
+            end_date=end_date
         )
-        df = client.query(query, job_config=job_config).to_dataframe()
         
+        df = df.rename(columns={'period': 'date'})
         if 'date' in df.columns:
             df['date'] = pd.to_datetime(df['date'], utc=True)
+        if resolution:
+            df.attrs['resolution'] = resolution
         
+        # Bars spanning several days cannot be cut to a shorter range
+        result_cache.put(shape, selected_companies, start_date, end_date, df, sliceable=resolution in (None, 'daily'))
         return df
     
     except Exception as e:
         logger.error(f"Data fetch failed: {e}")
         return pd.DataFrame()
 
+@traced('fetch_avg_metrics')
 def fetch_avg_metrics(selected_companies, start_date, end_date, chart_type):
     """
-    Fetch average stock metrics from BigQuery.
+    Fetch average stock metrics from the configured backend.
     
     Args:
         selected_companies (list): List of companies
@@ -121,55 +163,110 @@ def fetch_avg_metrics(selected_companies, start_date, end_date, chart_type):
     Returns:
         pd.DataFrame: Average stock metrics
     """
+    if chart_type == 'Bar':
+        # Served from the monthly rollup cube (see rollups.py)
+        partials = fetch_range_partials(selected_companies, start_date, end_date)
+        return partials_to_averages(partials) if not partials.empty else pd.DataFrame()
+
+    shape = ('avg_metrics', 'daily')
+    cached = result_cache.get(shape, selected_companies, start_date, end_date)
+    if cached is not None:
+        return cached
+
     logger.info(f"Fetching avg metrics: companies={selected_companies}, chart_type={chart_type}")
     
     try:
-        if chart_type == 'Bar':
-            query = """
-                SELECT 
-                    company,
-                    AVG(CAST(open AS FLOAT64)) AS avg_open,
-                    AVG(CAST(high AS FLOAT64)) AS avg_high,
-                    AVG(CAST(close AS FLOAT64)) AS avg_close,
-                    AVG(CAST(low AS FLOAT64)) AS avg_low,
-                    AVG(CAST(volume AS FLOAT64)) AS avg_volume
-                FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
-                WHERE company IN UNNEST(@companies)
-                AND DATE(date) BETWEEN @start_date AND @end_date
-                GROUP BY company
-                ORDER BY company
-                """
-        else:  # Line or Area chart
-            query = """
-                SELECT 
-                    company,
-                    DATE(date) AS date,
-                    AVG(CAST(open AS FLOAT64)) AS avg_open,
-                    AVG(CAST(high AS FLOAT64)) AS avg_high,
-                    AVG(CAST(close AS FLOAT64)) AS avg_close,
-                    AVG(CAST(low AS FLOAT64)) AS avg_low,
-                    AVG(CAST(volume AS FLOAT64)) AS avg_volume
-                FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
-                WHERE company IN UNNEST(@companies)
-                AND DATE(date) BETWEEN @start_date AND @end_date
-                GROUP BY company, DATE(date)
-                ORDER BY company, DATE(date)
-                """
+        query = f"""
+            SELECT 
+                company,
+                DATE(date) AS date,
+                AVG(CAST(open AS FLOAT64)) AS avg_open,
+                AVG(CAST(high AS FLOAT64)) AS avg_high,
+                AVG(CAST(close AS FLOAT64)) AS avg_close,
+                AVG(CAST(low AS FLOAT64)) AS avg_low,
+                AVG(CAST(volume AS FLOAT64)) AS avg_volume
+            FROM {STOCK_TABLE}
+            WHERE company IN UNNEST(@companies)
+            AND DATE(date) BETWEEN @start_date AND @end_date
+            GROUP BY company, DATE(date)
+            ORDER BY company, DATE(date)
+            """
 
-        job_config = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ArrayQueryParameter("companies", "STRING", selected_companies),
-                bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
-                bigquery.ScalarQueryParameter("end_date", "DATE", end_date)
-            ]
+        df = get_backend().query(
+            query,
+            companies=list(selected_companies),
+            start_date=start_date,
+            end_date=end_date
         )
-        df = client.query(query, job_config=job_config).to_dataframe()
         
         if 'date' in df.columns:
             df['date'] = pd.to_datetime(df['date'], utc=True)
+
+        result_cache.put(shape, selected_companies, start_date, end_date, df, sliceable=True)
+        return df
+
+    except Exception as e:
+        logger.error(f"Avg metrics fetch failed: {e}")
+        return pd.DataFrame()
+
+@traced('fetch_daily_rows')
+def fetch_daily_rows(selected_companies, start_date, end_date):
+    """
+    Fetch the raw daily OHLCV rows for the selected companies and date range.
+    
+    This is the single scan behind the main page; the chart, average-metric
+    and stats frames are all derived from its result (see page_data.py).
+    
+    Args:
+        selected_companies (list): List of companies
+        start_date (date): Start date for data
+        end_date (date): End date for data
+    
+    Returns:
+        pd.DataFrame: Daily rows ordered by company and date
+    """
+    if PRICE_STORE:
+        # Sliced from the shared in-process store (see price_store.py)
+        try:
+            return get_price_store().frame(selected_companies, start_date, end_date)
+        except Exception as e:
+            logger.error(f"Price store read failed: {e}")
+            return pd.DataFrame()
+
+    shape = ('daily_rows',)
+    cached = result_cache.get(shape, selected_companies, start_date, end_date)
+    if cached is not None:
+        return cached
+
+    logger.info(f"Fetching daily rows: companies={selected_companies}, range={start_date}..{end_date}")
+    
+    try:
+        query = f"""
+            SELECT 
+                company,
+                DATE(date) AS date,
+                CAST(open AS FLOAT64) AS open,
+                CAST(high AS FLOAT64) AS high,
+                CAST(low AS FLOAT64) AS low,
+                CAST(close AS FLOAT64) AS close,
+                CAST(volume AS FLOAT64) AS volume
+            FROM {STOCK_TABLE}
+            WHERE company IN UNNEST(@companies)
+            AND DATE(date) BETWEEN @start_date AND @end_date
+            ORDER BY company, DATE(date)
+            """
+
+        df = get_backend().query(
+            query,
+            companies=list(selected_companies),
+            start_date=start_date,
+            end_date=end_date
+        )
+        df['date'] = pd.to_datetime(df['date'], utc=True)
         
+        result_cache.put(shape, selected_companies, start_date, end_date, df, sliceable=True)
         return df
     
     except Exception as e:
-        logger.error(f"Avg metrics fetch failed: {e}")
-        return pd.DataFrame()
\ No newline at end of file
+        logger.error(f"Daily rows fetch failed: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,236 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from config import DISK_CACHE_DIR, DISK_CACHE_MAX_BYTES, DISK_CACHE_TTL_SECONDS, DISK_CACHE_VERSION_SECONDS, logger
+from instrumentation import result_size, span
+
+class DiskResultCache:
+    """
+    Persistent cache of query results stored as Arrow IPC (Feather v2) files.
+
+    Files are keyed by a hash of the backend name, the whitespace-normalised
+    SQL, the parameters and the version of the table the query ran against
+    (see `DiskCachedBackend`), so any write to the table, from this machine
+    or elsewhere, stops every older result from being read. They are
+    written uncompressed and memory-mapped on
+    read, so numeric columns come back without copying and results survive
+    process restarts. The least recently used files are deleted once the
+    directory exceeds `max_bytes`; files older than `ttl_seconds` are
+    ignored and removed. `clear` drops everything.
+
+    A file still mapped by a frame from `get` cannot be deleted on Windows;
+    its deletion is retried on the next eviction or `clear`.
+    """
+
+    def __init__(self, directory=DISK_CACHE_DIR, max_bytes=DISK_CACHE_MAX_BYTES, ttl_seconds=DISK_CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._index = None
+        self._undeleted = set()
+
+    @staticmethod
+    def key(backend_name, sql, params, version=None):
+        """
+        Build the cache key of a query.
+
+        Args:
+            backend_name (str): Backend the query runs on
+            sql (str): Query text
+            params (dict): Query parameters
+            version (str): Version of the queried table, if known
+
+        Returns:
+            str: Hex digest naming the cache file
+        """
+        normalized = json.dumps(
+            {'backend': backend_name, 'sql': ' '.join(sql.split()), 'params': sorted(params.items()), 'version': version},
+            default=str
+        )
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Read a cached result.
+
+        Args:
+            key (str): Output of `key`
+
+        Returns:
+            pd.DataFrame | None: Result backed by the memory-mapped file, or None
+        """
+        import pyarrow as pa
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                self._discard(key)
+                return None
+            with pa.memory_map(path, 'r') as source:
+                table = pa.ipc.open_file(source).read_all()
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Unreadable disk cache entry {key}: {e}")
+            self._discard(key)
+            return None
+
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index[key]['used'] = time.time()
+        # split_blocks keeps each column a separate (zero-copy where possible) block
+        return table.to_pandas(split_blocks=True)
+
+    def put(self, key, frame):
+        """
+        Store a result, evicting least recently used files past `max_bytes`.
+
+        Args:
+            key (str): Output of `key`
+            frame (pd.DataFrame): Query result
+        """
+        import pyarrow as pa
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write disk cache entry {key}: {e}")
+            return
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._retry_unlinks()
+            index = self._load_index()
+            index[key] = {'size': size, 'used': time.time()}
+            total = sum(entry['size'] for entry in index.values())
+            for old_key in sorted(index, key=lambda k: index[k]['used']):
+                if total <= self.max_bytes:
+                    break
+                total -= index.pop(old_key)['size']
+                self._unlink(old_key)
+
+    def clear(self):
+        """
+        Delete every cached result.
+        """
+        with self._lock:
+            self._retry_unlinks()
+            for key in list(self._load_index()):
+                self._unlink(key)
+            self._index = {}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.arrow")
+
+    def _load_index(self):
+        # Rebuilt from the directory once per process; files written by other
+        # processes are picked up when they are first read or evicted
+        if self._index is None:
+            self._index = {}
+            if os.path.isdir(self.directory):
+                for name in os.listdir(self.directory):
+                    if name.endswith('.arrow'):
+                        stat = os.stat(os.path.join(self.directory, name))
+                        self._index[name[:-len('.arrow')]] = {'size': stat.st_size, 'used': stat.st_mtime}
+        return self._index
+
+    def _discard(self, key):
+        with self._lock:
+            self._load_index().pop(key, None)
+            self._unlink(key)
+
+    def _unlink(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # e.g. PermissionError on Windows while a frame still maps the file
+            logger.warning(f"Could not delete disk cache entry {key}, retrying later: {e}")
+            self._undeleted.add(key)
+            return
+        self._undeleted.discard(key)
+
+    def _retry_unlinks(self):
+        for key in list(self._undeleted):
+            self._unlink(key)
+
+class DiskCachedBackend:
+    """
+    Query backend wrapper that answers repeated queries from a `DiskResultCache`.
+
+    Results are keyed by the wrapped backend's `table_version()` (the
+    BigQuery table's modification time and row counts, or the local Parquet
+    files' sizes and mtimes), re-checked at most every `version_seconds`. A
+    write to the table is therefore seen within that interval, whoever
+    made it.
+    """
+
+    def __init__(self, backend, cache, version_seconds=DISK_CACHE_VERSION_SECONDS):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+        self.version_seconds = version_seconds
+        self._version = None
+        self._checked = None
+        self._version_lock = threading.Lock()
+
+    def table_version(self):
+        """
+        Returns:
+            str: The wrapped backend's table version, re-checked at most
+                every `version_seconds`
+        """
+        with self._version_lock:
+            now = time.monotonic()
+            if self._checked is None or now - self._checked >= self.version_seconds:
+                self._version = self.backend.table_version()
+                self._checked = now
+            return self._version
+
+    def query(self, sql, **params):
+        """
+        Run a query, reusing a persisted result when one exists.
+
+        Args:
+            sql (str): Query text using `@name` parameter markers
+            **params: Parameter values
+
+        Returns:
+            pd.DataFrame: Query result
+        """
+        key = self.cache.key(self.name, sql, params, self.table_version())
+        with span('disk_cache', backend=self.name) as record:
+            df = self.cache.get(key)
+            record['cache'] = 'miss' if df is None else 'hit'
+            if df is not None:
+                record['rows'], record['result_bytes'] = result_size(df)
+        if df is None:
+            df = self.backend.query(sql, **params)
+            self.cache.put(key, df)
+        return df
+
+    def query_batches(self, sql, batch_rows=100_000, **params):
+        """
+        Stream a query's result straight from the backend; streamed
+        results are too large to persist.
+        """
+        return self.backend.query_batches(sql, batch_rows, **params)
+
+# Process-wide disk cache, used by `backends.get_backend` when `config.DISK_CACHE` is on
+disk_cache = DiskResultCache()
+
+def uncached(backend):
+    """
+    Return the backend behind a `DiskCachedBackend`, e.g. to read rows that
+    may have changed since a result was persisted.
+    """
+    return backend.backend if isinstance(backend, DiskCachedBackend) else backend
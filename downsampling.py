@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+# Points kept per series never exceed a chart's width in pixels...
+MAX_POINTS_PER_SERIES = 1500
+# ...nor fall below what still shows a series' shape
+MIN_POINTS_PER_SERIES = 100
+# Total points sent to the browser for one chart, shared between its series
+TOTAL_POINT_BUDGET = 60000
+# A series is only downsampled if LTTB drops at least a fifth of its points;
+# a smaller trim costs more than WebGL drawing the extra points
+MAX_KEPT_SHARE = 0.8
+
+def lttb_indices(x, y, n_out):
+    """
+    Select points with Largest-Triangle-Three-Buckets downsampling.
+
+    The first and last points are always kept; in between, each bucket
+    contributes the point forming the largest triangle with the previously
+    kept point and the mean of the next bucket, which preserves peaks,
+    troughs and overall shape.
+
+    Args:
+        x (np.ndarray): Monotonic x values (numeric)
+        y (np.ndarray): y values
+        n_out (int): Number of points to keep
+
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    return lttb_batch(x, y, np.array([0]), np.array([n]), n_out)[0]
+
+def lttb_batch(x, y, starts, lengths, n_out):
+    """
+    Run LTTB on several series at once.
+
+    Every series is split into the same number of buckets, laid out as a
+    (series, bucket, point) block, so the bucket means and the triangle
+    areas of all series are computed together; only the walk from bucket to
+    bucket, which depends on the point kept before, loops in Python.
+
+    Args:
+        x (np.ndarray): x values of all series, each series contiguous
+        y (np.ndarray): y values, aligned with `x`
+        starts (np.ndarray): Position of each series' first point
+        lengths (np.ndarray): Points in each series, all greater than `n_out`
+        n_out (int): Points to keep per series, at least 3
+
+    Returns:
+        np.ndarray: (series, n_out) positions of the kept points in `x`
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    n_buckets = n_out - 2
+
+    # Bucket boundaries for each series' n - 2 interior points
+    edges = (np.arange(n_buckets + 1)[None, :] * (lengths[:, None] - 2) / n_buckets).astype(np.int64) + 1
+    edges[:, -1] = lengths - 1
+    edges += starts[:, None]
+    lo, hi = edges[:, :-1], edges[:, 1:]
+    # Short buckets are padded with their first point, which never beats it
+    inside = lo[:, :, None] + np.arange(int((hi - lo).max())) < hi[:, :, None]
+    index = np.where(inside, lo[:, :, None] + np.arange(inside.shape[2]), lo[:, :, None])
+    bucket_x, bucket_y = x[index], y[index]
+    counts = inside.sum(axis=2)
+    mean_x = np.where(inside, bucket_x, 0.0).sum(axis=2) / counts
+    mean_y = np.where(inside, bucket_y, 0.0).sum(axis=2) / counts
+    # Each bucket is weighed against the next one's mean; the last against the final point
+    last = starts + lengths - 1
+    next_x = np.concatenate([mean_x[:, 1:], x[last][:, None]], axis=1)
+    next_y = np.concatenate([mean_y[:, 1:], y[last][:, None]], axis=1)
+
+    selected = np.empty((len(starts), n_out), dtype=np.int64)
+    selected[:, 0] = starts
+    selected[:, -1] = last
+    series = np.arange(len(starts))
+    a = starts
+    for i in range(n_buckets):
+        ax, ay = x[a][:, None], y[a][:, None]
+        areas = np.abs(
+            (ax - next_x[:, i, None]) * (bucket_y[:, i] - ay)
+            - (ax - bucket_x[:, i]) * (next_y[:, i, None] - ay)
+        )
+        a = index[series, i, np.argmax(areas, axis=1)]
+        selected[:, i + 1] = a
+    return selected
+
+def points_per_series(n_series):
+    """
+    Split the chart's point budget between its series.
+
+    Args:
+        n_series (int): Number of series in the chart
+
+    Returns:
+        int: Points to keep per series
+    """
+    return int(np.clip(TOTAL_POINT_BUDGET // max(n_series, 1), MIN_POINTS_PER_SERIES, MAX_POINTS_PER_SERIES))
+
+def downsample_series(df, x_col, y_col, by='company', shared_x=False):
+    """
+    Reduce each group's time series to a pixel-budgeted number of points.
+
+    Args:
+        df (pd.DataFrame): Data ordered by `by` and `x_col`
+        x_col (str): Time column
+        y_col (str): Value column used to pick points
+        by (str): Series column
+        shared_x (bool): Keep the same x values for every series, picked by
+            LTTB on their sum, so stacked (Area) charts stay aligned
+
+    Returns:
+        pd.DataFrame: Downsampled rows (unchanged if already within budget,
+            or if only a few points would be dropped)
+    """
+    n_out = points_per_series(df[by].nunique())
+
+    if shared_x:
+        total = df.groupby(x_col, sort=True)[y_col].sum()
+        if n_out > len(total) * MAX_KEPT_SHARE:
+            return df
+        kept = total.index[lttb_indices(total.index.asi8, total.to_numpy(), n_out)]
+        return df[df[x_col].isin(kept)].reset_index(drop=True)
+
+    groups = list(df.groupby(by, sort=False).indices.values())
+    trimmed = [positions for positions in groups if n_out <= len(positions) * MAX_KEPT_SHARE]
+    if not trimmed:
+        return df
+
+    x_values = df[x_col]
+    x_values = pd.DatetimeIndex(x_values).asi8 if pd.api.types.is_datetime64_any_dtype(x_values) else x_values.to_numpy()
+    y_values = df[y_col].to_numpy()
+    # All trimmed series go through LTTB together, gathered end to end
+    order = np.concatenate(trimmed)
+    lengths = np.array([len(positions) for positions in trimmed])
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    selected = lttb_batch(x_values[order], y_values[order], starts, lengths, n_out)
+    keep = [order[selected.ravel()]]
+    keep += [positions for positions in groups if n_out > len(positions) * MAX_KEPT_SHARE]
+    return df.iloc[np.sort(np.concatenate(keep))].reset_index(drop=True)
@@ -0,0 +1,203 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from backends import get_backend
+from config import EXPORT_DIR, EXPORT_TTL_SECONDS, STOCK_TABLE, logger
+from disk_cache import uncached
+from instrumentation import span
+
+# Supported export formats: file extension, MIME type and display label
+EXPORT_FORMATS = {
+    'csv': {'extension': '.csv', 'mime': 'text/csv', 'label': 'CSV'},
+    'csv.gz': {'extension': '.csv.gz', 'mime': 'application/gzip', 'label': 'CSV (gzip)'},
+    'parquet': {'extension': '.parquet', 'mime': 'application/vnd.apache.parquet', 'label': 'Parquet'}
+}
+
+# Rows fetched from the backend and written per batch
+EXPORT_BATCH_ROWS = 100_000
+
+def daily_series_batches(selected_companies=None, start_date=None, end_date=None, batch_rows=EXPORT_BATCH_ROWS, backend=None):
+    """
+    Stream the raw daily OHLCV rows from the backend.
+
+    Rows of selected companies are ordered by company and date. An export
+    of every company skips that sort, which would hold the whole table in
+    the local backend's memory, and streams rows in storage order instead.
+
+    Args:
+        selected_companies (list): Companies to export, or None for all
+        start_date (date): First day to export, or None for the first loaded
+        end_date (date): Last day to export, or None for the last loaded
+        batch_rows (int): Rows per batch
+        backend: Query backend (default: the app's, bypassing the disk cache)
+
+    Yields:
+        pyarrow.RecordBatch: Consecutive slices of the rows
+    """
+    conditions = []
+    params = {}
+    if selected_companies is not None:
+        conditions.append("company IN UNNEST(@companies)")
+        params['companies'] = list(selected_companies)
+    if start_date is not None:
+        conditions.append("DATE(date) >= @start_date")
+        params['start_date'] = start_date
+    if end_date is not None:
+        conditions.append("DATE(date) <= @end_date")
+        params['end_date'] = end_date
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "ORDER BY company, DATE(date)" if selected_companies is not None else ""
+
+    query = f"""
+        SELECT
+            company,
+            DATE(date) AS date,
+            CAST(open AS FLOAT64) AS open,
+            CAST(high AS FLOAT64) AS high,
+            CAST(low AS FLOAT64) AS low,
+            CAST(close AS FLOAT64) AS close,
+            CAST(volume AS FLOAT64) AS volume
+        FROM {STOCK_TABLE}
+        {where}
+        {order}
+        """
+    yield from uncached(backend or get_backend()).query_batches(query, batch_rows, **params)
+
+def frame_batches(df, batch_rows=EXPORT_BATCH_ROWS):
+    """
+    Split an in-memory frame (e.g. the Quick Stats) into Arrow batches.
+
+    Yields:
+        pyarrow.RecordBatch: Consecutive slices of `df`
+    """
+    import pyarrow as pa
+    yield from pa.Table.from_pandas(df, preserve_index=False).to_batches(max_chunksize=batch_rows)
+
+def write_batches(batches, fmt, sink):
+    """
+    Write Arrow batches to a binary file object, one batch at a time.
+
+    Only the batch being written is held in memory, so the size of an
+    export is bounded by the disk, not by RAM. An empty export writes an
+    empty file.
+
+    Args:
+        batches (iterable): pyarrow.RecordBatch objects sharing one schema
+        fmt (str): Key of `EXPORT_FORMATS`
+        sink: Writable binary file object
+
+    Returns:
+        int: Rows written
+    """
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    stream = gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=6) if fmt == 'csv.gz' else sink
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(stream, batch.schema) if fmt == 'parquet' else pa_csv.CSVWriter(stream, batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+        if stream is not sink:
+            stream.close()
+    return rows
+
+def export(batches, fmt, path, name='export'):
+    """
+    Stream batches into a file, replacing it only once it is complete.
+
+    Args:
+        batches (iterable): pyarrow.RecordBatch objects, e.g. from
+            `daily_series_batches`; nothing is fetched until they are consumed
+        fmt (str): Key of `EXPORT_FORMATS`
+        path (str): Output file
+        name (str): Export name recorded with its timing
+
+    Returns:
+        dict: `path`, `rows`, `bytes` and `seconds` taken
+    """
+    started = time.perf_counter()
+    # Sessions requesting the same export each write their own file
+    partial_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with span('export', export=name, format=fmt) as record:
+        try:
+            with open(partial_path, 'wb') as sink:
+                rows = write_batches(batches, fmt, sink)
+        except Exception:
+            os.remove(partial_path)
+            raise
+        os.replace(partial_path, path)
+        record['rows'] = rows
+        record['result_bytes'] = os.path.getsize(path)
+    summary = {
+        'path': path,
+        'rows': rows,
+        'bytes': record['result_bytes'],
+        'seconds': round(time.perf_counter() - started, 3)
+    }
+    logger.info(f"Exported {rows} rows ({summary['bytes']} bytes) to {path} in {summary['seconds']}s")
+    return summary
+
+def export_path(name, fmt, signature, directory=EXPORT_DIR, ttl_seconds=EXPORT_TTL_SECONDS):
+    """
+    Choose the file for an on-demand export, pruning expired exports.
+
+    Identical requests (same name, format and signature) share one file.
+
+    Args:
+        name (str): Export name, e.g. 'daily_series'
+        fmt (str): Key of `EXPORT_FORMATS`
+        signature: JSON-serializable parameters of the export
+        directory (str): Export directory
+        ttl_seconds (int): Age after which older exports are deleted
+
+    Returns:
+        str: Path to write the export to
+    """
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    for entry in os.scandir(directory):
+        if entry.is_file() and now - entry.stat().st_mtime > ttl_seconds:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+    digest = hashlib.sha256(json.dumps(signature, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return os.path.join(directory, f"{name}-{digest}{EXPORT_FORMATS[fmt]['extension']}")
+
+def _format_for(path):
+    for fmt, spec in sorted(EXPORT_FORMATS.items(), key=lambda item: -len(item[1]['extension'])):
+        if path.endswith(spec['extension']):
+            return fmt
+    raise ValueError(f"Cannot infer the export format of {path}; pass --format")
+
+if __name__ == "__main__":
+    import datetime
+    parser = argparse.ArgumentParser(description="Export the daily stock rows in constant memory.")
+    parser.add_argument('output', help="Output file (.csv, .csv.gz or .parquet)")
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), help="Output format (default: from the file name)")
+    parser.add_argument('--companies', nargs='+', help="Companies to export (default: all)")
+    parser.add_argument('--start', type=datetime.date.fromisoformat, help="First day (YYYY-MM-DD)")
+    parser.add_argument('--end', type=datetime.date.fromisoformat, help="Last day (YYYY-MM-DD)")
+    parser.add_argument('--batch-rows', type=int, default=EXPORT_BATCH_ROWS, help="Rows fetched per batch")
+    args = parser.parse_args()
+
+    summary = export(
+        daily_series_batches(args.companies, args.start, args.end, args.batch_rows),
+        args.format or _format_for(args.output),
+        args.output,
+        name='daily_series'
+    )
+    print(f"Exported {summary['rows']} rows ({summary['bytes']} bytes) to {summary['path']} in {summary['seconds']}s")
@@ -0,0 +1,120 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import pandas as pd
+from config import FIGURE_CACHE_MAX_BYTES, FIGURE_CACHE_MAX_ENTRIES
+from instrumentation import annotate, span
+
+def content_key(frames, **options):
+    """
+    Hash the data and options a figure is built from.
+
+    Args:
+        frames (tuple): DataFrames (or None) the figure is built from
+        **options: JSON-serializable chart options
+
+    Returns:
+        str: Hex digest identifying the figure
+    """
+    digest = hashlib.sha256()
+    for frame in frames:
+        if frame is None:
+            digest.update(b'none')
+            continue
+        digest.update(json.dumps([list(map(str, frame.columns)), list(map(str, frame.dtypes))]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+class FigureCache:
+    """
+    Bounded in-memory cache of built plotly figures.
+
+    Entries are keyed by a content hash of the frames and options a figure
+    was built from, so a rerun that leaves a chart's inputs unchanged (e.g.
+    one caused by the Quick Stats page size) reuses the figure without
+    rebuilding or re-validating it; `st.plotly_chart` only copies it with
+    `to_dict`. Each entry is sized by its JSON, measured once when it is
+    built, and entries are evicted least-recently-used first once there
+    are more than `max_entries` or their sizes exceed `max_bytes`.
+    """
+
+    def __init__(self, max_entries=FIGURE_CACHE_MAX_ENTRIES, max_bytes=FIGURE_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        Returns:
+            plotly.graph_objects.Figure | None: Cached figure, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                annotate(cache='miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            annotate(cache='hit')
+            return entry[0]
+
+    def put(self, key, figure, size):
+        """
+        Store a figure.
+
+        Args:
+            key (str): Content key from `content_key`
+            figure (plotly.graph_objects.Figure): Built figure
+            size (int): Bytes of the figure's JSON
+        """
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (figure, size)
+            self._total_bytes += size
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+
+    def figure(self, build, frames, **options):
+        """
+        Return a figure, building it only when its inputs changed.
+
+        Args:
+            build (callable): Builds the plotly figure on a miss
+            frames (tuple): DataFrames (or None) the figure is built from
+            **options: Every other chart option `build` depends on
+
+        Returns:
+            plotly.graph_objects.Figure: The figure, shared between sessions;
+                pass it to `st.plotly_chart` and do not modify it
+        """
+        with span('figure', chart=options.get('chart')) as record:
+            key = content_key(frames, **options)
+            figure = self.get(key)
+            if figure is None:
+                import plotly.io
+                figure = build()
+                record['result_bytes'] = len(plotly.io.to_json(figure, validate=False))
+                self.put(key, figure, record['result_bytes'])
+            return figure
+
+    def clear(self):
+        """
+        Drop every cached figure.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+# Process-wide figure cache shared by every Streamlit session
+figure_cache = FigureCache()
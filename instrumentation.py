@@ -0,0 +1,160 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+import pandas as pd
+from config import logger
+
+# Spans of the trace being recorded (one per Streamlit rerun), or None
+_trace = ContextVar('trace', default=None)
+# Innermost open span in the current context
+_current = ContextVar('current_span', default=None)
+
+class Trace:
+    """
+    Timing spans recorded during one unit of work, e.g. a Streamlit rerun.
+
+    Spans opened in worker threads are attached to the trace as long as the
+    work was submitted with the caller's context (see `orchestrator`).
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def frame(self):
+        """
+        Return the finished spans in start order.
+
+        Returns:
+            pd.DataFrame: One row per span
+        """
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return pd.DataFrame()
+        return pd.DataFrame(spans).sort_values('start_ms', ignore_index=True)
+
+    @property
+    def wall_ms(self):
+        """
+        float: Time since the trace started, in milliseconds.
+        """
+        return (time.perf_counter() - self.started) * 1000
+
+def start_trace():
+    """
+    Start recording spans for the current context.
+
+    Returns:
+        Trace: The new trace
+    """
+    trace = Trace()
+    _trace.set(trace)
+    return trace
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block and emit it as a structured `perf` log event.
+
+    The yielded record can be updated with `rows`, `result_bytes`,
+    `bytes_processed`, `cache` or any other attribute; `annotate` updates
+    the innermost open span from nested code.
+
+    Args:
+        name (str): Span name, e.g. 'query' or 'fetch_daily_rows'
+        **attributes: Initial attributes
+
+    Yields:
+        dict: The span record
+    """
+    parent = _current.get()
+    trace = _trace.get()
+    record = {
+        'span': name,
+        'parent': parent['span'] if parent else None,
+        'thread': threading.current_thread().name,
+        'start_ms': round((time.perf_counter() - trace.started) * 1000, 3) if trace else None,
+        'wall_ms': None,
+        'rows': None,
+        'result_bytes': None,
+        'bytes_processed': None,
+        'cache': None,
+        'status': 'ok'
+    }
+    record.update(attributes)
+    token = _current.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except Exception:
+        record['status'] = 'error'
+        raise
+    finally:
+        record['wall_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        _current.reset(token)
+        if trace:
+            trace.add(record)
+        logger.info(f"perf: {json.dumps(record, default=str)}")
+
+def annotate(**attributes):
+    """
+    Set attributes on the innermost open span, if any.
+    """
+    record = _current.get()
+    if record is not None:
+        record.update(attributes)
+
+def result_size(result):
+    """
+    Measure a fetch or chart result.
+
+    Args:
+        result: DataFrame, tuple of DataFrames, list or plotly figure
+
+    Sizes are shallow: string columns count their object pointers, not the
+    strings, so measuring stays O(columns) rather than O(rows) on every span.
+
+    Returns:
+        tuple: (rows or plotted points, bytes in memory or None)
+    """
+    if isinstance(result, pd.DataFrame):
+        return len(result), int(result.memory_usage(deep=False).sum())
+    if isinstance(result, tuple) and result and all(isinstance(r, pd.DataFrame) for r in result):
+        sizes = [result_size(r) for r in result]
+        return sum(rows for rows, _ in sizes), sum(size for _, size in sizes)
+    if isinstance(result, (list, tuple)):
+        return len(result), None
+    if hasattr(result, 'data') and hasattr(result, 'layout'):
+        # Figures are not serialised here; Streamlit does that once anyway
+        return sum(len(trace.x) for trace in result.data if getattr(trace, 'x', None) is not None), None
+    return None, None
+
+def traced(name):
+    """
+    Decorate a fetch or chart function so every call is recorded as a span.
+
+    Args:
+        name (str): Span name
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as record:
+                result = func(*args, **kwargs)
+                rows, size = result_size(result)
+                record.update(rows=rows, result_bytes=size)
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,379 @@
+import argparse
+import datetime
+import glob
+import json
+import os
+import uuid
+import pandas as pd
+from backends import BigQueryBackend, delta_directory, parquet_sources, read_parquet_sql, translate_sql
+from cache import result_cache
+from catalog import company_catalog, mark_data_loaded
+from config import BACKEND, PARQUET_PATH, STOCK_TABLE, logger
+from disk_cache import disk_cache
+from instrumentation import span
+from price_store import invalidate_price_store
+from quantile_sketches import monthly_sketches
+from refresh import fetch_rows_since
+from rollups import monthly_rollup
+from volume_index import invalidate_volume_index
+
+# Column order of the `stock_details` table
+TABLE_COLUMNS = ['date', 'open', 'high', 'low', 'close', 'volume', 'dividends', 'stock_splits', 'company']
+
+def read_batches(input_path, batch_size=100_000):
+    """
+    Stream cleaned rows from a CSV or Parquet file in columnar batches.
+
+    Args:
+        input_path (str): Output of Cleaning.py (.csv or .parquet)
+        batch_size (int): Rows per batch
+
+    Yields:
+        pd.DataFrame: Rows in table column order with UTC timestamps
+    """
+    if input_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        batches = (batch.to_pandas() for batch in pq.ParquetFile(input_path).iter_batches(batch_size=batch_size))
+    else:
+        batches = pd.read_csv(input_path, chunksize=batch_size)
+    for batch in batches:
+        batch = batch.assign(
+            date=pd.to_datetime(batch['date'], utc=True),
+            volume=batch['volume'].astype('int64')
+        )
+        yield batch[TABLE_COLUMNS]
+
+class BigQueryTarget:
+    """
+    Load into the hosted `stock_details` table.
+
+    Appends use a WRITE_APPEND load job; upserts load the batch into a
+    staging table and MERGE it into `stock_details` on (company, date).
+    """
+    name = 'bigquery'
+
+    def __init__(self, table=STOCK_TABLE, client=None):
+        if client is None:
+            from config import get_bigquery_client
+            client = get_bigquery_client()
+        self.client = client
+        self.backend = BigQueryBackend(client)
+        self.table_id = table.strip('`')
+        self.staging_id = f"{self.table_id}_staging"
+
+    def query(self, sql, **params):
+        return self.backend.query(sql.replace('{table}', f"`{self.table_id}`"), **params)
+
+    def append(self, df):
+        from google.cloud import bigquery
+        job_config = bigquery.LoadJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_APPEND)
+        self.client.load_table_from_dataframe(df, self.table_id, job_config=job_config).result()
+
+    def upsert(self, df):
+        from google.cloud import bigquery
+        job_config = bigquery.LoadJobConfig(write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE)
+        self.client.load_table_from_dataframe(df, self.staging_id, job_config=job_config).result()
+        updates = ', '.join(f"{col} = s.{col}" for col in TABLE_COLUMNS)
+        self.client.query(f"""
+            MERGE `{self.table_id}` t
+            USING `{self.staging_id}` s
+            ON t.company = s.company AND DATE(t.date) = DATE(s.date)
+            WHEN MATCHED THEN UPDATE SET {updates}
+            WHEN NOT MATCHED THEN INSERT ({', '.join(TABLE_COLUMNS)}) VALUES ({', '.join(f's.{col}' for col in TABLE_COLUMNS)})
+            """).result()
+
+class ParquetDatasetTarget:
+    """
+    Load into the Parquet data read by the local backend: a directory of
+    part files, or the single `cleaned_data.parquet` file Cleaning.py writes
+    (the default `STOCK_PARQUET_PATH`).
+
+    Every loaded batch becomes a new part file, so a load writes only its
+    own rows. A single file is never rewritten by an append: its parts go
+    to a directory next to it that the local backend reads with it (see
+    `backends.parquet_sources`). An upsert first drops the batch's keys
+    from the existing files, rewriting only files whose Parquet statistics
+    show dates inside the batch's range.
+    """
+    name = 'local'
+
+    def __init__(self, location=PARQUET_PATH):
+        self.single_file = os.path.isfile(location)
+        if not self.single_file:
+            os.makedirs(location, exist_ok=True)
+        self.location = location
+        self.parts_directory = delta_directory(location) if self.single_file else location
+        self.run_id = uuid.uuid4().hex[:8]
+        self.parts = 0
+
+    def query(self, sql, **params):
+        import duckdb
+        if not self.part_files():
+            return pd.DataFrame()
+        con = duckdb.connect(database=':memory:')
+        try:
+            con.execute("SET TimeZone = 'UTC'")
+            source = read_parquet_sql(parquet_sources(self.location))
+            return con.execute(translate_sql(sql.replace('{table}', source)), params).df()
+        finally:
+            con.close()
+
+    def part_files(self):
+        parts = sorted(glob.glob(os.path.join(self.parts_directory, '*.parquet')))
+        return [self.location, *parts] if self.single_file else parts
+
+    def append(self, df):
+        self.parts += 1
+        name = f"part-{self.run_id}-{self.parts:05d}.parquet"
+        if not os.path.isdir(self.parts_directory):
+            # The first delta part arrives with its directory, so readers
+            # never see an empty one
+            staging = f"{self.parts_directory}.{self.run_id}.tmp"
+            os.makedirs(staging, exist_ok=True)
+            df.to_parquet(os.path.join(staging, name), index=False)
+            os.replace(staging, self.parts_directory)
+            return
+        path = os.path.join(self.parts_directory, name)
+        # Write then rename, so readers never see a partial part file
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+
+    def upsert(self, df):
+        keys = pd.MultiIndex.from_arrays([df['company'], df['date'].dt.date])
+        first_day, last_day = df['date'].min().date(), df['date'].max().date()
+        for path in self.part_files():
+            _drop_keys(path, keys, first_day, last_day)
+        self.append(df)
+
+def _row_group_dates(metadata, index):
+    # (first, last) day of a row group from its statistics, or None if unknown
+    row_group = metadata.row_group(index)
+    for column in range(row_group.num_columns):
+        chunk = row_group.column(column)
+        if chunk.path_in_schema == 'date':
+            stats = chunk.statistics
+            if stats is None or not stats.has_min_max:
+                return None
+            return pd.Timestamp(stats.min).date(), pd.Timestamp(stats.max).date()
+    return None
+
+def _drop_keys(path, keys, first_day, last_day):
+    # Rewrite a Parquet file without the rows whose (company, day) is in
+    # `keys`. Only row groups whose date statistics overlap [first_day,
+    # last_day] are read; the file is left alone if none hold a key.
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    parquet_file = pq.ParquetFile(path)
+    kept = {}
+    for index in range(parquet_file.num_row_groups):
+        dates = _row_group_dates(parquet_file.metadata, index)
+        if dates is not None and (dates[1] < first_day or dates[0] > last_day):
+            continue
+        group = parquet_file.read_row_group(index).to_pandas()
+        stale = pd.MultiIndex.from_arrays([group['company'], pd.to_datetime(group['date'], utc=True).dt.date]).isin(keys)
+        if stale.any():
+            kept[index] = pa.Table.from_pandas(group[~stale], schema=parquet_file.schema_arrow, preserve_index=False)
+    if not kept:
+        parquet_file.close()
+        return
+    with pq.ParquetWriter(path + '.tmp', parquet_file.schema_arrow) as writer:
+        for index in range(parquet_file.num_row_groups):
+            writer.write_table(kept[index] if index in kept else parquet_file.read_row_group(index))
+    parquet_file.close()
+    os.replace(path + '.tmp', path)
+
+def get_target(name=BACKEND, location=None):
+    """
+    Build the load target for a backend name ('bigquery' or 'local').
+    """
+    if name == 'local':
+        return ParquetDatasetTarget(location or PARQUET_PATH)
+    return BigQueryTarget(location or STOCK_TABLE)
+
+def fetch_watermarks(target):
+    """
+    Return the latest loaded date per company.
+
+    Returns:
+        dict: Company mapped to its last loaded date
+    """
+    df = target.query("SELECT company, MAX(DATE(date)) AS watermark FROM {table} GROUP BY company")
+    if df.empty:
+        return {}
+    return {company: pd.Timestamp(value).date() for company, value in zip(df['company'], df['watermark'])}
+
+def existing_keys(target, batch):
+    """
+    Return the (company, date) keys of a batch that are already loaded.
+    """
+    df = target.query(
+        """
+        SELECT DISTINCT company, DATE(date) AS date
+        FROM {table}
+        WHERE company IN UNNEST(@companies)
+        AND DATE(date) BETWEEN @start_date AND @end_date
+        """,
+        companies=sorted(batch['company'].unique()),
+        start_date=batch['date'].min().date(),
+        end_date=batch['date'].max().date()
+    )
+    if df.empty:
+        return pd.MultiIndex.from_arrays([[], []])
+    return pd.MultiIndex.from_arrays([df['company'], pd.to_datetime(df['date']).dt.date])
+
+def _input_fingerprint(input_path):
+    stat = os.stat(input_path)
+    return {'input': os.path.abspath(input_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def _load_checkpoint(path, fingerprint):
+    if not os.path.exists(path):
+        return None
+    with open(path) as checkpoint_file:
+        state = json.load(checkpoint_file)
+    if state.get('completed') or state.get('fingerprint') != fingerprint:
+        return None
+    return state
+
+def _save_checkpoint(path, state):
+    with open(path + '.tmp', 'w') as checkpoint_file:
+        json.dump(state, checkpoint_file, indent=2)
+    os.replace(path + '.tmp', path)
+
+def load_incremental(
+    input_path,
+    target,
+    mode='append',
+    batch_size=100_000,
+    lookback_days=0,
+    checkpoint_path=None
+):
+    """
+    Load only the rows whose (company, date) keys are new since the last load.
+
+    Rows dated on or before a company's watermark (minus `lookback_days`)
+    are skipped without a lookup; the remaining rows of each batch are
+    checked against the keys already in the target, so re-running a load
+    never duplicates rows. In 'append' mode existing keys are left alone;
+    in 'upsert' mode their rows are replaced.
+
+    Progress is checkpointed after every batch. An interrupted load of the
+    same, unchanged input resumes after the last finished batch with the
+    watermarks it started with.
+
+    When every loaded row is dated after the table's previous last day,
+    running apps merge just those rows instead of rebuilding their caches
+    (see refresh.py), and the percentile sketches are updated in place.
+
+    Args:
+        input_path (str): Cleaned CSV or Parquet file
+        target (BigQueryTarget | ParquetDatasetTarget): Where to load
+        mode (str): 'append' or 'upsert'
+        batch_size (int): Rows per batch
+        lookback_days (int): Days before the watermark to re-check, e.g.
+            for restated prices
+        checkpoint_path (str): Checkpoint file (default: next to the input)
+
+    Returns:
+        dict: Final load state with row counts
+    """
+    if mode not in ('append', 'upsert'):
+        raise ValueError(f"Unknown load mode: {mode}")
+    checkpoint_path = checkpoint_path or f"{input_path}.{target.name}.load.json"
+    fingerprint = _input_fingerprint(input_path)
+
+    state = _load_checkpoint(checkpoint_path, fingerprint)
+    if state is None:
+        watermarks = fetch_watermarks(target)
+        state = {
+            'fingerprint': fingerprint,
+            'mode': mode,
+            'watermarks': {company: day.isoformat() for company, day in watermarks.items()},
+            'table_watermark': max(watermarks.values()).isoformat() if watermarks else None,
+            'append_only': True,
+            'next_batch': 0,
+            'rows_read': 0,
+            'rows_loaded': 0,
+            'completed': False
+        }
+        logger.info(f"Starting {mode} load of {input_path} into {target.name} ({len(watermarks)} companies loaded)")
+    else:
+        logger.info(f"Resuming load of {input_path} at batch {state['next_batch']}")
+
+    lookback = datetime.timedelta(days=lookback_days)
+    cutoffs = {company: pd.Timestamp(day) - lookback for company, day in state['watermarks'].items()}
+
+    for index, batch in enumerate(read_batches(input_path, batch_size)):
+        if index < state['next_batch']:
+            continue
+        with span('load_batch', batch=index) as record:
+            days = batch['date'].dt.tz_localize(None).dt.normalize()
+            cutoff = pd.to_datetime(batch['company'].map(cutoffs))
+            candidates = batch[cutoff.isna() | (days > cutoff)].drop_duplicates(['company', 'date'], keep='last')
+
+            if not candidates.empty:
+                keys = pd.MultiIndex.from_arrays([candidates['company'], candidates['date'].dt.date])
+                loaded = keys.isin(existing_keys(target, candidates))
+                if mode == 'append':
+                    candidates = candidates[~loaded]
+                    if not candidates.empty:
+                        target.append(candidates)
+                elif loaded.any():
+                    target.upsert(candidates)
+                else:
+                    target.append(candidates)
+
+            # A row on or before the table's previous last day rules out a delta refresh
+            table_watermark = state.get('table_watermark')
+            if not candidates.empty and (table_watermark is None or candidates['date'].min().date().isoformat() <= table_watermark):
+                state['append_only'] = False
+
+            record['rows'] = len(candidates)
+            state['next_batch'] = index + 1
+            state['rows_read'] += len(batch)
+            state['rows_loaded'] += len(candidates)
+            _save_checkpoint(checkpoint_path, state)
+
+    state['completed'] = True
+    _save_checkpoint(checkpoint_path, state)
+    append_only = bool(state.get('append_only')) and state.get('table_watermark') is not None
+    # Percentile sketches are written before running apps are told to reload
+    if state['rows_loaded']:
+        if append_only and os.path.exists(monthly_sketches.path):
+            watermark = datetime.date.fromisoformat(state['table_watermark'])
+            monthly_sketches.merge_rows(fetch_rows_since(watermark, target, table='{table}'))
+        else:
+            monthly_sketches.rebuild(target, table='{table}')
+    # Cached results no longer match the table
+    mark_data_loaded(info={
+        'watermark': state.get('table_watermark'),
+        'append_only': append_only,
+        'rows_loaded': state['rows_loaded']
+    })
+    company_catalog.invalidate()
+    disk_cache.clear()
+    result_cache.clear()
+    monthly_rollup.invalidate()
+    invalidate_price_store()
+    invalidate_volume_index()
+    logger.info(f"Load complete: {state['rows_loaded']} of {state['rows_read']} rows loaded")
+    return state
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally load cleaned stock data into stock_details.")
+    parser.add_argument('input', nargs='?', default='cleaned_data.parquet', help="Cleaned CSV or Parquet file")
+    parser.add_argument('--target', choices=['bigquery', 'local'], default=BACKEND, help="Backend to load into")
+    parser.add_argument('--location', help="BigQuery table or local Parquet file or directory (default: the app's)")
+    parser.add_argument('--mode', choices=['append', 'upsert'], default='append', help="Skip or replace rows whose keys are already loaded")
+    parser.add_argument('--batch-size', type=int, default=100_000, help="Rows per batch")
+    parser.add_argument('--lookback-days', type=int, default=0, help="Days before the watermark to re-check")
+    parser.add_argument('--checkpoint', help="Checkpoint file used to resume interrupted loads")
+    parser.add_argument('--restart', action='store_true', help="Ignore an unfinished checkpoint")
+    args = parser.parse_args()
+
+    target = get_target(args.target, args.location)
+    checkpoint_path = args.checkpoint or f"{args.input}.{target.name}.load.json"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    state = load_incremental(args.input, target, args.mode, args.batch_size, args.lookback_days, checkpoint_path)
+    print(f"Loaded {state['rows_loaded']} new rows of {state['rows_read']} read into {target.name}")
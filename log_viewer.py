@@ -0,0 +1,123 @@
+import os
+import re
+from collections import deque
+
+# Matches the format set in config.setup_logging
+_LINE_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2} [\d:,]+) - (\w+) - (.*)$')
+_BLOCK_SIZE = 64 * 1024
+
+class LogTail:
+    """
+    Incremental reader for the last events of a (rotating) log file.
+
+    The first read seeks backwards from the end of the file just far enough
+    to collect `max_events` events; later reads only parse the bytes
+    appended since the remembered offset. A rotation (new inode, or a file
+    shorter than the offset) restarts from the tail of the new file, so the
+    cost of a read never depends on the size of the log.
+    """
+
+    def __init__(self, path, max_events=500):
+        self.path = path
+        self.events = deque(maxlen=max_events)
+        self.offset = 0
+        self.inode = None
+
+    def refresh(self):
+        """
+        Read any events appended since the last call.
+
+        Returns:
+            deque: The retained events, oldest first, as dicts with
+                `time`, `level`, `event` and `message` keys
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self.events
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode = stat.st_ino
+            self.events.clear()
+            self.offset = self._tail_start(stat.st_size)
+
+        if stat.st_size > self.offset:
+            with open(self.path, 'rb') as log_file:
+                log_file.seek(self.offset)
+                data = log_file.read(stat.st_size - self.offset)
+            # Leave a partially written last line for the next refresh
+            complete = data.rfind(b'\n') + 1
+            self.offset += complete
+            for line in data[:complete].decode('utf-8', errors='replace').splitlines():
+                self._add_line(line)
+
+        return self.events
+
+    def _tail_start(self, size):
+        """
+        Find the offset of the line starting the last `maxlen` lines.
+        """
+        wanted = self.events.maxlen + 1
+        position = size
+        newlines = 0
+        with open(self.path, 'rb') as log_file:
+            while position > 0:
+                read_size = min(_BLOCK_SIZE, position)
+                position -= read_size
+                log_file.seek(position)
+                block = log_file.read(read_size)
+                newlines += block.count(b'\n')
+                if newlines >= wanted:
+                    # Skip to just after the newline that ends the excess lines
+                    excess = newlines - wanted
+                    cut = -1
+                    for _ in range(excess + 1):
+                        cut = block.index(b'\n', cut + 1)
+                    return position + cut + 1
+        return 0
+
+    def _add_line(self, line):
+        match = _LINE_PATTERN.match(line)
+        if match:
+            time, level, message = match.groups()
+            self.events.append({
+                'time': time,
+                'level': level,
+                'event': message.split(':', 1)[0] if ':' in message else message,
+                'message': message
+            })
+        elif self.events:
+            # Continuation line, e.g. a traceback
+            self.events[-1]['message'] += '\n' + line
+
+def filter_events(events, levels=None, event_types=None, limit=None):
+    """
+    Select log events by level and event type.
+
+    Args:
+        events (iterable): Events from `LogTail.refresh`
+        levels (list): Levels to keep, or None for all
+        event_types (list): Event types to keep, or None for all
+        limit (int): Keep only the last `limit` matching events
+
+    Returns:
+        list: Matching events, oldest first
+    """
+    selected = [
+        event for event in events
+        if (not levels or event['level'] in levels)
+        and (not event_types or event['event'] in event_types)
+    ]
+    return selected[-limit:] if limit else selected
+
+def format_events(events):
+    """
+    Render events back into log lines.
+
+    Args:
+        events (list): Events to render
+
+    Returns:
+        str: One line per event in the log file format
+    """
+    return '\n'.join(f"{event['time']} - {event['level']} - {event['message']}" for event in events)
@@ -2,32 +2,250 @@ import os
 import streamlit as st
 import pandas as pd
 
-from config import logger
-from database import get_companies, fetch_data_from_bigquery, fetch_avg_metrics
+from catalog import company_catalog
+from config import LOG_PATH, WARMUP, logger
+from database import get_companies
+from exports import EXPORT_FORMATS, daily_series_batches, export, export_path, frame_batches
+from figure_cache import figure_cache
+from instrumentation import start_trace
+from log_viewer import LogTail, filter_events, format_events
+from orchestrator import submit_fetches, iter_completed
+from page_data import fetch_page_data
+from quantile_sketches import fetch_quantile_bands
+from startup import start_warm_up
 from sidebar_controls import (
     create_company_selector, 
     create_date_range_selector, 
-    create_metric_controls
+    create_metric_controls,
+    create_smoothing_options,
+    create_band_toggle
 )
-from visualization import plot_main_chart, plot_average_metrics_chart
-from utils import display_pagination, fetch_stats_data
+from visualization import plot_main_chart, plot_average_metrics_subplots
+from utils import display_pagination
+from volume_index import top_companies_by_volume
+
+def render_charts(df, avg_metrics_df, chart_type, selected_metric, aggregation_method, metric_options, bands=None):
+    """
+    Render the main chart and the average metrics charts.
+
+    Args:
+        df (pd.DataFrame): Main chart data
+        avg_metrics_df (pd.DataFrame): Average metrics data
+        chart_type (str): Type of chart (Bar, Line, Area, Candlestick)
+        selected_metric (str): Metric to display
+        aggregation_method (str): Aggregation method used
+        metric_options (dict): Mapping of metric keys to display names
+        bands (pd.DataFrame): Optional P10/P90 band around the main chart
+    """
+    # Main Chart Section; figures are rebuilt only when their inputs change
+    st.subheader(f"Average {metric_options[selected_metric]} (Main Chart)")
+    main_chart = figure_cache.figure(
+        lambda: plot_main_chart(
+            df, 
+            chart_type, 
+            selected_metric, 
+            aggregation_method, 
+            metric_options,
+            bands
+        ).update_layout(showlegend=True),
+        (df, bands),
+        chart='main',
+        chart_type=chart_type,
+        metric=selected_metric,
+        aggregation=aggregation_method
+    )
+    st.plotly_chart(main_chart, use_container_width=True)
+
+    # Average Metrics Section, one subplot per metric
+    st.subheader("Average Metrics Overview")
+    avg_metrics = {
+        'avg_open': 'Average Opening Price',
+        'avg_high': 'Average Highest Price',
+        'avg_close': 'Average Closing Price',
+        'avg_low': 'Average Lowest Price',
+        'avg_volume': 'Average Trading Volume'
+    }
+
+    avg_chart = figure_cache.figure(
+        lambda: plot_average_metrics_subplots(avg_metrics_df, chart_type, avg_metrics),
+        (avg_metrics_df,),
+        chart='average_metrics',
+        chart_type=chart_type,
+        metrics=avg_metrics
+    )
+    st.plotly_chart(avg_chart, use_container_width=True)
+
+def render_stats(selected_companies, start_date, end_date, stats):
+    """
+    Render the Quick Stats section with pagination and an on-demand export.
+
+    Args:
+        selected_companies (list): Selected companies
+        start_date (date): Start date for data
+        end_date (date): End date for data
+        stats (pd.DataFrame): Quick Stats of every company with rows in the range
+    """
+    with st.expander("Quick Stats", expanded=True):
+        # Pagination controls
+        rows_per_page = st.selectbox(
+            "Rows per page",
+            options=[5, 10, 20, 50],
+            index=1,
+            key="rows_per_page"
+        )
+        
+        # Display the current page of the stats fetched with the charts
+        paginated_df = display_pagination(selected_companies, start_date, end_date, stats, rows_per_page)
+        st.dataframe(
+            paginated_df.style.format("{:.2f}", subset=[col for col in paginated_df.columns if col != 'company']),
+            use_container_width=True
+        )
+        
+        # Full stats are only written when an export is requested
+        render_export(
+            'stock_stats',
+            "Full Stats",
+            lambda: frame_batches(stats),
+            (tuple(selected_companies), start_date, end_date)
+        )
+
+def render_export(name, label, make_batches, signature):
+    """
+    Render a format picker and a button that generates an export on request.
+
+    Nothing is fetched or written until the button is pressed; the file is
+    then streamed to disk and stays downloadable until the format or the
+    export's parameters change.
+
+    Args:
+        name (str): Export name, used for widget keys and the file name
+        label (str): What is exported, e.g. "Full Stats"
+        make_batches (callable): Returns the export's Arrow record batches
+        signature (tuple): Parameters the export depends on
+    """
+    format_col, button_col = st.columns(2)
+    fmt = format_col.selectbox(
+        "Format",
+        options=list(EXPORT_FORMATS),
+        format_func=lambda key: EXPORT_FORMATS[key]['label'],
+        key=f"{name}_format"
+    )
+    if button_col.button(f"Prepare {label}", key=f"{name}_prepare"):
+        summary = export(make_batches(), fmt, export_path(name, fmt, signature), name=name)
+        st.session_state[f"{name}_export"] = (signature, fmt, summary)
+
+    prepared = st.session_state.get(f"{name}_export")
+    if prepared is None or prepared[:2] != (signature, fmt) or not os.path.exists(prepared[2]['path']):
+        return
+    summary = prepared[2]
+    with open(summary['path'], 'rb') as export_file:
+        st.download_button(
+            label=f"Download {label} ({EXPORT_FORMATS[fmt]['label']})",
+            data=export_file,
+            file_name=f"{name}{EXPORT_FORMATS[fmt]['extension']}",
+            mime=EXPORT_FORMATS[fmt]['mime'],
+            key=f"{name}_download"
+        )
+    st.caption(f"{summary['rows']:,} rows, {summary['bytes'] / 1e6:.1f} MB, generated in {summary['seconds']:.2f}s")
+
+def render_top_volume(top_df):
+    """
+    Render the companies with the highest total trading volume in the range.
+
+    Args:
+        top_df (pd.DataFrame): Output of `top_companies_by_volume`
+    """
+    st.subheader(f"Top {len(top_df)} Companies by Trading Volume")
+    st.dataframe(
+        top_df.set_index(pd.RangeIndex(1, len(top_df) + 1)).style.format({'total_volume': '{:,.0f}'}),
+        use_container_width=True
+    )
+
+def render_log_history():
+    """
+    Render the latest log events, read incrementally from the end of the log.
+    """
+    if st.session_state.get('log_tail') is None or st.session_state.log_tail.path != LOG_PATH:
+        st.session_state.log_tail = LogTail(LOG_PATH)
+    events = st.session_state.log_tail.refresh()
+
+    if not events:
+        st.write("No log history available yet.")
+        return
+
+    # Keep current selections selectable even if their events scrolled out
+    col1, col2 = st.columns(2)
+    levels = col1.multiselect(
+        "Levels",
+        sorted({event['level'] for event in events} | set(st.session_state.get('log_levels', []))),
+        key="log_levels"
+    )
+    event_types = col2.multiselect(
+        "Event types",
+        sorted({event['event'] for event in events} | set(st.session_state.get('log_event_types', []))),
+        key="log_event_types"
+    )
+    max_events = st.slider("Events to show", 10, 500, 100, key="log_max_events")
+
+    st.text_area("Log History", format_events(filter_events(events, levels, event_types, max_events)), height=300)
+
+def render_performance(trace):
+    """
+    Render where the current rerun's time went, from its timing spans.
+
+    Args:
+        trace (Trace): Spans recorded since the rerun started
+    """
+    spans = trace.frame()
+    if spans.empty:
+        st.write("No timing spans recorded in this rerun.")
+        return
+
+    queries = spans[spans['span'] == 'query']
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rerun time", f"{trace.wall_ms:,.0f} ms")
+    col2.metric("Backend queries", f"{len(queries)} ({queries['wall_ms'].sum():,.0f} ms)")
+    col3.metric("Cache hits", f"{spans['cache'].isin(['hit', 'subsumed']).sum()} of {spans['cache'].notna().sum()}")
+
+    summary = spans.groupby('span').agg(
+        calls=('wall_ms', 'size'),
+        total_ms=('wall_ms', 'sum'),
+        max_ms=('wall_ms', 'max'),
+        rows=('rows', 'sum')
+    ).sort_values('total_ms', ascending=False)
+    st.dataframe(summary, use_container_width=True)
+    st.dataframe(
+        spans[['start_ms', 'wall_ms', 'span', 'parent', 'thread', 'rows', 'result_bytes', 'bytes_processed', 'cache', 'status']],
+        use_container_width=True
+    )
 
 def main():
+    trace = start_trace()
+
     # App title and description
     st.title("Stock Market Explorer")
     st.markdown("Welcome to your stock adventure! Explore data from 2018-2023")
 
-    # Sidebar controls
-    all_companies = get_companies()
-    
+    # Sidebar controls; shared data warms up (once per process) while the company list loads
+    if WARMUP:
+        start_warm_up()
+    all_companies = submit_fetches({'companies': (get_companies,)}, fallbacks={'companies': []})['companies'].result()
+
+    # Merge rows written since the catalog's last day into the cached data (see refresh.py)
+    if all_companies and st.sidebar.button("Check for New Data", key="refresh_button"):
+        st.sidebar.caption(f"{company_catalog.refresh()} new rows merged")
+
     # Company selection
     selected_companies = create_company_selector(all_companies)
     
-    # Date range selection
-    start_date, end_date = create_date_range_selector()
+    # Date range selection, bounded by the selected companies' data
+    bounds = company_catalog.date_bounds(selected_companies) if all_companies else None
+    start_date, end_date = create_date_range_selector(bounds)
     
     # Metric and chart controls
     selected_metric, chart_type, aggregation_method, use_smoothing, window_size = create_metric_controls()
+    smoothing_method, overlay = create_smoothing_options(chart_type, use_smoothing)
+    show_bands = create_band_toggle(chart_type, aggregation_method)
 
     # Metric display options
     metric_options = {
@@ -38,98 +256,76 @@ def main():
         'volume': 'Trading Volume'
     }
 
-    # Fetch data
-    df = fetch_data_from_bigquery(
-        selected_companies,
-        start_date,
-        end_date,
-        selected_metric,
-        aggregation_method,
-        chart_type,
-        use_smoothing,
-        window_size
-    )
+    # Companies without rows in the range are never sent to the backend
+    if all_companies:
+        selected_companies = company_catalog.companies_in_range(selected_companies, start_date, end_date)
+    if not selected_companies:
+        st.warning("No data available for the selected companies in this date range.")
 
-    # Fetch average metrics
-    avg_metrics_df = fetch_avg_metrics(
-        selected_companies,
-        start_date,
-        end_date,
-        chart_type
-    )
+    # Chart and stats frames come from one fetch (see page_data.py); the
+    # other fetches run concurrently and each renders as it arrives
+    fetches = {
+        'charts': (
+            fetch_page_data,
+            selected_companies,
+            start_date,
+            end_date,
+            selected_metric,
+            aggregation_method,
+            chart_type,
+            use_smoothing,
+            window_size,
+            smoothing_method,
+            overlay
+        ),
+        'top_volume': (top_companies_by_volume, start_date, end_date, 10, selected_companies)
+    }
+    if show_bands:
+        fetches['bands'] = (fetch_quantile_bands, selected_companies, start_date, end_date, selected_metric, chart_type)
+    futures = submit_fetches(
+        fetches,
+        fallbacks={'charts': (pd.DataFrame(), pd.DataFrame(), pd.DataFrame()), 'bands': None}
+    ) if selected_companies else {}
+    chart_area = st.container()
+    stats_area = st.container()
+    top_volume_area = st.container()
+    has_data = False
 
-    # Main content
-    if not df.empty and not avg_metrics_df.empty:
-        # Main Chart Section
-        st.subheader(f"Average {metric_options[selected_metric]} (Main Chart)")
-        main_chart = plot_main_chart(
-            df, 
-            chart_type, 
-            selected_metric, 
-            aggregation_method, 
-            metric_options
-        )
-        main_chart.update_layout(showlegend=True)
-        st.plotly_chart(main_chart, use_container_width=True)
-
-        # Average Metrics Section
-        st.subheader("Average Metrics Overview")
-        avg_metrics = {
-            'avg_open': 'Average Opening Price',
-            'avg_high': 'Average Highest Price',
-            'avg_close': 'Average Closing Price',
-            'avg_low': 'Average Lowest Price',
-            'avg_volume': 'Average Trading Volume'
-        }
-
-        for metric, title in avg_metrics.items():
-            avg_chart = plot_average_metrics_chart(
-                avg_metrics_df, 
-                chart_type, 
-                metric, 
-                title
-            )
-            avg_chart.update_layout(showlegend=True)
-            st.plotly_chart(avg_chart, use_container_width=True)
-
-        # Stats Section with Pagination
-        with st.expander("Quick Stats", expanded=True):
-            # Fetch stats data
-            stats_df = fetch_stats_data(selected_companies, start_date, end_date)
-            
-            # Pagination controls
-            rows_per_page = st.selectbox(
-                "Rows per page",
-                options=[5, 10, 20, 50],
-                index=1,
-                key="rows_per_page"
-            )
-            
-            # Display paginated data
-            paginated_df = display_pagination(stats_df, rows_per_page)
-            st.dataframe(
-                paginated_df.style.format("{:.2f}", subset=[col for col in paginated_df.columns if col != 'company']),
-                use_container_width=True
-            )
-            
-            # Download button
-            st.download_button(
-                label="Download Full Stats (CSV)",
-                data=stats_df.to_csv(index=False),
-                file_name='stock_stats.csv',
-                mime='text/csv'
+    for name, result in iter_completed(futures):
+        if name == 'charts':
+            df, avg_metrics_df, stats = result
+            has_data = not df.empty and not avg_metrics_df.empty
+            # The band is drawn on the main chart, so wait for it here
+            bands = futures['bands'].result() if 'bands' in futures else None
+            with chart_area:
+                if has_data:
+                    render_charts(df, avg_metrics_df, chart_type, selected_metric, aggregation_method, metric_options, bands)
+                else:
+                    st.warning("No data available! Check your filters or connection.")
+            if not stats.empty:
+                with stats_area:
+                    render_stats(selected_companies, start_date, end_date, stats)
+        elif name == 'top_volume' and not result.empty:
+            with top_volume_area:
+                render_top_volume(result)
+
+    if has_data:
+        # Raw daily rows behind the main chart, streamed from the backend on request
+        with st.expander("Export Daily Series", expanded=False):
+            render_export(
+                'stock_daily_series',
+                "Daily Series",
+                lambda: daily_series_batches(selected_companies, start_date, end_date),
+                (tuple(selected_companies), start_date, end_date)
             )
 
         # Display log history
         with st.expander("Change History", expanded=False):
-            if os.path.exists('stock_explorer.log'):
-                with open('stock_explorer.log', 'r') as log_file:
-                    log_content = log_file.read()
-                st.text_area("Log History", log_content, height=300)
-            else:
-                st.write("No log history available yet.")
-    else:
-        st.warning("No data available! Check your filters or connection.")
+            render_log_history()
+
+    if st.sidebar.checkbox("Show performance", key="show_performance"):
+        with st.expander("Performance", expanded=True):
+            render_performance(trace)
 
     # Footer
     st.markdown("---")
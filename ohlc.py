@@ -0,0 +1,86 @@
+import pandas as pd
+
+# Candlesticks drawn on one chart, shared between its companies, before
+# bars widen to the next resolution
+BAR_BUDGET = 2000
+
+# Bar resolutions from finest to coarsest: BigQuery DATE_TRUNC unit and
+# the average number of calendar days one bar covers
+RESOLUTIONS = {
+    'daily': {'unit': None, 'days': 7 / 5},
+    'weekly': {'unit': 'ISOWEEK', 'days': 7},
+    'monthly': {'unit': 'MONTH', 'days': 365.25 / 12},
+    'quarterly': {'unit': 'QUARTER', 'days': 365.25 / 4}
+}
+
+OHLC_COLUMNS = ['open', 'high', 'low', 'close']
+
+def choose_resolution(start_date, end_date, n_companies, bar_budget=BAR_BUDGET):
+    """
+    Pick the finest bar resolution whose candlesticks fit the budget.
+
+    Args:
+        start_date (date): Start date of the chart
+        end_date (date): End date of the chart
+        n_companies (int): Companies drawn
+        bar_budget (int): Most bars on the chart, over all companies
+
+    Returns:
+        str: Key of `RESOLUTIONS`; 'quarterly' if nothing fits
+    """
+    days = (end_date - start_date).days + 1
+    for resolution, spec in RESOLUTIONS.items():
+        if max(n_companies, 1) * days / spec['days'] <= bar_budget:
+            return resolution
+    return 'quarterly'
+
+def period_starts(dates, resolution):
+    """
+    Map dates to the first day of their bar.
+
+    Args:
+        dates (pd.Series): UTC datetimes
+        resolution (str): Key of `RESOLUTIONS`
+
+    Returns:
+        pd.Series: Bar start dates (UTC), aligned with `dates`
+    """
+    naive = dates.dt.tz_localize(None).dt.normalize()
+    if resolution == 'daily':
+        starts = naive
+    elif resolution == 'weekly':
+        # ISO weeks start on Monday, like DATE_TRUNC(..., ISOWEEK)
+        starts = naive - pd.to_timedelta(naive.dt.weekday, unit='D')
+    else:
+        starts = naive.dt.to_period('M' if resolution == 'monthly' else 'Q').dt.to_timestamp()
+    return starts.dt.tz_localize('UTC')
+
+def resample_ohlc(df, resolution):
+    """
+    Aggregate daily OHLC rows into bars of the given resolution.
+
+    Each bar opens at its first day's open, closes at its last day's close
+    and spans the highest high and lowest low in between.
+
+    Args:
+        df (pd.DataFrame): `company`, `date` and OHLC columns
+        resolution (str): Key of `RESOLUTIONS`
+
+    Returns:
+        pd.DataFrame: `company`, `date` (bar start) and OHLC columns, ordered
+            by company and date, with the resolution in `attrs['resolution']`
+    """
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown OHLC resolution: {resolution}")
+    df = df.sort_values(['company', 'date'], kind='stable')
+    if resolution == 'daily':
+        bars = df[['company', 'date', *OHLC_COLUMNS]].reset_index(drop=True)
+    else:
+        bars = df.groupby([df['company'], period_starts(df['date'], resolution)], sort=True).agg(
+            open=('open', 'first'),
+            high=('high', 'max'),
+            low=('low', 'min'),
+            close=('close', 'last')
+        ).reset_index()
+    bars.attrs['resolution'] = resolution
+    return bars
@@ -0,0 +1,52 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import pandas as pd
+from config import FETCH_WORKERS, logger
+
+# Shared by every Streamlit session; backend calls are I/O bound, so threads
+# overlap their round trips
+_executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix='fetch')
+
+def _isolated(name, func, args, fallback):
+    try:
+        return func(*args)
+    except Exception as e:
+        logger.error(f"Concurrent fetch '{name}' failed: {e}")
+        return fallback
+
+def submit_fetches(jobs, fallbacks=None):
+    """
+    Start independent backend fetches concurrently.
+
+    A failing job is logged and resolves to its fallback value (an empty
+    DataFrame unless given), like the `try/except` blocks of the fetch
+    functions, so it cannot affect the other jobs.
+
+    Args:
+        jobs (dict): Job name mapped to a `(func, *args)` tuple
+        fallbacks (dict): Optional job name mapped to its result on failure
+
+    Returns:
+        dict: Job name mapped to its Future
+    """
+    fallbacks = fallbacks or {}
+    return {
+        name: _executor.submit(
+            contextvars.copy_context().run, _isolated, name, job[0], job[1:], fallbacks.get(name, pd.DataFrame())
+        )
+        for name, job in jobs.items()
+    }
+
+def iter_completed(futures):
+    """
+    Yield fetch results in completion order.
+
+    Args:
+        futures (dict): Output of `submit_fetches`
+
+    Yields:
+        tuple: Job name and its result
+    """
+    names = {future: name for name, future in futures.items()}
+    for future in as_completed(names):
+        yield names[future], future.result()
@@ -0,0 +1,164 @@
+import pandas as pd
+from database import fetch_daily_rows
+from ohlc import choose_resolution, resample_ohlc
+from quantile_sketches import fetch_range_median
+from rollups import STATS_COLUMNS, fetch_range_partials, partials_to_averages, partials_to_metric
+from instrumentation import traced
+from smoothing import overlay_windows, smooth
+
+# Pandas equivalents of the SQL aggregations offered in the sidebar
+PANDAS_AGGREGATIONS = {
+    'AVG': 'mean',
+    'APPROX_QUANTILES': 'median',
+    'SUM': 'sum'
+}
+
+PRICE_COLUMNS = ['open', 'high', 'close', 'low', 'volume']
+
+def derive_main_frame(
+    rows,
+    metric,
+    aggregation_method,
+    chart_type,
+    use_smoothing=False,
+    window_size=7,
+    smoothing_method='sma',
+    overlay=(),
+    resolution=None
+):
+    """
+    Derive the main chart frame from the daily rows.
+
+    Mirrors the queries in `database.fetch_data_from_bigquery`.
+
+    Args:
+        rows (pd.DataFrame): Daily rows from `fetch_daily_rows`
+        metric (str): Stock metric to chart (open/close/high/low/volume)
+        aggregation_method (str): SQL aggregation method used for Bar charts
+        chart_type (str): Type of chart to generate
+        use_smoothing (bool): Apply moving average smoothing
+        window_size (int): Size of smoothing window
+        smoothing_method (str): Moving average from `smoothing.SMOOTHING_METHODS`
+        overlay (tuple): Extra window sizes drawn alongside `window_size`
+        resolution (str): Candlestick bar resolution from `ohlc.RESOLUTIONS`
+            (default: chosen from the rows' date span and companies)
+
+    Returns:
+        pd.DataFrame: Main chart data; with `overlay`, one copy of the
+            series per window size, labelled in a `window` column
+    """
+    if chart_type == 'Bar':
+        return rows.groupby('company', as_index=False)[metric].agg(PANDAS_AGGREGATIONS[aggregation_method])
+
+    if chart_type == 'Candlestick':
+        if resolution is None:
+            resolution = choose_resolution(
+                rows['date'].min().date(), rows['date'].max().date(), rows['company'].nunique()
+            )
+        return resample_ohlc(rows, resolution)
+
+    df = rows[['company', 'date', metric]].reset_index(drop=True)
+    if not use_smoothing:
+        return df
+    if overlay:
+        return overlay_windows(df, metric, sorted({window_size, *overlay}), smoothing_method)
+    # 'sma' matches ROWS BETWEEN window_size - 1 PRECEDING AND CURRENT ROW
+    df[metric] = smooth(df, metric, window_size, smoothing_method)
+    return df
+
+def derive_avg_metrics(rows, chart_type):
+    """
+    Derive the average metrics frame from the daily rows.
+
+    Mirrors the queries in `database.fetch_avg_metrics`.
+
+    Args:
+        rows (pd.DataFrame): Daily rows from `fetch_daily_rows`
+        chart_type (str): Type of chart to generate
+
+    Returns:
+        pd.DataFrame: Average stock metrics per company (Bar) or per company and day
+    """
+    keys = ['company'] if chart_type == 'Bar' else ['company', 'date']
+    df = rows.groupby(keys, as_index=False)[PRICE_COLUMNS].mean()
+    return df.rename(columns={col: f"avg_{col}" for col in PRICE_COLUMNS})
+
+def derive_stats(rows):
+    """
+    Derive the Quick Stats frame from the daily rows.
+
+    Matches `utils.fetch_stats_data`, which serves them from the rollup cube.
+
+    Args:
+        rows (pd.DataFrame): Daily rows from `fetch_daily_rows`
+
+    Returns:
+        pd.DataFrame: Aggregate statistics per company
+    """
+    return derive_avg_metrics(rows, 'Bar')[STATS_COLUMNS]
+
+def _bar_frames(selected_companies, start_date, end_date, metric, aggregation_method):
+    # Bar charts come from the monthly rollup cube and quantile sketches
+    partials = fetch_range_partials(selected_companies, start_date, end_date)
+    if partials.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    if aggregation_method == 'APPROX_QUANTILES':
+        df = fetch_range_median(selected_companies, start_date, end_date, metric)
+    else:
+        df = partials_to_metric(partials, metric, aggregation_method)
+    return df, partials_to_averages(partials)
+
+def _row_frames(rows, selected_companies, start_date, end_date, metric, aggregation_method, chart_type, *smoothing):
+    # Every other chart type is derived from the daily rows
+    resolution = choose_resolution(start_date, end_date, len(selected_companies))
+    return (
+        derive_main_frame(rows, metric, aggregation_method, chart_type, *smoothing, resolution=resolution),
+        derive_avg_metrics(rows, chart_type)
+    )
+
+@traced('fetch_page_data')
+def fetch_page_data(
+    selected_companies,
+    start_date,
+    end_date,
+    metric,
+    aggregation_method,
+    chart_type,
+    use_smoothing=False,
+    window_size=7,
+    smoothing_method='sma',
+    overlay=()
+):
+    """
+    Scan the filtered rows once and derive every frame the main page needs.
+
+    Bar charts skip the row scan entirely: averages and totals come from
+    the monthly rollup cube and medians from the monthly quantile sketches.
+
+    Args:
+        selected_companies (list): List of companies to fetch
+        start_date (date): Start date for data
+        end_date (date): End date for data
+        metric (str): Stock metric to query (open/close/high/low/volume)
+        aggregation_method (str): SQL aggregation method
+        chart_type (str): Type of chart to generate
+        use_smoothing (bool): Apply moving average smoothing
+        window_size (int): Size of smoothing window
+        smoothing_method (str): Moving average from `smoothing.SMOOTHING_METHODS`
+        overlay (tuple): Extra window sizes drawn alongside `window_size`
+
+    Returns:
+        tuple: Main chart, average metrics and stats DataFrames
+    """
+    if chart_type == 'Bar':
+        df, avg_metrics_df = _bar_frames(selected_companies, start_date, end_date, metric, aggregation_method)
+        return df, avg_metrics_df, avg_metrics_df[STATS_COLUMNS] if not df.empty else pd.DataFrame()
+
+    rows = fetch_daily_rows(selected_companies, start_date, end_date)
+    if rows.empty:
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+    df, avg_metrics_df = _row_frames(
+        rows, selected_companies, start_date, end_date, metric, aggregation_method, chart_type,
+        use_smoothing, window_size, smoothing_method, overlay
+    )
+    return df, avg_metrics_df, derive_stats(rows)
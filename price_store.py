@@ -0,0 +1,207 @@
+import datetime
+import threading
+import numpy as np
+import pandas as pd
+from backends import get_backend
+from config import STOCK_TABLE, logger
+from instrumentation import traced
+
+PRICE_METRICS = ['open', 'high', 'low', 'close', 'volume']
+# float32 holds integers exactly only up to 2**24, below many daily volumes
+METRIC_DTYPES = {'open': np.float32, 'high': np.float32, 'low': np.float32, 'close': np.float32, 'volume': np.float64}
+EPOCH = datetime.date(1970, 1, 1)
+
+class PriceStore:
+    """
+    Compact, read-only columnar copy of the daily OHLCV rows.
+
+    Rows are sorted by company and date. Companies are dictionary-encoded
+    (their rows are the contiguous range `offsets[code]:offsets[code + 1]`),
+    dates are int32 days since 1970-01-01 and each metric is one contiguous
+    array (float32 for prices, float64 for volumes so they stay exact),
+    about a quarter of the memory of the equivalent pandas frame. Slices
+    by company and date range are zero-copy numpy views.
+    """
+
+    def __init__(self, companies, offsets, days, metrics):
+        self.companies = companies
+        self.company_codes = {company: code for code, company in enumerate(companies)}
+        self.offsets = offsets
+        self.days = days
+        self.metrics = metrics
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build a store from a frame of daily rows.
+
+        Args:
+            df (pd.DataFrame): Rows with `company`, `date` and OHLCV columns
+
+        Returns:
+            PriceStore: The compacted rows
+        """
+        dates = pd.to_datetime(df['date'], utc=True).dt.tz_localize(None)
+        days = dates.to_numpy().astype('datetime64[D]').astype(np.int32)
+        codes, companies = pd.factorize(df['company'], sort=True)
+        order = np.lexsort((days, codes))
+        codes = codes[order]
+        return cls(
+            companies=np.asarray(companies, dtype=object),
+            offsets=np.searchsorted(codes, np.arange(len(companies) + 1)),
+            days=np.ascontiguousarray(days[order]),
+            metrics={m: np.ascontiguousarray(df[m].to_numpy(dtype=METRIC_DTYPES[m])[order]) for m in PRICE_METRICS}
+        )
+
+    @property
+    def nbytes(self):
+        """
+        int: Memory held by the store's arrays.
+        """
+        return int(self.offsets.nbytes + self.days.nbytes + sum(a.nbytes for a in self.metrics.values()))
+
+    def extended(self, rows):
+        """
+        Return a store that also holds some new rows, without querying the backend.
+
+        Args:
+            rows (pd.DataFrame): New rows with `company`, `date` and OHLCV columns
+
+        Returns:
+            PriceStore: Combined store
+        """
+        existing = pd.DataFrame({
+            'company': np.repeat(self.companies, np.diff(self.offsets)),
+            'date': pd.to_datetime(self.days, unit='D', utc=True)
+        })
+        for m in PRICE_METRICS:
+            existing[m] = self.metrics[m]
+        return PriceStore.from_frame(pd.concat([existing, rows[existing.columns]], ignore_index=True))
+
+    def row_range(self, company, start_date, end_date):
+        """
+        Locate one company's rows within a date range.
+
+        Args:
+            company (str): Company name
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
+
+        Returns:
+            tuple: (start, stop) row positions; empty if the company is unknown
+        """
+        code = self.company_codes.get(company)
+        if code is None:
+            return 0, 0
+        lo, hi = self.offsets[code], self.offsets[code + 1]
+        company_days = self.days[lo:hi]
+        return (
+            lo + int(np.searchsorted(company_days, (start_date - EPOCH).days, side='left')),
+            lo + int(np.searchsorted(company_days, (end_date - EPOCH).days, side='right'))
+        )
+
+    def slice(self, company, start_date, end_date):
+        """
+        Return zero-copy views of one company's rows within a date range.
+
+        Args:
+            company (str): Company name
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
+
+        Returns:
+            dict: `days` and each metric mapped to a numpy view
+        """
+        start, stop = self.row_range(company, start_date, end_date)
+        views = {'days': self.days[start:stop]}
+        views.update({m: values[start:stop] for m, values in self.metrics.items()})
+        return views
+
+    def frame(self, selected_companies, start_date, end_date):
+        """
+        Materialise the rows of several companies as a daily rows frame.
+
+        The result matches `database.fetch_daily_rows`: ordered by company
+        and date, UTC timestamps and float64 values.
+
+        Args:
+            selected_companies (list): List of companies
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
+
+        Returns:
+            pd.DataFrame: Daily rows
+        """
+        codes = sorted(self.company_codes[c] for c in set(selected_companies) if c in self.company_codes)
+        ranges = [self.row_range(self.companies[code], start_date, end_date) for code in codes]
+        lengths = np.array([stop - start for start, stop in ranges], dtype=np.int64)
+        positions = np.concatenate([np.arange(start, stop) for start, stop in ranges]) if ranges else np.empty(0, dtype=np.int64)
+
+        df = pd.DataFrame({
+            'company': self.companies[np.repeat(np.array(codes, dtype=np.int64), lengths)],
+            'date': pd.to_datetime(self.days[positions], unit='D', utc=True)
+        })
+        for m in PRICE_METRICS:
+            df[m] = self.metrics[m][positions].astype(np.float64)
+        return df
+
+@traced('load_price_store')
+def load_price_store():
+    """
+    Load every daily row from the backend into a `PriceStore`.
+
+    Returns:
+        PriceStore: Compact copy of the full table
+    """
+    logger.info("Loading shared price store")
+    query = f"""
+        SELECT
+            company,
+            DATE(date) AS date,
+            CAST(open AS FLOAT64) AS open,
+            CAST(high AS FLOAT64) AS high,
+            CAST(low AS FLOAT64) AS low,
+            CAST(close AS FLOAT64) AS close,
+            CAST(volume AS FLOAT64) AS volume
+        FROM {STOCK_TABLE}
+        """
+    return PriceStore.from_frame(get_backend().query(query))
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_price_store():
+    """
+    Return the process-wide price store, loading it on first use.
+
+    Every Streamlit session in the process shares this one copy.
+
+    Returns:
+        PriceStore: Shared store
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = load_price_store()
+    return _store
+
+def invalidate_price_store():
+    """
+    Drop the shared store so the next request reloads it, e.g. after a data load.
+    """
+    global _store
+    with _store_lock:
+        _store = None
+
+def extend_price_store(rows):
+    """
+    Add newly loaded rows to the shared store, if it has been loaded.
+
+    Args:
+        rows (pd.DataFrame): New daily rows
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store = _store.extended(rows)
@@ -0,0 +1,366 @@
+import argparse
+import datetime
+import os
+import threading
+import pandas as pd
+from backends import get_backend
+from cache import result_cache
+from config import SKETCH_PATH, STOCK_TABLE, logger
+from instrumentation import traced
+from rollups import ROLLUP_METRICS, _full_month_span, _month_end
+from sketches import KLLSketch
+
+# Percentiles drawn as a band around the main chart
+BAND_QUANTILES = (0.1, 0.9)
+
+def quantile_column(q):
+    """
+    Returns:
+        str: Column name of a quantile in result frames, e.g. 'p10' for 0.1
+    """
+    return f"p{round(q * 100):g}"
+
+def build_monthly_sketches(rows):
+    """
+    Sketch every metric of every company and month.
+
+    Args:
+        rows (pd.DataFrame): `company`, `date` and the `ROLLUP_METRICS` columns
+
+    Returns:
+        pd.DataFrame: `company`, `month`, `metric` and the serialized `sketch`
+    """
+    months = pd.to_datetime(rows['date']).dt.tz_localize(None).dt.to_period('M').dt.to_timestamp()
+    records = []
+    for (company, month), group in rows.groupby([rows['company'], months], sort=True):
+        for metric in ROLLUP_METRICS:
+            sketch = KLLSketch(seed=0)
+            sketch.update(group[metric].to_numpy())
+            records.append((company, month, metric, sketch.to_bytes()))
+    return pd.DataFrame.from_records(records, columns=['company', 'month', 'metric', 'sketch'])
+
+class MonthlySketches:
+    """
+    Per-company, per-month KLL quantile sketches of the OHLCV columns,
+    stored serialized in a Parquet file next to the app.
+
+    The file is written at load time (see loader.py) or by running this
+    module, and read on first use. The app never builds it: until the file
+    exists, percentiles are computed by the backend with SQL, one query per
+    request, rather than by a full scan at startup. A percentile over a range
+    merges the sketches of the complete months inside it and adds the daily
+    values of the (at most two) partial months at its edges, fetched with
+    one small query, like `MonthlyRollup`.
+
+    Error bound: a month of daily rows holds far fewer than k=200 values, so
+    each stored sketch is exact. Merged sketches keep the KLL guarantee: the
+    rank of a returned percentile is within about 1.65% of the requested rank
+    (99% confidence), e.g. the reported median lies between the 48.35th and
+    51.65th percentiles of the range. Ranges of up to roughly nine months
+    per company are answered exactly.
+    """
+
+    def __init__(self, path=SKETCH_PATH, backend=None):
+        self.path = path
+        self._backend = backend
+        self._frame = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def frame(self):
+        """
+        Return the sketch table, reading it on first use.
+
+        Returns:
+            pd.DataFrame: One row per company, month and metric, or None if
+                the sketch file has not been built
+        """
+        with self._lock:
+            if self._frame is None and os.path.exists(self.path):
+                self._frame = pd.read_parquet(self.path)
+            return self._frame
+
+    def invalidate(self):
+        """
+        Drop the in-memory sketches so the next request re-reads the file.
+        """
+        with self._lock:
+            self._frame = None
+
+    def rebuild(self, source=None, table=STOCK_TABLE):
+        """
+        Rebuild the sketch file from a full scan, e.g. at the end of a load.
+
+        Args:
+            source: Anything with a `query(sql, **params)` method returning a
+                DataFrame, such as a loader target (default: the app's backend)
+            table (str): Table to scan, as `source` expects it in SQL
+        """
+        frame = self._build(source or self.backend, table)
+        self._save(frame)
+        with self._lock:
+            self._frame = frame
+
+    def merge_rows(self, rows):
+        """
+        Fold newly loaded daily rows into the sketches of their months and
+        save the file, without scanning the table.
+
+        Does nothing if no sketch file has been built yet.
+
+        Args:
+            rows (pd.DataFrame): New rows with `company`, `date` and the
+                `ROLLUP_METRICS` columns
+        """
+        if rows.empty:
+            return
+        delta = build_monthly_sketches(rows)
+        with self._lock:
+            frame = self._frame
+            if frame is None:
+                if not os.path.exists(self.path):
+                    return
+                frame = pd.read_parquet(self.path)
+            keys = ['company', 'month', 'metric']
+            merged = frame.merge(delta, on=keys, how='outer', suffixes=('', '_new'), sort=True)
+            both = merged['sketch'].notna() & merged['sketch_new'].notna()
+            merged.loc[both, 'sketch'] = [
+                KLLSketch.merge_all([KLLSketch.from_bytes(old), KLLSketch.from_bytes(new)], seed=0).to_bytes()
+                for old, new in zip(merged.loc[both, 'sketch'], merged.loc[both, 'sketch_new'])
+            ]
+            merged['sketch'] = merged['sketch'].fillna(merged['sketch_new'])
+            frame = merged[keys + ['sketch']].reset_index(drop=True)
+            self._save(frame)
+            self._frame = frame
+
+    @traced('sketch_build')
+    def _build(self, source, table=STOCK_TABLE):
+        logger.info("Building monthly quantile sketches")
+        columns = ",\n".join(f"CAST({m} AS FLOAT64) AS {m}" for m in ROLLUP_METRICS)
+        query = f"""
+            SELECT
+                company,
+                DATE(date) AS date,
+                {columns}
+            FROM {table}
+            ORDER BY company, DATE(date)
+            """
+        return build_monthly_sketches(source.query(query))
+
+    def _save(self, frame):
+        frame.to_parquet(self.path + '.tmp', index=False)
+        os.replace(self.path + '.tmp', self.path)
+
+    def quantiles(self, selected_companies, start_date, end_date, metric, qs):
+        """
+        Estimate percentiles of one metric per company over a date range.
+
+        Args:
+            selected_companies (list): List of companies
+            start_date (date): Start date for data
+            end_date (date): End date for data
+            metric (str): Stock metric (open/close/high/low/volume)
+            qs (tuple): Quantiles in [0, 1]
+
+        Returns:
+            pd.DataFrame: `company` and one column per quantile ('p10', ...),
+                for companies with rows in the range
+        """
+        frame = self.frame()
+        if frame is None:
+            return self._sql_quantiles(selected_companies, start_date, end_date, metric, qs)
+
+        first_full, last_full = _full_month_span(start_date, end_date)
+        sketches = {company: [] for company in selected_companies}
+        edges = []
+
+        if first_full is None:
+            edges.append((start_date, end_date))
+        else:
+            months = frame[
+                (frame['metric'] == metric)
+                & frame['company'].isin(selected_companies)
+                & frame['month'].between(pd.Timestamp(first_full), pd.Timestamp(last_full))
+            ]
+            for company, data in zip(months['company'], months['sketch']):
+                sketches[company].append(KLLSketch.from_bytes(data))
+            if start_date < first_full:
+                edges.append((start_date, first_full - datetime.timedelta(days=1)))
+            if end_date > _month_end(last_full):
+                edges.append((_month_end(last_full) + datetime.timedelta(days=1), end_date))
+
+        if edges:
+            edge_rows = self._edge_values(selected_companies, edges, metric)
+            for company, values in edge_rows.groupby('company')['value']:
+                edge_sketch = KLLSketch(seed=0)
+                edge_sketch.update(values.to_numpy())
+                sketches[company].append(edge_sketch)
+
+        records = []
+        for company, parts in sketches.items():
+            merged = KLLSketch.merge_all(parts, seed=0)
+            if merged.n:
+                records.append((company, *merged.quantiles(qs)))
+        return pd.DataFrame.from_records(records, columns=['company', *map(quantile_column, qs)])
+
+    def _edge_values(self, selected_companies, edges, metric):
+        conditions = " OR ".join(
+            f"DATE(date) BETWEEN @edge{i}_start AND @edge{i}_end" for i in range(len(edges))
+        )
+        params = {}
+        for i, (edge_start, edge_end) in enumerate(edges):
+            params[f"edge{i}_start"] = edge_start
+            params[f"edge{i}_end"] = edge_end
+
+        query = f"""
+            SELECT
+                company,
+                CAST({metric} AS FLOAT64) AS value
+            FROM {STOCK_TABLE}
+            WHERE company IN UNNEST(@companies)
+            AND ({conditions})
+            """
+        return self.backend.query(query, companies=list(selected_companies), **params)
+
+    def _sql_quantiles(self, selected_companies, start_date, end_date, metric, qs, monthly=False):
+        # Percentiles computed by the backend, used while the sketch file is missing
+        logger.info(f"No sketch file at {self.path}; computing percentiles of {metric} with SQL")
+        columns = ",\n".join(
+            f"APPROX_QUANTILES(CAST({metric} AS FLOAT64), 100)[OFFSET({round(q * 100)})] AS {quantile_column(q)}"
+            for q in qs
+        )
+        keys = "company, month" if monthly else "company"
+        query = f"""
+            SELECT
+                company,
+                {"DATE_TRUNC(DATE(date), MONTH) AS month," if monthly else ""}
+                {columns}
+            FROM {STOCK_TABLE}
+            WHERE company IN UNNEST(@companies)
+            AND DATE(date) BETWEEN @start_date AND @end_date
+            GROUP BY {keys}
+            ORDER BY {keys}
+            """
+        return self.backend.query(query, companies=list(selected_companies), start_date=start_date, end_date=end_date)
+
+    def monthly_bands(self, selected_companies, start_date, end_date, metric, qs=BAND_QUANTILES):
+        """
+        Percentiles of one metric per company and calendar month.
+
+        Months overlapping the range are summarised whole, straight from
+        their stored sketches.
+
+        Args:
+            selected_companies (list): List of companies
+            start_date (date): Start date for data
+            end_date (date): End date for data
+            metric (str): Stock metric (open/close/high/low/volume)
+            qs (tuple): Quantiles in [0, 1]
+
+        Returns:
+            pd.DataFrame: `company`, `date` (month start, UTC) and one column
+                per quantile
+        """
+        frame = self.frame()
+        if frame is None:
+            bands = self._sql_quantiles(
+                selected_companies, start_date.replace(day=1), _month_end(end_date), metric, qs, monthly=True
+            )
+            if bands.empty:
+                return bands
+            bands.insert(1, 'date', pd.to_datetime(bands.pop('month')).dt.as_unit('ns').dt.tz_localize('UTC'))
+            return bands
+
+        months = frame[
+            (frame['metric'] == metric)
+            & frame['company'].isin(selected_companies)
+            & frame['month'].between(pd.Timestamp(start_date.replace(day=1)), pd.Timestamp(end_date))
+        ]
+        values = [KLLSketch.from_bytes(data).quantiles(qs) for data in months['sketch']]
+        bands = pd.DataFrame(values, columns=list(map(quantile_column, qs)), index=months.index)
+        bands.insert(0, 'date', months['month'].dt.tz_localize('UTC'))
+        bands.insert(0, 'company', months['company'])
+        return bands.reset_index(drop=True)
+
+# Process-wide sketches shared by every Streamlit session
+monthly_sketches = MonthlySketches()
+
+@traced('fetch_range_quantiles')
+def fetch_range_quantiles(selected_companies, start_date, end_date, metric, qs=(0.5,)):
+    """
+    Fetch per-company percentiles of a metric from the sketches, via the result cache.
+
+    Args:
+        selected_companies (list): List of companies
+        start_date (date): Start date for data
+        end_date (date): End date for data
+        metric (str): Stock metric (open/close/high/low/volume)
+        qs (tuple): Quantiles in [0, 1]
+
+    Returns:
+        pd.DataFrame: `company` and one column per quantile, empty on failure
+    """
+    shape = ('range_quantiles', metric, tuple(qs))
+    cached = result_cache.get(shape, selected_companies, start_date, end_date)
+    if cached is not None:
+        return cached
+
+    logger.info(f"Fetching sketch quantiles: companies={selected_companies}, metric={metric}, qs={qs}")
+    try:
+        df = monthly_sketches.quantiles(selected_companies, start_date, end_date, metric, qs)
+        result_cache.put(shape, selected_companies, start_date, end_date, df)
+        return df
+    except Exception as e:
+        logger.error(f"Sketch quantiles failed: {e}")
+        return pd.DataFrame()
+
+def fetch_range_median(selected_companies, start_date, end_date, metric):
+    """
+    Fetch the Bar main chart frame for the 'Median' aggregation.
+
+    Args:
+        selected_companies (list): List of companies
+        start_date (date): Start date for data
+        end_date (date): End date for data
+        metric (str): Stock metric (open/close/high/low/volume)
+
+    Returns:
+        pd.DataFrame: Median of the metric per company
+    """
+    df = fetch_range_quantiles(selected_companies, start_date, end_date, metric, (0.5,))
+    return df.rename(columns={'p50': metric})
+
+@traced('fetch_quantile_bands')
+def fetch_quantile_bands(selected_companies, start_date, end_date, metric, chart_type):
+    """
+    Fetch the P10/P90 band drawn around the main chart.
+
+    Args:
+        selected_companies (list): List of companies
+        start_date (date): Start date for data
+        end_date (date): End date for data
+        metric (str): Stock metric (open/close/high/low/volume)
+        chart_type (str): 'Bar' for one band per company over the range,
+            otherwise one per company and month
+
+    Returns:
+        pd.DataFrame: Band frame for `visualization.plot_main_chart`, empty on failure
+    """
+    if chart_type == 'Bar':
+        return fetch_range_quantiles(selected_companies, start_date, end_date, metric, BAND_QUANTILES)
+    try:
+        return monthly_sketches.monthly_bands(selected_companies, start_date, end_date, metric)
+    except Exception as e:
+        logger.error(f"Sketch bands failed: {e}")
+        return pd.DataFrame()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the monthly quantile sketch file from a full scan.")
+    parser.add_argument('--path', default=SKETCH_PATH, help="Sketch file to write (default: the app's)")
+    args = parser.parse_args()
+
+    MonthlySketches(args.path).rebuild()
+    print(f"Wrote monthly quantile sketches to {args.path}")
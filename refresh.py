@@ -0,0 +1,132 @@
+import pandas as pd
+from backends import get_backend
+from cache import result_cache
+from config import STOCK_TABLE, logger
+from disk_cache import uncached
+from instrumentation import annotate, traced
+from ohlc import OHLC_COLUMNS
+from price_store import PRICE_METRICS, extend_price_store
+from quantile_sketches import monthly_sketches
+from rollups import monthly_rollup
+from smoothing import extend_smoothed
+from volume_index import extend_volume_index
+
+@traced('fetch_rows_since')
+def fetch_rows_since(watermark, source=None, table=STOCK_TABLE):
+    """
+    Fetch the daily rows dated after a watermark.
+
+    Args:
+        watermark (date): Last day already merged
+        source: Anything with a `query(sql, **params)` method returning a
+            DataFrame, such as a loader target (default: the app's backend,
+            bypassing the disk result cache)
+        table (str): Table to scan, as `source` expects it in SQL
+
+    Returns:
+        pd.DataFrame: Rows ordered by company and date, with UTC dates
+    """
+    query = f"""
+        SELECT
+            company,
+            DATE(date) AS date,
+            CAST(open AS FLOAT64) AS open,
+            CAST(high AS FLOAT64) AS high,
+            CAST(low AS FLOAT64) AS low,
+            CAST(close AS FLOAT64) AS close,
+            CAST(volume AS FLOAT64) AS volume
+        FROM {table}
+        WHERE DATE(date) > @watermark
+        ORDER BY company, DATE(date)
+        """
+    df = (source or uncached(get_backend())).query(query, watermark=watermark)
+    if df.empty:
+        return pd.DataFrame(columns=['company', 'date', *PRICE_METRICS])
+    df['date'] = pd.to_datetime(df['date'], utc=True)
+    return df
+
+def _delta_frame(shape, rows):
+    # New rows in the layout of a cached row-level frame, or None for shapes
+    # that cannot be extended by appending
+    if shape == ('daily_rows',):
+        return rows
+    if shape == ('avg_metrics', 'daily'):
+        daily = rows.groupby(['company', 'date'], as_index=False)[PRICE_METRICS].mean()
+        return daily.rename(columns={m: f"avg_{m}" for m in PRICE_METRICS})
+    if shape[0] == 'data':
+        _, metric, _, chart_type, resolution = shape
+        if chart_type in ('Line', 'Area'):
+            return rows[['company', 'date', metric]]
+        if chart_type == 'Candlestick' and resolution == 'daily':
+            return rows[['company', 'date', *OHLC_COLUMNS]]
+    return None
+
+def extend_cached_frames(rows, old_watermark, new_watermark):
+    """
+    Merge new rows into the cached results they change.
+
+    Entries whose range reaches the old watermark are the only ones new
+    rows can affect. Row-level frames get the rows for their companies and
+    range appended, and those ending on the old watermark grow to the new
+    one, so the default "up to the latest day" view stays a cache hit.
+    Smoothed series recompute only their trailing window (see
+    `smoothing.extend_smoothed`). Aggregates over the range are dropped;
+    they are answered again from the merged rollups and sketches.
+
+    Args:
+        rows (pd.DataFrame): New daily rows, all dated after `old_watermark`
+        old_watermark (date): Last day before the new rows
+        new_watermark (date): Last day of the new rows
+
+    Returns:
+        tuple: (entries extended, entries affected)
+    """
+    affected = result_cache.entries_reaching(old_watermark)
+    extended = 0
+    # Raw series first: smoothed entries are recomputed from them
+    for shape, companies, start, end, frame, sliceable in sorted(affected, key=lambda entry: entry[0][0] == 'smoothed'):
+        result_cache.discard(shape, companies, start, end)
+        new_end = new_watermark if end == old_watermark else end
+        if shape[0] == 'smoothed':
+            _, metric, agg, chart_type, window, method = shape
+            raw = result_cache.get(('data', metric, agg, chart_type, None), companies, start, new_end)
+            frame = extend_smoothed(raw, frame, metric, window, method) if raw is not None else None
+        else:
+            delta = _delta_frame(shape, rows) if sliceable else None
+            if delta is not None:
+                delta = delta[delta['company'].isin(companies) & delta['date'].dt.date.between(start, new_end)]
+                frame = pd.concat([frame, delta], ignore_index=True).sort_values(
+                    ['company', 'date'], kind='stable', ignore_index=True
+                )
+            else:
+                frame = None
+        if frame is not None:
+            result_cache.put(shape, companies, start, new_end, frame, sliceable)
+            extended += 1
+    return extended, len(affected)
+
+@traced('apply_delta')
+def apply_delta(rows, old_watermark, new_watermark, sketches_saved=False):
+    """
+    Merge new daily rows into every in-memory structure derived from the table.
+
+    Args:
+        rows (pd.DataFrame): Rows dated after `old_watermark`, from `fetch_rows_since`
+        old_watermark (date): Last day the structures already cover
+        new_watermark (date): Last day of the new rows
+        sketches_saved (bool): Whether the sketch file already includes the
+            rows (the loader merges them), so it only needs re-reading
+    """
+    extended, affected = extend_cached_frames(rows, old_watermark, new_watermark)
+    monthly_rollup.merge_rows(rows)
+    if sketches_saved:
+        monthly_sketches.invalidate()
+    else:
+        monthly_sketches.merge_rows(rows)
+    extend_volume_index(rows)
+    extend_price_store(rows)
+    annotate(rows=len(rows), extended=extended, affected=affected)
+    logger.info(
+        f"Merged {len(rows)} rows after {old_watermark} (through {new_watermark}); "
+        f"extended {extended} of {affected} affected cached results"
+    )
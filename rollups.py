@@ -0,0 +1,245 @@
+import datetime
+import threading
+import pandas as pd
+from backends import get_backend
+from cache import result_cache
+from config import STOCK_TABLE, logger
+from instrumentation import traced
+
+# Columns summarised in the monthly rollup cube
+ROLLUP_METRICS = ['open', 'high', 'low', 'close', 'volume']
+
+# Column order of the Quick Stats table
+STATS_COLUMNS = ['company', 'avg_open', 'avg_close', 'avg_high', 'avg_low', 'avg_volume']
+
+def _partials_sql():
+    return ",\n".join(
+        f"COUNT({m}) AS count_{m}, "
+        f"SUM(CAST({m} AS FLOAT64)) AS sum_{m}, "
+        f"MIN(CAST({m} AS FLOAT64)) AS min_{m}, "
+        f"MAX(CAST({m} AS FLOAT64)) AS max_{m}"
+        for m in ROLLUP_METRICS
+    )
+
+class MonthlyRollup:
+    """
+    Per-company, per-month partial aggregates (count, sum, min, max) of the
+    OHLCV columns.
+
+    A range aggregate combines the partials of every calendar month fully
+    inside the range with one small query over the daily rows of the (at
+    most two) partial months at its edges, so a full-range request reads
+    roughly companies x months rows instead of every trading day.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._cube = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        return self._backend or get_backend()
+
+    def cube(self):
+        """
+        Return the rollup cube, building it on first use.
+
+        Returns:
+            pd.DataFrame: One row per company and month with partial aggregates
+        """
+        with self._lock:
+            if self._cube is None:
+                self._cube = self._build()
+            return self._cube
+
+    def invalidate(self):
+        """
+        Drop the cube so the next request rebuilds it, e.g. after a data load.
+        """
+        with self._lock:
+            self._cube = None
+
+    @traced('rollup_build')
+    def _build(self):
+        logger.info("Building monthly rollup cube")
+        query = f"""
+            SELECT
+                company,
+                DATE_TRUNC(DATE(date), MONTH) AS month,
+                {_partials_sql()}
+            FROM {STOCK_TABLE}
+            GROUP BY company, month
+            ORDER BY company, month
+            """
+        cube = self.backend.query(query)
+        cube['month'] = pd.to_datetime(cube['month'])
+        return cube
+
+    def merge_rows(self, rows):
+        """
+        Fold newly loaded daily rows into the cube, if it has been built.
+
+        Only the months the rows fall in change; the backend is not queried.
+
+        Args:
+            rows (pd.DataFrame): New rows with `company`, `date` and the
+                `ROLLUP_METRICS` columns
+        """
+        with self._lock:
+            if self._cube is None or rows.empty:
+                return
+            months = pd.to_datetime(rows['date']).dt.tz_localize(None).dt.to_period('M').dt.to_timestamp()
+            grouped = rows.groupby([rows['company'], months.rename('month')])
+            partials = grouped.agg(**{
+                f"{part}_{m}": (m, func)
+                for m in ROLLUP_METRICS
+                for part, func in (('count', 'count'), ('sum', 'sum'), ('min', 'min'), ('max', 'max'))
+            }).reset_index()
+            combined = pd.concat([self._cube, partials], ignore_index=True)
+            self._cube = combined.groupby(['company', 'month'], as_index=False).agg(_combine_spec())[self._cube.columns]
+
+    def aggregate(self, selected_companies, start_date, end_date):
+        """
+        Compute count/sum/min/max partials per company over a date range.
+
+        Args:
+            selected_companies (list): List of companies
+            start_date (date): Start date for data
+            end_date (date): End date for data
+
+        Returns:
+            pd.DataFrame: One row per company with rows in the range
+        """
+        first_full, last_full = _full_month_span(start_date, end_date)
+        parts = []
+        edges = []
+
+        if first_full is None:
+            edges.append((start_date, end_date))
+        else:
+            cube = self.cube()
+            months = cube[
+                cube['company'].isin(selected_companies)
+                & cube['month'].between(pd.Timestamp(first_full), pd.Timestamp(last_full))
+            ]
+            parts.append(months.drop(columns='month'))
+            if start_date < first_full:
+                edges.append((start_date, first_full - datetime.timedelta(days=1)))
+            if end_date > _month_end(last_full):
+                edges.append((_month_end(last_full) + datetime.timedelta(days=1), end_date))
+
+        if edges:
+            parts.append(self._edge_partials(selected_companies, edges))
+
+        combined = pd.concat(parts, ignore_index=True)
+        result = combined.groupby('company', as_index=False).agg(_combine_spec())
+        return result[result[[f"count_{m}" for m in ROLLUP_METRICS]].sum(axis=1) > 0].reset_index(drop=True)
+
+    def _edge_partials(self, selected_companies, edges):
+        conditions = " OR ".join(
+            f"DATE(date) BETWEEN @edge{i}_start AND @edge{i}_end" for i in range(len(edges))
+        )
+        params = {}
+        for i, (edge_start, edge_end) in enumerate(edges):
+            params[f"edge{i}_start"] = edge_start
+            params[f"edge{i}_end"] = edge_end
+
+        query = f"""
+            SELECT
+                company,
+                {_partials_sql()}
+            FROM {STOCK_TABLE}
+            WHERE company IN UNNEST(@companies)
+            AND ({conditions})
+            GROUP BY company
+            """
+        return self.backend.query(query, companies=list(selected_companies), **params)
+
+def _combine_spec():
+    """
+    Return the groupby aggregation that combines partials of the same key.
+    """
+    spec = {}
+    for m in ROLLUP_METRICS:
+        spec.update({f"count_{m}": 'sum', f"sum_{m}": 'sum', f"min_{m}": 'min', f"max_{m}": 'max'})
+    return spec
+
+def _month_end(month_start):
+    next_month = (month_start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return next_month - datetime.timedelta(days=1)
+
+def _full_month_span(start_date, end_date):
+    """
+    Return the first and last month starts fully inside [start_date, end_date],
+    or (None, None) when the range covers no complete month.
+    """
+    first_full = start_date if start_date.day == 1 else _month_end(start_date) + datetime.timedelta(days=1)
+    last_full = end_date.replace(day=1)
+    if _month_end(end_date) != end_date:
+        last_full = (last_full - datetime.timedelta(days=1)).replace(day=1)
+    if first_full > last_full:
+        return None, None
+    return first_full, last_full
+
+# Process-wide rollup shared by every Streamlit session
+monthly_rollup = MonthlyRollup()
+
+@traced('fetch_range_partials')
+def fetch_range_partials(selected_companies, start_date, end_date):
+    """
+    Fetch per-company range partials from the rollup, via the result cache.
+
+    Args:
+        selected_companies (list): List of companies
+        start_date (date): Start date for data
+        end_date (date): End date for data
+
+    Returns:
+        pd.DataFrame: Count/sum/min/max partials per company, empty on failure
+    """
+    shape = ('range_partials',)
+    cached = result_cache.get(shape, selected_companies, start_date, end_date)
+    if cached is not None:
+        return cached
+
+    logger.info(f"Fetching rollup aggregates: companies={selected_companies}, range={start_date}..{end_date}")
+    try:
+        df = monthly_rollup.aggregate(selected_companies, start_date, end_date)
+        result_cache.put(shape, selected_companies, start_date, end_date, df)
+        return df
+    except Exception as e:
+        logger.error(f"Rollup aggregate failed: {e}")
+        return pd.DataFrame()
+
+def partials_to_averages(partials):
+    """
+    Turn range partials into the `avg_<metric>` frame used by the Bar charts.
+
+    Args:
+        partials (pd.DataFrame): Output of `fetch_range_partials`
+
+    Returns:
+        pd.DataFrame: Average stock metrics per company
+    """
+    df = partials[['company']].copy()
+    for m in ['open', 'high', 'close', 'low', 'volume']:
+        df[f"avg_{m}"] = partials[f"sum_{m}"] / partials[f"count_{m}"]
+    return df
+
+def partials_to_metric(partials, metric, aggregation_method):
+    """
+    Turn range partials into the Bar main chart frame for one metric.
+
+    Args:
+        partials (pd.DataFrame): Output of `fetch_range_partials`
+        metric (str): Stock metric (open/close/high/low/volume)
+        aggregation_method (str): 'AVG' or 'SUM'
+
+    Returns:
+        pd.DataFrame: Aggregated metric per company
+    """
+    values = partials[f"sum_{metric}"]
+    if aggregation_method == 'AVG':
+        values = values / partials[f"count_{metric}"]
+    return pd.DataFrame({'company': partials['company'], metric: values})
@@ -1,7 +1,8 @@
 import streamlit as st
 import pandas as pd
-from database import get_companies
 from config import logger
+from smoothing import SMOOTHING_METHODS
+from visualization import BAND_AGGREGATIONS
 
 def create_company_selector(all_companies):
     """
@@ -29,22 +30,36 @@ def create_company_selector(all_companies):
     
     return selected_companies or all_companies
 
-def create_date_range_selector():
+def create_date_range_selector(bounds=None):
     """
     Create date range sidebar control.
     
+    Args:
+        bounds (tuple): First and last trading day of the selected companies
+            (from the company catalog); defaults to 2018-2023
+    
     Returns:
         tuple: Start and end dates
     """
+    first_date, last_date = bounds or (pd.to_datetime('2018-01-01').date(), pd.to_datetime('2023-12-31').date())
+
+    # The bounds are part of the widget's identity, so a new default would reset
+    # the range whenever they change; keep the current one, clamped to them
+    current = st.session_state.get('date_range') or ()
+    if current and current[0] <= last_date and current[-1] >= first_date:
+        selection = [min(max(day, first_date), last_date) for day in current]
+    else:
+        selection = [first_date, last_date]
     date_range = st.sidebar.date_input(
         "Date Range",
-        value=[pd.to_datetime('2018-01-01').date(), pd.to_datetime('2023-12-31').date()],
-        min_value=pd.to_datetime('2018-01-01').date(),
-        max_value=pd.to_datetime('2023-12-31').date(),
+        value=selection,
+        min_value=first_date,
+        max_value=last_date,
         key="date_range",
+        help=f"Data available from {first_date} to {last_date}",
         on_change=lambda: logger.info(f"Date range changed: {st.session_state.date_range}")
     )
-    return date_range if len(date_range) == 2 else (pd.to_datetime('2018-01-01').date(), pd.to_datetime('2023-12-31').date())
+    return date_range if len(date_range) == 2 else (first_date, last_date)
 
 def create_metric_controls():
     """
@@ -108,4 +123,57 @@ def create_metric_controls():
             on_change=lambda: logger.info(f"Smoothing window changed: {st.session_state.smooth_slider}")
         ) if use_smoothing else 7
     
-    return selected_metric, chart_type, aggregation_method, use_smoothing, window_size
\ No newline at end of file
+    return selected_metric, chart_type, aggregation_method, use_smoothing, window_size
+
+def create_smoothing_options(chart_type, use_smoothing):
+    """
+    Create sidebar controls for the smoothing method and overlaid windows.
+    
+    Args:
+        chart_type (str): Selected chart type
+        use_smoothing (bool): Whether smoothing is enabled
+    
+    Returns:
+        tuple: Smoothing method and extra window sizes to overlay
+    """
+    if not use_smoothing:
+        return 'sma', ()
+    
+    smoothing_method = st.sidebar.selectbox(
+        "Smoothing Method",
+        SMOOTHING_METHODS.keys(),
+        format_func=lambda x: SMOOTHING_METHODS[x],
+        key="smooth_method",
+        on_change=lambda: logger.info(f"Smoothing method changed: {st.session_state.smooth_method}")
+    )
+    
+    # Stacked Area charts cannot overlay several versions of a series
+    overlay = st.sidebar.multiselect(
+        "Overlay Windows (Days)",
+        [5, 10, 20, 30, 50, 100],
+        key="smooth_overlay",
+        help="Draw extra smoothing windows on the same chart"
+    ) if chart_type == 'Line' else []
+    
+    return smoothing_method, tuple(overlay)
+
+def create_band_toggle(chart_type, aggregation_method):
+    """
+    Create the sidebar toggle for the P10-P90 band around the main chart.
+    
+    Args:
+        chart_type (str): Selected chart type
+        aggregation_method (str): Selected aggregation method
+    
+    Returns:
+        bool: Whether to draw the band
+    """
+    if chart_type not in ('Bar', 'Line') or aggregation_method not in BAND_AGGREGATIONS:
+        return False
+    
+    return st.sidebar.checkbox(
+        "Show P10-P90 Band",
+        key="band_checkbox",
+        help="Where the middle 80% of daily values fall, from the quantile sketches",
+        on_change=lambda: logger.info(f"Percentile band toggled: {st.session_state.band_checkbox}")
+    )
@@ -0,0 +1,169 @@
+import math
+import struct
+import numpy as np
+
+class KLLSketch:
+    """
+    Mergeable streaming quantile sketch (Karnin, Lang & Liberty, 2016).
+
+    Values are kept in a stack of compactors; when a level overflows it is
+    sorted and every other item is promoted to the next level with double
+    weight. Memory stays around `3 * k` values however many are added, and
+    sketches built over separate chunks or partitions merge into a sketch of
+    the union.
+
+    Error bound: with the default k=200, a returned quantile's rank is
+    within about 1.65% of the requested rank with 99% confidence (the error
+    scales roughly as 1/k).
+    """
+
+    def __init__(self, k=200, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.compactors = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(int(math.ceil(self.k * self.c ** depth)), 2)
+
+    def update(self, values):
+        """
+        Add a batch of values; NaNs are ignored.
+
+        Args:
+            values (array-like): Values to add
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.n += len(values)
+        self.compactors[0] = np.concatenate([self.compactors[0], values])
+        self._compress()
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one.
+
+        Args:
+            other (KLLSketch): Sketch to merge
+
+        Returns:
+            KLLSketch: self
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append(np.empty(0))
+        for level, items in enumerate(other.compactors):
+            self.compactors[level] = np.concatenate([self.compactors[level], items])
+        self.n += other.n
+        self._compress()
+        return self
+
+    @classmethod
+    def merge_all(cls, sketches, seed=None):
+        """
+        Merge many sketches in one pass.
+
+        Equivalent to folding them with `merge`, but every level is
+        concatenated first and compacted once.
+
+        Args:
+            sketches (list): Sketches sharing the same `k` and `c`
+            seed (int): Seed for the merged sketch's compactions
+
+        Returns:
+            KLLSketch: Sketch of the union (empty if `sketches` is empty)
+        """
+        sketches = list(sketches)
+        merged = cls(k=sketches[0].k, c=sketches[0].c, seed=seed) if sketches else cls(seed=seed)
+        depth = max((len(sketch.compactors) for sketch in sketches), default=1)
+        merged.compactors = [
+            np.concatenate([sketch.compactors[level] for sketch in sketches if level < len(sketch.compactors)] or [np.empty(0)])
+            for level in range(depth)
+        ]
+        merged.n = sum(sketch.n for sketch in sketches)
+        merged._compress()
+        return merged
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) > self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append(np.empty(0))
+                items = np.sort(self.compactors[level])
+                keep = items[len(items) - len(items) % 2:]
+                items = items[:len(items) - len(items) % 2]
+                promoted = items[self._rng.integers(2)::2]
+                self.compactors[level + 1] = np.concatenate([self.compactors[level + 1], promoted])
+                self.compactors[level] = keep
+            level += 1
+
+    def quantiles(self, qs):
+        """
+        Estimate quantiles of everything added so far.
+
+        Args:
+            qs (array-like): Quantiles in [0, 1]
+
+        Returns:
+            np.ndarray: Estimated values (NaN for an empty sketch)
+        """
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items = np.concatenate(self.compactors)
+        weights = np.concatenate([
+            np.full(len(level_items), 2.0 ** level) for level, level_items in enumerate(self.compactors)
+        ])
+        order = np.argsort(items, kind='stable')
+        items = items[order]
+        cumulative = np.cumsum(weights[order])
+        idx = np.searchsorted(cumulative, qs * cumulative[-1], side='left')
+        return items[np.minimum(idx, len(items) - 1)]
+
+    def quantile(self, q):
+        """
+        Estimate a single quantile.
+
+        Args:
+            q (float): Quantile in [0, 1]
+
+        Returns:
+            float: Estimated value
+        """
+        return float(self.quantiles([q])[0])
+
+    def to_bytes(self):
+        """
+        Serialize the sketch.
+
+        Returns:
+            bytes: Compact binary representation
+        """
+        header = struct.pack('<IdQI', self.k, self.c, self.n, len(self.compactors))
+        sizes = struct.pack(f"<{len(self.compactors)}I", *(len(items) for items in self.compactors))
+        return header + sizes + np.concatenate(self.compactors).astype('<f8').tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Restore a sketch serialized with `to_bytes`.
+
+        Args:
+            data (bytes): Serialized sketch
+
+        Returns:
+            KLLSketch: Restored sketch
+        """
+        k, c, n, levels = struct.unpack_from('<IdQI', data)
+        offset = struct.calcsize('<IdQI')
+        sizes = struct.unpack_from(f"<{levels}I", data, offset)
+        offset += 4 * levels
+        values = np.frombuffer(data, dtype='<f8', offset=offset)
+        sketch = cls(k=k, c=c)
+        sketch.n = n
+        sketch.compactors = list(np.split(values.astype(np.float64), np.cumsum(sizes)[:-1]))
+        return sketch
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+# Moving averages offered by the sidebar
+SMOOTHING_METHODS = {
+    'sma': 'Simple',
+    'ema': 'Exponential',
+    'centred': 'Centred'
+}
+
+# Keeps the exponential weights of one block within float64 range
+_MAX_EXPONENT = 600.0
+
+def _group_bounds(groups):
+    """
+    Return the start and stop position of each row's group.
+
+    Args:
+        groups (np.ndarray): Group labels, each group contiguous
+
+    Returns:
+        tuple: (starts, stops) arrays, one entry per row
+    """
+    n = len(groups)
+    if n == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    boundaries = np.flatnonzero(groups[1:] != groups[:-1]) + 1
+    group_starts = np.concatenate([[0], boundaries])
+    group_stops = np.concatenate([boundaries, [n]])
+    lengths = group_stops - group_starts
+    return np.repeat(group_starts, lengths), np.repeat(group_stops, lengths)
+
+def _window_means(values, lo, hi):
+    """
+    Mean of values[lo:hi] for every row, from one cumulative sum.
+    """
+    csum = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    return (csum[hi] - csum[lo]) / (hi - lo)
+
+def simple_moving_average(values, groups, window):
+    """
+    Trailing moving average over the last `window` rows of each group.
+
+    Matches `AVG(...) OVER (PARTITION BY company ORDER BY date ROWS
+    BETWEEN window - 1 PRECEDING AND CURRENT ROW)`: the first rows of a
+    group average whatever is available.
+
+    Args:
+        values (np.ndarray): Values ordered by group and date
+        groups (np.ndarray): Group label per row, each group contiguous
+        window (int): Window length in rows
+
+    Returns:
+        np.ndarray: Smoothed values
+    """
+    starts, _ = _group_bounds(groups)
+    positions = np.arange(len(values))
+    return _window_means(values, np.maximum(positions - window + 1, starts), positions + 1)
+
+def centred_moving_average(values, groups, window):
+    """
+    Moving average over a window centred on each row, shrinking at the
+    start and end of each group.
+
+    Args:
+        values (np.ndarray): Values ordered by group and date
+        groups (np.ndarray): Group label per row, each group contiguous
+        window (int): Window length in rows
+
+    Returns:
+        np.ndarray: Smoothed values
+    """
+    starts, stops = _group_bounds(groups)
+    positions = np.arange(len(values))
+    before = window // 2
+    after = window - 1 - before
+    return _window_means(values, np.maximum(positions - before, starts), np.minimum(positions + after + 1, stops))
+
+def exponential_moving_average(values, groups, window):
+    """
+    Exponentially weighted moving average with span `window`.
+
+    Same as pandas `ewm(span=window, adjust=True).mean()` per group: each
+    row is a ratio of two cumulative sums of exponentially scaled values,
+    computed in blocks short enough that the scale factors cannot overflow.
+
+    Args:
+        values (np.ndarray): Values ordered by group and date
+        groups (np.ndarray): Group label per row, each group contiguous
+        window (int): Span of the weights, in rows
+
+    Returns:
+        np.ndarray: Smoothed values
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty_like(values)
+    decay = 1 - 2 / (window + 1)
+    if decay <= 0:
+        result[:] = values
+        return result
+    log_decay = np.log(decay)
+    block = max(int(_MAX_EXPONENT / -log_decay), 1)
+
+    starts, stops = _group_bounds(groups)
+    for start in np.unique(starts):
+        stop = stops[start]
+        numerator = denominator = 0.0
+        for block_start in range(start, stop, block):
+            chunk = values[block_start:min(block_start + block, stop)]
+            steps = np.arange(len(chunk))
+            # Weight of row k at row t is decay ** (t - k)
+            growth = np.exp(-log_decay * steps)
+            carry = np.exp(log_decay * (steps + 1))
+            nums = numerator * carry + np.cumsum(chunk * growth) / growth
+            dens = denominator * carry + np.cumsum(growth) / growth
+            result[block_start:block_start + len(chunk)] = nums / dens
+            numerator, denominator = nums[-1], dens[-1]
+    return result
+
+_KERNELS = {
+    'sma': simple_moving_average,
+    'ema': exponential_moving_average,
+    'centred': centred_moving_average
+}
+
+def smooth(df, metric, window, method='sma', by='company'):
+    """
+    Smooth one metric of a frame ordered by `by` and date.
+
+    Args:
+        df (pd.DataFrame): Daily series, ordered by `by` then date
+        metric (str): Column to smooth
+        window (int): Window length in rows
+        method (str): One of `SMOOTHING_METHODS`
+
+    Returns:
+        pd.Series: Smoothed values aligned with `df`
+    """
+    if method not in _KERNELS:
+        raise ValueError(f"Unknown smoothing method: {method}")
+    if window <= 1 or df.empty:
+        return df[metric].astype('float64')
+    smoothed = _KERNELS[method](df[metric].to_numpy(dtype=np.float64), df[by].to_numpy(), window)
+    return pd.Series(smoothed, index=df.index, name=metric)
+
+def overlay_windows(df, metric, windows, method='sma', by='company'):
+    """
+    Smooth a series with several window sizes for one overlaid chart.
+
+    Args:
+        df (pd.DataFrame): Daily series, ordered by `by` then date
+        metric (str): Column to smooth
+        windows (list): Window lengths in rows
+        method (str): One of `SMOOTHING_METHODS`
+
+    Returns:
+        pd.DataFrame: Rows of `df` repeated per window, with a `window` label
+            column ('7 days', ...) and the smoothed metric
+    """
+    frames = [
+        df.assign(**{metric: smooth(df, metric, window, method, by), 'window': f"{window} days"})
+        for window in windows
+    ]
+    return pd.concat(frames, ignore_index=True) if frames else df.assign(window=pd.Series(dtype=object))
+
+def extend_smoothed(df, previous, metric, window, method='sma', by='company'):
+    """
+    Smooth a series that grew by new rows at the end of its groups,
+    recomputing only the rows the new values affect.
+
+    Trailing averages ('sma', 'ema') change only on the new rows, the
+    centred average also on the last `window // 2` rows before them; every
+    other row keeps its value from `previous`. The exponential average
+    resumes from each group's last smoothed value and row count.
+
+    Args:
+        df (pd.DataFrame): Full series, ordered by `by` then date, whose
+            groups end with the new rows
+        previous (pd.DataFrame): `smooth` result for `df` without its new
+            rows, in the same order
+        metric (str): Column to smooth
+        window (int): Window length in rows
+        method (str): One of `SMOOTHING_METHODS`
+
+    Returns:
+        pd.DataFrame: `df` with `metric` smoothed
+    """
+    if method not in _KERNELS:
+        raise ValueError(f"Unknown smoothing method: {method}")
+    values = df[metric].to_numpy(dtype=np.float64)
+    if window <= 1 or df.empty:
+        return df.assign(**{metric: values})
+
+    groups = df[by].to_numpy()
+    starts, stops = _group_bounds(groups)
+    positions = np.arange(len(values))
+    previous_counts = previous.groupby(by, sort=False).size()
+    kept = pd.Series(groups).map(previous_counts).fillna(0).to_numpy(dtype=np.int64)
+    is_new = positions - starts >= kept
+
+    result = np.empty_like(values)
+    result[~is_new] = previous[metric].to_numpy(dtype=np.float64)
+
+    if method == 'ema':
+        decay = 1 - 2 / (window + 1)
+        for row in np.flatnonzero(is_new):
+            seen = row - starts[row]
+            if seen == 0:
+                result[row] = values[row]
+                continue
+            # With adjust=True the weights of `seen` rows sum to (1 - decay ** seen) / (1 - decay)
+            weight = (1 - decay ** seen) / (1 - decay) if decay > 0 else 1.0
+            numerator = decay * result[row - 1] * weight + values[row]
+            result[row] = numerator / (decay * weight + 1)
+        return df.assign(**{metric: result})
+
+    before = window - 1 if method == 'sma' else window // 2
+    after = 0 if method == 'sma' else window - 1 - before
+    affected = is_new.copy()
+    if after:
+        # Rows whose centred window reaches into the new rows
+        first_new = starts + kept
+        affected |= (positions >= first_new - after) & (first_new < stops)
+    rows = np.flatnonzero(affected)
+    if len(rows):
+        lo = np.maximum(rows - before, starts[rows])
+        hi = np.minimum(rows + after + 1, stops[rows])
+        # Gather each affected row's window directly: O(affected rows x window)
+        index = lo[:, None] + np.arange(before + after + 1)
+        inside = index < hi[:, None]
+        windows = np.where(inside, values[np.minimum(index, len(values) - 1)], 0.0)
+        result[rows] = windows.sum(axis=1) / (hi - lo)
+    return df.assign(**{metric: result})
@@ -0,0 +1,45 @@
+import threading
+from backends import get_backend
+from config import PRICE_STORE, logger
+from instrumentation import span
+from orchestrator import submit_fetches
+from price_store import get_price_store
+from quantile_sketches import monthly_sketches
+from rollups import monthly_rollup
+from volume_index import get_volume_index
+
+def warm_up():
+    """
+    Pay the one-off startup costs before the first page needs them.
+
+    Imports plotly, connects the query backend, builds the shared monthly
+    rollup cube and volume index (and the price store, when enabled) and
+    reads the quantile sketch file, if one has been built.
+    """
+    with span('warm_up'):
+        import plotly.express  # noqa: F401
+        get_backend()
+        monthly_rollup.cube()
+        monthly_sketches.frame()
+        get_volume_index()
+        if PRICE_STORE:
+            get_price_store()
+    logger.info("Warm-up complete")
+
+_warm_up = None
+_warm_up_lock = threading.Lock()
+
+def start_warm_up():
+    """
+    Run `warm_up` once per process, in the background.
+
+    Later calls, from any rerun or session, return the same future.
+
+    Returns:
+        Future: Resolves once warm-up has finished (or failed)
+    """
+    global _warm_up
+    with _warm_up_lock:
+        if _warm_up is None:
+            _warm_up = submit_fetches({'warm_up': (warm_up,)}, fallbacks={'warm_up': None})['warm_up']
+    return _warm_up
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+def company_names(n_companies):
+    """
+    Build deterministic ticker-like company names.
+
+    Args:
+        n_companies (int): Number of names
+
+    Returns:
+        list: Sorted names such as 'AAA', 'AAB', ...
+    """
+    letters = np.array(list('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+    index = np.arange(n_companies)
+    return [''.join(letters[[i // 676 % 26, i // 26 % 26, i % 26]]) for i in index]
+
+def generate_stock_details(n_companies=50, years=5, start_date='2018-11-29', seed=0):
+    """
+    Generate seeded OHLCV data shaped like the `stock_details` table.
+
+    Prices follow a geometric random walk per company with consistent
+    open/high/low/close values; volumes are log-normal.
+
+    Args:
+        n_companies (int): Number of companies
+        years (int): Number of years of business days
+        start_date (str): First trading day
+        seed (int): Random seed
+
+    Returns:
+        pd.DataFrame: Cleaned-format rows (date, open, high, low, close,
+            volume, dividends, stock_splits, company)
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range(start_date, periods=int(years * 252), tz='UTC')
+    n_days = len(days)
+
+    start_prices = rng.lognormal(4, 1, size=(n_companies, 1))
+    returns = rng.normal(0.0003, 0.02, size=(n_companies, n_days))
+    close = start_prices * np.exp(np.cumsum(returns, axis=1))
+    open_ = np.concatenate([start_prices, close[:, :-1]], axis=1) * np.exp(rng.normal(0, 0.005, size=close.shape))
+    spread = np.abs(rng.normal(0, 0.01, size=close.shape))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.lognormal(14, 1, size=close.shape).astype(np.int64)
+
+    return pd.DataFrame({
+        'date': np.tile(days, n_companies),
+        'open': open_.ravel(),
+        'high': high.ravel(),
+        'low': low.ravel(),
+        'close': close.ravel(),
+        'volume': volume.ravel(),
+        'dividends': 0.0,
+        'stock_splits': 0.0,
+        'company': np.repeat(company_names(n_companies), n_days)
+    })
+
+def to_raw_format(df):
+    """
+    Convert generated rows to the layout of the raw Kaggle CSV read by Cleaning.py.
+
+    Args:
+        df (pd.DataFrame): Output of `generate_stock_details`
+
+    Returns:
+        pd.DataFrame: Rows with raw column names and string dates
+    """
+    raw = df.copy()
+    raw['date'] = raw['date'].dt.tz_convert('America/New_York').dt.strftime('%Y-%m-%d %H:%M:%S%z')
+    return raw.rename(columns={
+        'date': 'Date', 'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close',
+        'volume': 'Volume', 'dividends': 'Dividends', 'stock_splits': 'Stock Splits', 'company': 'Company'
+    })
@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the app's log and caches out of the working tree; set before config is imported
+_scratch = tempfile.mkdtemp(prefix='stock_tests_')
+os.environ.setdefault('STOCK_LOG_PATH', os.path.join(_scratch, 'stock_explorer.log'))
+os.environ.setdefault('STOCK_DISK_CACHE', '0')
+os.environ.setdefault('STOCK_DISK_CACHE_DIR', os.path.join(_scratch, 'query_cache'))
+os.environ.setdefault('STOCK_WARMUP', '0')
+os.environ.setdefault('STOCK_LOAD_MARKER', os.path.join(_scratch, 'last_load'))
+os.environ.setdefault('STOCK_SKETCH_PATH', os.path.join(_scratch, 'sketches.parquet'))
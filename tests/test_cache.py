@@ -0,0 +1,84 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import cache
+from cache import RangeCache
+from instrumentation import result_size
+
+START = datetime.date(2021, 3, 1)
+END = datetime.date(2021, 3, 31)
+SHAPE = ('daily_rows',)
+
+@pytest.fixture
+def rows():
+    days = pd.date_range(START, END, freq='B', tz='UTC')
+    return pd.DataFrame({
+        'date': np.tile(days, 3),
+        'company': np.repeat(['AAA', 'AAB', 'AAC'], len(days)),
+        'close': np.arange(3 * len(days), dtype='float64')
+    })
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+def test_exact_hit_returns_the_stored_rows(rows):
+    results = RangeCache()
+    results.put(SHAPE, ['AAA', 'AAB', 'AAC'], START, END, rows)
+
+    pd.testing.assert_frame_equal(results.get(SHAPE, ['AAC', 'AAB', 'AAA'], START, END), rows)
+    assert results.get(('other',), ['AAA', 'AAB', 'AAC'], START, END) is None
+    assert results.stats()['hits'] == 1
+
+def test_superset_is_sliced_only_when_sliceable(rows):
+    results = RangeCache()
+    results.put(SHAPE, ['AAA', 'AAB', 'AAC'], START, END, rows, sliceable=True)
+    start, end = datetime.date(2021, 3, 10), datetime.date(2021, 3, 20)
+
+    sliced = results.get(SHAPE, ['AAB'], start, end)
+    expected = rows[
+        (rows['company'] == 'AAB')
+        & rows['date'].between(pd.Timestamp(start, tz='UTC'), pd.Timestamp(end, tz='UTC'))
+    ].reset_index(drop=True)
+    pd.testing.assert_frame_equal(sliced, expected)
+    assert results.stats()['subsumed_hits'] == 1
+
+    # A wider range or a company outside the entry is a miss
+    assert results.get(SHAPE, ['AAB'], START, datetime.date(2021, 4, 30)) is None
+    assert results.get(SHAPE, ['AAD'], start, end) is None
+
+    aggregates = RangeCache()
+    aggregates.put(SHAPE, ['AAA', 'AAB', 'AAC'], START, END, rows)
+    assert aggregates.get(SHAPE, ['AAB'], start, end) is None
+
+def test_least_recently_used_entries_are_evicted_by_bytes(rows):
+    _, nbytes = result_size(rows)
+    results = RangeCache(max_bytes=2 * nbytes)
+    for company in ['AAA', 'AAB']:
+        results.put(SHAPE, [company], START, END, rows)
+    results.get(SHAPE, ['AAA'], START, END)
+    results.put(SHAPE, ['AAC'], START, END, rows)
+
+    assert results.get(SHAPE, ['AAB'], START, END) is None
+    assert results.get(SHAPE, ['AAA'], START, END) is not None
+    assert results.stats()['bytes'] == 2 * nbytes
+    assert results.stats()['evictions'] == 1
+
+    # A result larger than the whole cache is never stored
+    small = RangeCache(max_bytes=nbytes - 1)
+    small.put(SHAPE, ['AAA'], START, END, rows)
+    assert small.stats()['entries'] == 0
+
+def test_entries_expire_after_the_ttl(rows, clock):
+    results = RangeCache(ttl_seconds=60)
+    results.put(SHAPE, ['AAA'], START, END, rows)
+
+    clock[0] += 60
+    assert results.get(SHAPE, ['AAA'], START, END) is not None
+    clock[0] += 1
+    assert results.get(SHAPE, ['AAA'], START, END) is None
+    assert results.stats()['entries'] == 0
+    assert results.stats()['bytes'] == 0
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+from Cleaning import clean_dataframe, clean_streaming
+
+@pytest.fixture
+def raw_csv(tmp_path):
+    # Two companies over a DST change (mixed UTC offsets), with values far
+    # from the IQR fences, one outlier, a missing value and repeated rows
+    rng = np.random.default_rng(0)
+    days = pd.bdate_range('2021-03-01', periods=40, tz='America/New_York')
+    rows = pd.DataFrame({
+        'Date': np.tile(days.strftime('%Y-%m-%d %H:%M:%S%z'), 2),
+        'Open': rng.uniform(10, 20, 80),
+        'Close': rng.uniform(10, 20, 80),
+        'Volume': rng.integers(1000, 2000, 80),
+        'Company': np.repeat(['AAA', 'AAB'], 40)
+    })
+    rows.loc[5, 'Close'] = 1000.0
+    rows.loc[9, 'Open'] = np.nan
+    rows = pd.concat([rows, rows.iloc[[3, 3, 50, 70]], rows.iloc[:2]], ignore_index=True)
+    path = tmp_path / 'raw.csv'
+    rows.to_csv(path, index=False)
+    return path
+
+@pytest.mark.parametrize('chunksize', [7, 1000])
+def test_streaming_matches_in_memory_cleaning(raw_csv, tmp_path, capsys, chunksize):
+    output_path = tmp_path / 'cleaned.parquet'
+    rows_written = clean_streaming(str(raw_csv), str(output_path), chunksize, 'parquet')
+
+    expected = clean_dataframe(pd.read_csv(raw_csv)).reset_index(drop=True)
+    assert rows_written == len(expected) == 80 - 2
+    pd.testing.assert_frame_equal(pd.read_parquet(output_path), expected)
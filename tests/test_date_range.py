@@ -0,0 +1,37 @@
+import datetime
+from streamlit.testing.v1 import AppTest
+
+APP = '''
+import datetime
+import streamlit as st
+from sidebar_controls import create_date_range_selector
+
+narrow = st.checkbox("Narrow bounds", key="narrow")
+bounds = (datetime.date(2020, 1, 1), datetime.date(2021, 6, 30)) if narrow else (datetime.date(2018, 1, 1), datetime.date(2023, 12, 31))
+st.write(repr(tuple(create_date_range_selector(bounds))))
+'''
+
+def selected(at):
+    return at.markdown[-1].value
+
+def test_range_survives_bound_changes(tmp_path):
+    script = tmp_path / 'app.py'
+    script.write_text(APP)
+    at = AppTest.from_file(str(script)).run()
+    assert selected(at) == repr((datetime.date(2018, 1, 1), datetime.date(2023, 12, 31)))
+
+    at.sidebar.date_input[0].set_value((datetime.date(2019, 3, 1), datetime.date(2020, 9, 1))).run()
+    at.checkbox[0].check().run()
+    assert not at.exception and not at.warning
+    assert selected(at) == repr((datetime.date(2020, 1, 1), datetime.date(2020, 9, 1)))
+
+    at.checkbox[0].uncheck().run()
+    assert selected(at) == repr((datetime.date(2020, 1, 1), datetime.date(2020, 9, 1)))
+
+def test_range_outside_new_bounds_resets(tmp_path):
+    script = tmp_path / 'app.py'
+    script.write_text(APP)
+    at = AppTest.from_file(str(script)).run()
+    at.sidebar.date_input[0].set_value((datetime.date(2022, 3, 1), datetime.date(2022, 9, 1))).run()
+    at.checkbox[0].check().run()
+    assert selected(at) == repr((datetime.date(2020, 1, 1), datetime.date(2021, 6, 30)))
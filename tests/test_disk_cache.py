@@ -0,0 +1,36 @@
+import pandas as pd
+import pytest
+from backends import LocalBackend
+from disk_cache import DiskCachedBackend, DiskResultCache
+
+COUNT = "SELECT COUNT(*) AS n FROM stock_details"
+
+class CountingBackend(LocalBackend):
+    queries = 0
+
+    def query(self, sql, **params):
+        self.queries += 1
+        return super().query(sql, **params)
+
+@pytest.fixture
+def table(tmp_path):
+    path = tmp_path / 'stock_details.parquet'
+    pd.DataFrame({'company': ['AAA', 'AAB'], 'close': [1.0, 2.0]}).to_parquet(path, index=False)
+    return path
+
+def test_repeated_query_is_served_from_disk(table, tmp_path):
+    backend = CountingBackend(str(table))
+    cached = DiskCachedBackend(backend, DiskResultCache(str(tmp_path / 'cache')))
+    assert cached.query(COUNT)['n'][0] == 2
+    assert cached.query(COUNT)['n'][0] == 2
+    assert backend.queries == 1
+
+def test_write_to_table_retires_results(table, tmp_path):
+    backend = CountingBackend(str(table))
+    cached = DiskCachedBackend(backend, DiskResultCache(str(tmp_path / 'cache')), version_seconds=0)
+    assert cached.query(COUNT)['n'][0] == 2
+
+    # Written outside loader.py: no load marker is involved
+    pd.DataFrame({'company': ['AAA', 'AAB', 'AAC'], 'close': [1.0, 2.0, 3.0]}).to_parquet(table, index=False)
+    assert cached.query(COUNT)['n'][0] == 3
+    assert backend.queries == 2
@@ -0,0 +1,112 @@
+import datetime
+import hashlib
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from backends import LocalBackend
+from loader import ParquetDatasetTarget, load_incremental
+from quantile_sketches import monthly_sketches
+
+COMPANIES = ['AAA', 'AAB', 'AAC']
+
+def daily_rows(start, days, close=10.0):
+    dates = pd.date_range(start, periods=days, freq='D', tz='UTC')
+    rng = np.random.default_rng(days)
+    n = len(dates) * len(COMPANIES)
+    return pd.DataFrame({
+        'date': np.tile(dates, len(COMPANIES)),
+        'open': rng.uniform(10, 20, n),
+        'high': rng.uniform(20, 30, n),
+        'low': rng.uniform(1, 10, n),
+        'close': np.full(n, close),
+        'volume': rng.integers(1, 10 ** 6, n),
+        'dividends': 0.0,
+        'stock_splits': 0.0,
+        'company': np.repeat(COMPANIES, len(dates))
+    })
+
+def table_rows(location):
+    return LocalBackend(str(location)).query("SELECT * FROM stock_details ORDER BY company, date")
+
+def digest(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+@pytest.fixture(autouse=True)
+def scratch_sketches(tmp_path, monkeypatch):
+    monkeypatch.setattr(monthly_sketches, 'path', str(tmp_path / 'sketches.parquet'))
+
+@pytest.fixture
+def single_file(tmp_path):
+    path = tmp_path / 'cleaned_data.parquet'
+    daily_rows('2021-01-01', 30).to_parquet(path, index=False)
+    return path
+
+def write_input(tmp_path, rows, name='input.parquet'):
+    path = tmp_path / name
+    rows.to_parquet(path, index=False)
+    return str(path)
+
+def test_append_writes_only_new_rows(tmp_path, single_file):
+    before = digest(single_file)
+    new_rows = daily_rows('2021-01-31', 5)
+    state = load_incremental(write_input(tmp_path, new_rows), ParquetDatasetTarget(str(single_file)))
+
+    assert state['rows_loaded'] == len(new_rows)
+    assert digest(single_file) == before
+    parts = ParquetDatasetTarget(str(single_file)).part_files()[1:]
+    assert sum(pq.ParquetFile(part).metadata.num_rows for part in parts) == len(new_rows)
+    assert len(table_rows(single_file)) == 30 * len(COMPANIES) + len(new_rows)
+
+def test_upsert_rewrites_only_overlapping_files(tmp_path, single_file):
+    before = digest(single_file)
+    load_incremental(write_input(tmp_path, daily_rows('2021-01-31', 5)), ParquetDatasetTarget(str(single_file)))
+    restated = daily_rows('2021-02-02', 3, close=99.0)
+    load_incremental(
+        write_input(tmp_path, restated, 'restated.parquet'), ParquetDatasetTarget(str(single_file)),
+        mode='upsert', lookback_days=10
+    )
+
+    assert digest(single_file) == before
+    rows = table_rows(single_file)
+    assert len(rows) == 35 * len(COMPANIES)
+    assert not rows.duplicated(['company', 'date']).any()
+    restated_days = rows['date'].dt.date.between(datetime.date(2021, 2, 2), datetime.date(2021, 2, 4))
+    assert (rows.loc[restated_days, 'close'] == 99.0).all()
+    assert (rows.loc[~restated_days, 'close'] == 10.0).all()
+
+def test_loading_twice_writes_nothing(tmp_path):
+    location = tmp_path / 'dataset'
+    input_path = write_input(tmp_path, daily_rows('2021-01-01', 20))
+    first = load_incremental(input_path, ParquetDatasetTarget(str(location)), batch_size=25)
+    parts = ParquetDatasetTarget(str(location)).part_files()
+
+    second = load_incremental(input_path, ParquetDatasetTarget(str(location)), batch_size=25)
+    assert first['rows_loaded'] == 60
+    assert second['rows_loaded'] == 0
+    assert ParquetDatasetTarget(str(location)).part_files() == parts
+
+def test_interrupted_load_resumes_without_duplicates(tmp_path, monkeypatch):
+    location = tmp_path / 'dataset'
+    rows = daily_rows('2021-01-01', 20)
+    input_path = write_input(tmp_path, rows)
+    checkpoint = str(tmp_path / 'load.json')
+
+    appended = []
+    original_append = ParquetDatasetTarget.append
+    def failing_append(self, df):
+        if appended:
+            raise RuntimeError("connection lost")
+        appended.append(len(df))
+        original_append(self, df)
+    monkeypatch.setattr(ParquetDatasetTarget, 'append', failing_append)
+    with pytest.raises(RuntimeError):
+        load_incremental(input_path, ParquetDatasetTarget(str(location)), batch_size=25, checkpoint_path=checkpoint)
+    monkeypatch.setattr(ParquetDatasetTarget, 'append', original_append)
+
+    state = load_incremental(input_path, ParquetDatasetTarget(str(location)), batch_size=25, checkpoint_path=checkpoint)
+    assert appended == [25]
+    assert state['rows_loaded'] == len(rows)
+    loaded = table_rows(location)
+    assert len(loaded) == len(rows)
+    assert not loaded.duplicated(['company', 'date']).any()
@@ -0,0 +1,47 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import database
+import price_store
+from backends import LocalBackend
+from cache import result_cache
+
+START = datetime.date(2021, 3, 1)
+END = datetime.date(2021, 3, 31)
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    days = pd.date_range(START, END, freq='B', tz='UTC')
+    rng = np.random.default_rng(0)
+    rows = pd.DataFrame({
+        'date': np.tile(days, 2),
+        'company': np.repeat(['AAA', 'AAB'], len(days)),
+        'open': rng.uniform(10, 20, 2 * len(days)),
+        'high': rng.uniform(20, 30, 2 * len(days)),
+        'low': rng.uniform(1, 10, 2 * len(days)),
+        'close': rng.uniform(10, 20, 2 * len(days)),
+        # Odd volumes above 2**24 have no float32 representation
+        'volume': 2 ** 24 + 2 * rng.integers(0, 10 ** 8, 2 * len(days)) + 1
+    })
+    path = tmp_path / 'stock_details.parquet'
+    rows.to_parquet(path, index=False)
+    backend = LocalBackend(str(path))
+    monkeypatch.setattr(database, 'get_backend', lambda: backend)
+    monkeypatch.setattr(price_store, 'get_backend', lambda: backend)
+    price_store.invalidate_price_store()
+    result_cache.clear()
+    yield backend
+    price_store.invalidate_price_store()
+    result_cache.clear()
+
+def test_store_rows_match_backend_rows(backend, monkeypatch):
+    monkeypatch.setattr(database, 'PRICE_STORE', False)
+    from_backend = database.fetch_daily_rows(['AAA', 'AAB'], START, END)
+    monkeypatch.setattr(database, 'PRICE_STORE', True)
+    from_store = database.fetch_daily_rows(['AAA', 'AAB'], START, END)
+
+    assert (from_store['volume'] > 2 ** 24).all()
+    np.testing.assert_array_equal(from_store['volume'].to_numpy(), from_backend['volume'].to_numpy())
+    assert from_store['volume'].sum() == from_backend['volume'].sum()
+    pd.testing.assert_frame_equal(from_store, from_backend, check_exact=False, rtol=1e-6, check_dtype=False)
@@ -0,0 +1,43 @@
+import datetime
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from backends import LocalBackend
+from quantile_sketches import MonthlySketches
+
+START = datetime.date(2021, 1, 1)
+END = datetime.date(2021, 6, 30)
+
+@pytest.fixture
+def backend(tmp_path):
+    days = pd.date_range(START, END, freq='B', tz='UTC')
+    rng = np.random.default_rng(0)
+    metrics = {m: rng.uniform(10, 20, 2 * len(days)) for m in ['open', 'high', 'low', 'close', 'volume']}
+    rows = pd.DataFrame({'date': np.tile(days, 2), 'company': np.repeat(['AAA', 'AAB'], len(days)), **metrics})
+    path = tmp_path / 'stock_details.parquet'
+    rows.to_parquet(path, index=False)
+    return LocalBackend(str(path))
+
+def test_missing_file_is_not_built(backend, tmp_path):
+    sketches = MonthlySketches(str(tmp_path / 'sketches.parquet'), backend)
+    assert sketches.frame() is None
+    sketches.quantiles(['AAA'], START, END, 'close', (0.5,))
+    sketches.monthly_bands(['AAA'], START, END, 'close')
+    assert not os.path.exists(sketches.path)
+
+def test_sql_fallback_matches_sketches(backend, tmp_path):
+    missing = MonthlySketches(str(tmp_path / 'missing.parquet'), backend)
+    built = MonthlySketches(str(tmp_path / 'sketches.parquet'), backend)
+    built.rebuild()
+    start, end = datetime.date(2021, 2, 10), datetime.date(2021, 5, 20)
+
+    # Ranges this short are answered exactly by the sketches
+    pd.testing.assert_frame_equal(
+        missing.quantiles(['AAA', 'AAB'], start, end, 'close', (0.1, 0.5, 0.9)),
+        built.quantiles(['AAA', 'AAB'], start, end, 'close', (0.1, 0.5, 0.9))
+    )
+    pd.testing.assert_frame_equal(
+        missing.monthly_bands(['AAA', 'AAB'], start, end, 'volume'),
+        built.monthly_bands(['AAA', 'AAB'], start, end, 'volume')
+    )
@@ -0,0 +1,83 @@
+import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import backends
+from backends import LocalBackend, delta_directory
+from cache import result_cache
+from catalog import CompanyCatalog
+from database import fetch_data_from_bigquery
+from price_store import invalidate_price_store
+from quantile_sketches import monthly_sketches
+from rollups import fetch_range_partials, monthly_rollup
+from volume_index import invalidate_volume_index, top_companies_by_volume
+
+COMPANIES = ['AAA', 'AAB', 'AAC']
+START = datetime.date(2021, 1, 1)
+OLD_WATERMARK = datetime.date(2021, 3, 30)
+NEW_WATERMARK = datetime.date(2021, 3, 31)
+
+def daily_rows(first_day, last_day, seed):
+    days = pd.date_range(first_day, last_day, freq='D', tz='UTC')
+    rng = np.random.default_rng(seed)
+    n = len(days) * len(COMPANIES)
+    return pd.DataFrame({
+        'date': np.tile(days, len(COMPANIES)),
+        'company': np.repeat(COMPANIES, len(days)),
+        'open': rng.uniform(10, 20, n),
+        'high': rng.uniform(20, 30, n),
+        'low': rng.uniform(1, 10, n),
+        'close': rng.uniform(10, 20, n),
+        'volume': rng.integers(1, 10 ** 6, n)
+    })
+
+def reset_caches():
+    result_cache.clear()
+    monthly_rollup.invalidate()
+    monthly_sketches.invalidate()
+    invalidate_volume_index()
+    invalidate_price_store()
+
+def page_results(end_date, method):
+    return {
+        'partials': fetch_range_partials(COMPANIES, START, end_date),
+        'top_volume': top_companies_by_volume(START, end_date, 2),
+        'smoothed': fetch_data_from_bigquery(
+            COMPANIES, START, end_date, 'close', 'AVG', 'Line', use_smoothing=True, window_size=5, smoothing_method=method
+        )
+    }
+
+@pytest.fixture
+def table(tmp_path, monkeypatch):
+    path = tmp_path / 'stock_details.parquet'
+    daily_rows(START, OLD_WATERMARK, seed=0).to_parquet(path, index=False)
+    monkeypatch.setattr(backends, '_backend', LocalBackend(str(path)))
+    monkeypatch.setattr(monthly_sketches, 'path', str(tmp_path / 'sketches.parquet'))
+    reset_caches()
+    yield path
+    reset_caches()
+
+@pytest.mark.parametrize('method', ['sma', 'ema', 'centred'])
+def test_one_day_delta_matches_full_rebuild(table, tmp_path, method):
+    catalog = CompanyCatalog(marker_path=str(tmp_path / 'last_load'))
+    catalog.frame()
+    page_results(OLD_WATERMARK, method)
+
+    # One new day, on which the smallest company trades the most
+    delta = daily_rows(NEW_WATERMARK, NEW_WATERMARK, seed=1).assign(volume=[10 ** 9, 1, 1])
+    parts = tmp_path / delta_directory(table.name)
+    parts.mkdir()
+    delta.to_parquet(parts / 'part-0.parquet', index=False)
+
+    assert catalog.refresh() == len(COMPANIES)
+    hits = result_cache.stats()['hits']
+    merged = page_results(NEW_WATERMARK, method)
+    # The smoothed series was extended in the cache, not rebuilt
+    assert result_cache.stats()['hits'] > hits
+
+    reset_caches()
+    rebuilt = page_results(NEW_WATERMARK, method)
+    assert merged['top_volume']['company'].tolist()[0] == 'AAA'
+    for name, frame in rebuilt.items():
+        pd.testing.assert_frame_equal(merged[name], frame, check_dtype=False)
+    pd.testing.assert_frame_equal(catalog.frame(), CompanyCatalog(marker_path=str(tmp_path / 'other')).frame())
@@ -0,0 +1,42 @@
+import pandas as pd
+import pytest
+from rollups import STATS_COLUMNS
+from utils import stats_cursor, stats_page
+
+# Average close per company: exact ties, near-ties below the rounding and distinct values
+CLOSES = {
+    'AAA': 100.0, 'AAB': 100.0, 'AAC': 100.0,
+    'AAD': 100.0 + 1e-9, 'AAE': 100.0 - 1e-9,
+    'AAF': 101.25, 'AAG': 99.5, 'AAH': 101.25 + 4e-10,
+    'AAI': 50.0, 'AAJ': 150.0, 'AAK': 99.5, 'AAL': 100.0
+}
+
+@pytest.fixture
+def stats():
+    rows = pd.DataFrame({'company': list(CLOSES), 'avg_close': list(CLOSES.values())})
+    for column in STATS_COLUMNS:
+        if column not in rows:
+            rows[column] = rows['avg_close']
+    # Shuffled, as the stats of a page are not in any order
+    return rows[STATS_COLUMNS].sample(frac=1, random_state=0)
+
+def _page_through(stats, sort_column, descending, page_size):
+    companies, cursor = [], None
+    while True:
+        page = stats_page(stats, cursor, page_size, sort_column, descending)
+        if page.empty:
+            return companies
+        companies += page['company'].tolist()
+        cursor = stats_cursor(page, sort_column)
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('page_size', [1, 2, 3, 5])
+def test_pages_visit_every_company_once_through_ties(stats, descending, page_size):
+    companies = _page_through(stats, 'avg_close', descending, page_size)
+
+    assert sorted(companies) == sorted(CLOSES)
+    keys = [(round(CLOSES[company], 6), company) for company in companies]
+    assert keys == sorted(keys, reverse=descending)
+
+def test_company_pages_are_unchanged(stats):
+    assert _page_through(stats, 'company', False, 4) == sorted(CLOSES)
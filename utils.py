@@ -1,71 +1,148 @@
 import streamlit as st
 import pandas as pd
-from google.cloud import bigquery
-from config import client
+from rollups import STATS_COLUMNS, fetch_range_partials, partials_to_averages
+from instrumentation import traced
 
-def display_pagination(dataframe, rows_per_page=10):
+# Decimals a stat is rounded to when pages are sorted and seek on it
+STATS_SORT_DECIMALS = 6
+
+def display_pagination(selected_companies, start_date, end_date, stats, rows_per_page=10):
     """
-    Implement pagination for displaying large datasets.
-    
+    Display one page of Quick Stats, selected from the stats by keyset pagination.
+
+    The page number and the seek cursor of every visited page live in
+    `st.session_state`; they reset whenever the filters, sort order or page
+    size change.
+
     Args:
-        dataframe (pd.DataFrame): Data to paginate
+        selected_companies (list): List of companies the stats cover
+        start_date (date): Start date for data
+        end_date (date): End date for data
+        stats (pd.DataFrame): Quick Stats of every company, e.g. from
+            `page_data.fetch_page_data`
         rows_per_page (int): Number of rows to display per page
-    
+
     Returns:
-        pd.DataFrame: Paginated subset of the dataframe
+        pd.DataFrame: Current page of stats, indexed by row number
     """
-    if 'page' not in st.session_state:
+    col1, col2 = st.columns(2)
+    sort_column = col1.selectbox("Sort by", STATS_COLUMNS, key="stats_sort")
+    descending = col2.checkbox("Descending", key="stats_descending")
+
+    signature = (tuple(selected_companies), start_date, end_date, sort_column, descending, rows_per_page)
+    if st.session_state.get('stats_signature') != signature:
+        st.session_state.stats_signature = signature
         st.session_state.page = 1
-    
-    total_rows = len(dataframe)
-    total_pages = (total_rows + rows_per_page - 1) // rows_per_page
-    
-    start_idx = (st.session_state.page - 1) * rows_per_page
-    end_idx = min(start_idx + rows_per_page, total_rows)
-    
-    display_start = start_idx + 1
-    display_end = end_idx
-    
-    st.write(f"Showing rows {display_start} to {display_end} of {total_rows}")
-    
-    paginated_df = dataframe.iloc[start_idx:end_idx].reset_index(drop=True)
+        st.session_state.stats_cursors = [None]
+
+    total_rows = len(stats)
+    total_pages = max((total_rows + rows_per_page - 1) // rows_per_page, 1)
+    cursor = st.session_state.stats_cursors[st.session_state.page - 1]
+    paginated_df = stats_page(stats, cursor, rows_per_page, sort_column, descending)
+    next_cursor = stats_cursor(paginated_df, sort_column)
+
+    display_start = (st.session_state.page - 1) * rows_per_page + 1
+    display_end = display_start + len(paginated_df) - 1
+
+    st.write(f"Showing rows {display_start} to {display_end} of {total_rows} (page {st.session_state.page} of {total_pages})")
+
+    prev_col, next_col = st.columns(2)
+    prev_col.button(
+        "Previous",
+        disabled=st.session_state.page <= 1,
+        on_click=_change_page,
+        args=(-1, None),
+        key="stats_prev"
+    )
+    next_col.button(
+        "Next",
+        disabled=st.session_state.page >= total_pages or next_cursor is None,
+        on_click=_change_page,
+        args=(1, next_cursor),
+        key="stats_next"
+    )
+
+    paginated_df = paginated_df.drop(columns='sort_key', errors='ignore')
     paginated_df.index = pd.RangeIndex(start=display_start, stop=display_end + 1, step=1)
-    
+
     return paginated_df
 
+def _change_page(step, next_cursor):
+    if step > 0:
+        del st.session_state.stats_cursors[st.session_state.page:]
+        st.session_state.stats_cursors.append(next_cursor)
+    st.session_state.page += step
+
+def stats_cursor(page_df, sort_column):
+    """
+    Build the seek cursor that starts the page after `page_df`.
+
+    Args:
+        page_df (pd.DataFrame): A page returned by `stats_page`
+        sort_column (str): Column the page is sorted by
+
+    Returns:
+        tuple | None: (sort value, company) of the last row, or None if empty
+    """
+    if page_df.empty:
+        return None
+    last_row = page_df.iloc[-1]
+    return (last_row['sort_key'] if sort_column != 'company' else last_row['company'], last_row['company'])
+
+def stats_page(stats, cursor=None, page_size=10, sort_column='company', descending=False):
+    """
+    Select one page of aggregate statistics using keyset (seek) pagination.
+
+    Rows are ordered by `sort_column` with `company` as the tie-breaker, and
+    a page starts strictly after the (sort value, company) cursor of the
+    previous page. Stats are compared rounded to `STATS_SORT_DECIMALS`, so
+    companies whose stats differ only in the last bits keep a stable order.
+
+    Args:
+        stats (pd.DataFrame): Quick Stats, one row per company
+        cursor (tuple): (sort value, company) of the previous page's last row
+        page_size (int): Number of rows to return
+        sort_column (str): One of `STATS_COLUMNS`
+        descending (bool): Sort in descending order
+
+    Returns:
+        pd.DataFrame: Aggregate statistics for one page, plus the rounded
+            `sort_key` the page is ordered by unless sorted by company
+    """
+    if sort_column not in STATS_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort_column}")
+
+    if sort_column == 'company':
+        order = ['company']
+    else:
+        stats = stats.assign(sort_key=stats[sort_column].round(STATS_SORT_DECIMALS))
+        order = ['sort_key', 'company']
+    if cursor is not None:
+        after = (lambda column, value: column < value) if descending else (lambda column, value: column > value)
+        if sort_column == 'company':
+            stats = stats[after(stats['company'], cursor[1])]
+        else:
+            stats = stats[
+                after(stats['sort_key'], cursor[0])
+                | ((stats['sort_key'] == cursor[0]) & after(stats['company'], cursor[1]))
+            ]
+    return stats.sort_values(order, ascending=not descending).head(page_size).reset_index(drop=True)
+
+@traced('fetch_stats_data')
 def fetch_stats_data(selected_companies, start_date, end_date):
     """
     Fetch aggregate statistics for selected companies.
-    
+
     Args:
         selected_companies (list): List of companies to fetch stats for
         start_date (date): Start date for data
         end_date (date): End date for data
-    
+
     Returns:
         pd.DataFrame: Aggregate statistics
     """
-    stats_query = """
-    SELECT 
-        company,
-        AVG(open) AS avg_open,
-        AVG(close) AS avg_close,
-        AVG(high) AS avg_high,
-        AVG(low) AS avg_low,
-        AVG(volume) AS avg_volume
-    FROM `lustrous-router-454110-h9.Sandeep01.stock_details`
-    WHERE company IN UNNEST(@companies)
-    AND DATE(date) BETWEEN @start_date AND @end_date
-    GROUP BY company
-    ORDER BY company
-    """
-    
-    job_config = bigquery.QueryJobConfig(
-        query_parameters=[
-            bigquery.ArrayQueryParameter("companies", "STRING", selected_companies),
-            bigquery.ScalarQueryParameter("start_date", "DATE", start_date),
-            bigquery.ScalarQueryParameter("end_date", "DATE", end_date)
-        ]
-    )
-    
-    return client.query(stats_query, job_config=job_config).to_dataframe()
\ No newline at end of file
+    # Served from the monthly rollup cube (see rollups.py)
+    partials = fetch_range_partials(selected_companies, start_date, end_date)
+    if partials.empty:
+        return pd.DataFrame()
+    return partials_to_averages(partials)[STATS_COLUMNS]
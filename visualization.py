@@ -1,8 +1,119 @@
-import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
+from downsampling import downsample_series
+from instrumentation import traced
 
-def plot_main_chart(df, chart_type, selected_metric, aggregation_method, metric_options):
+# Above this many points, Line charts draw with WebGL instead of SVG
+WEBGL_POINT_THRESHOLD = 5000
+
+# Aggregations whose value sits inside the P10-P90 band of the daily values;
+# a total does not, so no band is drawn around it
+BAND_AGGREGATIONS = ('AVG', 'APPROX_QUANTILES')
+
+def prepare_time_series(df, chart_type, metric):
+    """
+    Downsample a Line/Area chart's data and pick its render mode.
+
+    Args:
+        df (pd.DataFrame): Data ordered by company and date
+        chart_type (str): Type of chart (Line, Area)
+        metric (str): Metric to plot
+
+    Returns:
+        tuple: Downsampled data and extra keyword arguments for plotly.express
+    """
+    extra_args = {}
+    if 'window' in df.columns:
+        # Overlaid smoothing windows: one dashed series per company and window
+        df = df.assign(series=df['company'] + ' / ' + df['window'])
+        plot_df = downsample_series(df, 'date', metric, by='series').drop(columns='series')
+        extra_args['line_dash'] = 'window'
+    else:
+        # Area charts stack companies, so every series keeps the same dates
+        plot_df = downsample_series(df, 'date', metric, shared_x=chart_type == 'Area')
+    # px.area has no WebGL mode; its stacked traces need SVG fills
+    if chart_type == 'Line' and len(plot_df) > WEBGL_POINT_THRESHOLD:
+        extra_args['render_mode'] = 'webgl'
+    return plot_df, extra_args
+
+def add_band_traces(fig, bands, low='p10', high='p90'):
+    """
+    Shade a percentile band behind each company's line, in its colour.
+
+    Args:
+        fig (plotly Figure): Line chart with one trace per company
+        bands (pd.DataFrame): `company`, `date` and the `low`/`high` columns
+        low (str): Lower edge column
+        high (str): Upper edge column
+    """
+    import plotly.graph_objects as go
+
+    for trace in list(fig.data):
+        band = bands[bands['company'] == trace.name]
+        if band.empty:
+            continue
+        fig.add_trace(go.Scatter(
+            x=list(band['date']) + list(band['date'][::-1]),
+            y=list(band[high]) + list(band[low][::-1]),
+            fill='toself',
+            fillcolor=trace.line.color,
+            opacity=0.15,
+            line={'width': 0},
+            hoverinfo='skip',
+            legendgroup=trace.legendgroup,
+            showlegend=False,
+            name=f"{trace.name} {low.upper()}-{high.upper()}"
+        ))
+
+def plot_candlesticks(df):
+    """
+    Draw one candlestick trace per company.
+
+    A single company keeps green/red candles; with several, each company's
+    candles take its colour, filled when the bar closed up and hollow when
+    it closed down, and can be toggled from the legend.
+
+    Args:
+        df (pd.DataFrame): `company`, `date` and OHLC columns, e.g. from
+            `ohlc.resample_ohlc`
+
+    Returns:
+        plotly chart object
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    resolution = df.attrs.get('resolution', 'daily')
+    groups = list(df.groupby('company', sort=False))
+    palette = px.colors.qualitative.Plotly
+    fig = go.Figure()
+    for i, (company, bars) in enumerate(groups):
+        if len(groups) == 1:
+            colors = {'increasing_line_color': 'green', 'decreasing_line_color': 'red'}
+        else:
+            color = palette[i % len(palette)]
+            colors = {
+                'increasing_line_color': color,
+                'increasing_fillcolor': color,
+                'decreasing_line_color': color,
+                'decreasing_fillcolor': 'white'
+            }
+        fig.add_trace(go.Candlestick(
+            x=bars['date'],
+            open=bars['open'],
+            high=bars['high'],
+            low=bars['low'],
+            close=bars['close'],
+            name=company,
+            **colors
+        ))
+    fig.update_layout(
+        title=f"Candlestick Chart: {resolution.capitalize()} Bars",
+        template='simple_white',
+        xaxis_rangeslider_visible=False
+    )
+    return fig
+
+@traced('plot_main_chart')
+def plot_main_chart(df, chart_type, selected_metric, aggregation_method, metric_options, bands=None):
     """
     Generate main chart based on selected parameters.
     
@@ -12,11 +123,28 @@ def plot_main_chart(df, chart_type, selected_metric, aggregation_method, metric_
         selected_metric (str): Metric to display
         aggregation_method (str): Aggregation method used
         metric_options (dict): Mapping of metric keys to display names
+        bands (pd.DataFrame): Optional P10/P90 band from
+            `quantile_sketches.fetch_quantile_bands`, drawn as error bars on
+            Bar charts and as shaded monthly bands on Line charts when the
+            aggregation is one of `BAND_AGGREGATIONS`
     
     Returns:
         plotly chart object
     """
+    # plotly is imported on first use; it dominates this module's import time
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    has_bands = bands is not None and not bands.empty and aggregation_method in BAND_AGGREGATIONS
+
     if chart_type == 'Bar':
+        extra_args = {}
+        if has_bands:
+            df = df.merge(bands, on='company', how='left')
+            # Sketched quantiles are approximate; never draw a negative bar
+            df['band_plus'] = (df['p90'] - df[selected_metric]).clip(lower=0)
+            df['band_minus'] = (df[selected_metric] - df['p10']).clip(lower=0)
+            extra_args = {'error_y': 'band_plus', 'error_y_minus': 'band_minus'}
         return px.bar(
             df,
             x='company',
@@ -25,62 +153,92 @@ def plot_main_chart(df, chart_type, selected_metric, aggregation_method, metric_
             title=f"{chart_type} Chart: {aggregation_method} {metric_options[selected_metric]}",
             labels={selected_metric: metric_options[selected_metric]},
             template='simple_white',
-            hover_data={selected_metric: ':.2f'}
+            hover_data={selected_metric: ':.2f'},
+            **extra_args
         )
     
     elif chart_type == 'Candlestick':
-        return go.Figure(data=[go.Candlestick(
-            x=df['date'],
-            open=df['open'],
-            high=df['high'],
-            low=df['low'],
-            close=df['close'],
-            increasing_line_color='green',
-            decreasing_line_color='red',
-            name='Stock Price'
-        )])
+        return plot_candlesticks(df)
     
     elif chart_type in ['Line', 'Area']:
         chart_func = {'Line': px.line, 'Area': px.area}[chart_type]
-        return chart_func(
-            df,
+        plot_df, extra_args = prepare_time_series(df, chart_type, selected_metric)
+        fig = chart_func(
+            plot_df,
             x='date',
             y=selected_metric,
             color='company',
             title=f"{chart_type} Chart: {aggregation_method} {metric_options[selected_metric]}",
             labels={selected_metric: metric_options[selected_metric]},
             template='simple_white',
-            hover_data={selected_metric: ':.2f'}
+            hover_data={selected_metric: ':.2f'},
+            **extra_args
         )
+        # Stacked areas have no per-company level to band around
+        if has_bands and chart_type == 'Line':
+            add_band_traces(fig, bands)
+        return fig
 
-def plot_average_metrics_chart(avg_metrics_df, chart_type, metric, title):
+@traced('plot_average_metrics_subplots')
+def plot_average_metrics_subplots(avg_metrics_df, chart_type, metrics):
     """
-    Generate chart for average metrics.
+    Generate one figure with a row per average metric and a shared x-axis.
     
     Args:
         avg_metrics_df (pd.DataFrame): Average metrics data
-        chart_type (str): Type of chart (Bar, Line, Area)
-        metric (str): Metric to plot
-        title (str): Chart title
+        chart_type (str): Type of chart (Bar, Line, Area; Candlestick pages
+            show their daily averages as lines)
+        metrics (dict): Mapping of `avg_*` columns to row titles
     
     Returns:
         plotly chart object
     """
-    chart_func = {
-        'Bar': px.bar,
-        'Line': px.line,
-        'Area': px.area
-    }[chart_type]
-    
-    x_col = 'company' if chart_type == 'Bar' else 'date'
-    
-    return chart_func(
-        avg_metrics_df,
-        x=x_col,
-        y=metric,
-        color='company',
-        title=f"{chart_type} Chart: {title}",
-        labels={metric: title},
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    if chart_type not in ('Bar', 'Area'):
+        chart_type = 'Line'
+    fig = make_subplots(
+        rows=len(metrics),
+        cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.04,
+        subplot_titles=list(metrics.values())
+    )
+    companies = list(dict.fromkeys(avg_metrics_df['company']))
+    palette = px.colors.qualitative.Plotly
+    colors = {company: palette[i % len(palette)] for i, company in enumerate(companies)}
+
+    for row, (metric, title) in enumerate(metrics.items(), start=1):
+        if chart_type == 'Bar':
+            plot_df, extra_args = avg_metrics_df, {}
+        else:
+            plot_df, extra_args = prepare_time_series(avg_metrics_df, chart_type, metric)
+        scatter = go.Scattergl if extra_args.get('render_mode') == 'webgl' else go.Scatter
+        for company, series in plot_df.groupby('company', sort=False):
+            common = {
+                'name': company,
+                'legendgroup': company,
+                'showlegend': row == 1,
+                'hovertemplate': f"{company}<br>{title}: %{{y:.2f}}<extra></extra>"
+            }
+            if chart_type == 'Bar':
+                trace = go.Bar(x=series['company'], y=series[metric], marker_color=colors[company], **common)
+            elif chart_type == 'Area':
+                trace = go.Scatter(
+                    x=series['date'], y=series[metric], mode='lines', stackgroup=f"row{row}",
+                    line={'color': colors[company]}, **common
+                )
+            else:
+                trace = scatter(x=series['date'], y=series[metric], mode='lines', line={'color': colors[company]}, **common)
+            fig.add_trace(trace, row=row, col=1)
+
+    fig.update_layout(
         template='simple_white',
-        hover_data={metric: ':.2f'}
-    )
\ No newline at end of file
+        height=220 * len(metrics),
+        barmode='relative',
+        title=f"{chart_type} Chart: Average Metrics",
+        legend_title_text='company'
+    )
+    return fig
@@ -0,0 +1,181 @@
+import datetime
+import heapq
+import threading
+import numpy as np
+import pandas as pd
+from backends import get_backend
+from config import STOCK_TABLE, logger
+from instrumentation import traced
+
+EPOCH = datetime.date(1970, 1, 1)
+
+class VolumeIndex:
+    """
+    Prefix sums of daily trading volume per company.
+
+    Rows are sorted by (company code, day) and addressed by the combined
+    int64 key `(code << 32) + day`, so the total volume of every company
+    over any [start, end] range is two vectorised binary searches and one
+    subtraction of the cumulative sums; the backend is never touched.
+    """
+
+    def __init__(self, companies, keys, cumulative):
+        self.companies = companies
+        self.keys = keys
+        self.cumulative = cumulative
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Build the index from daily volumes.
+
+        Args:
+            df (pd.DataFrame): `company`, `date` and `volume` columns
+
+        Returns:
+            VolumeIndex: The index
+        """
+        days = pd.to_datetime(df['date']).to_numpy().astype('datetime64[D]').astype(np.int64)
+        codes, companies = pd.factorize(df['company'], sort=True)
+        keys = (codes.astype(np.int64) << 32) + days
+        order = np.argsort(keys, kind='stable')
+        volumes = df['volume'].to_numpy(dtype=np.float64)[order]
+        return cls(
+            companies=np.asarray(companies, dtype=object),
+            keys=keys[order],
+            cumulative=np.concatenate([[0.0], np.cumsum(volumes)])
+        )
+
+    def extended(self, rows):
+        """
+        Return an index that also covers some new rows, without querying the backend.
+
+        Args:
+            rows (pd.DataFrame): New rows with `company`, `date` and `volume` columns
+
+        Returns:
+            VolumeIndex: Combined index
+        """
+        # Undo `(code << 32) + day`, rounding so that negative days decode too
+        codes = (self.keys + (1 << 31)) >> 32
+        existing = pd.DataFrame({
+            'company': self.companies[codes],
+            'date': (self.keys - (codes << 32)).astype('datetime64[D]'),
+            'volume': np.diff(self.cumulative)
+        })
+        new = pd.DataFrame({
+            'company': rows['company'].to_numpy(),
+            'date': pd.to_datetime(rows['date']).dt.tz_localize(None).to_numpy().astype('datetime64[D]'),
+            'volume': rows['volume'].to_numpy(dtype=np.float64)
+        })
+        return VolumeIndex.from_frame(pd.concat([existing, new], ignore_index=True))
+
+    def totals(self, start_date, end_date):
+        """
+        Total volume of every company between two dates.
+
+        Args:
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
+
+        Returns:
+            tuple: (totals, trading days) arrays aligned with `companies`
+        """
+        codes = np.arange(len(self.companies), dtype=np.int64) << 32
+        lo = np.searchsorted(self.keys, codes + (start_date - EPOCH).days, side='left')
+        hi = np.searchsorted(self.keys, codes + (end_date - EPOCH).days, side='right')
+        return self.cumulative[hi] - self.cumulative[lo], hi - lo
+
+    def top_k(self, start_date, end_date, k=10, selected_companies=None):
+        """
+        Select the companies with the highest total volume in a date range.
+
+        Args:
+            start_date (date): Start date (inclusive)
+            end_date (date): End date (inclusive)
+            k (int): Number of companies to return
+            selected_companies (list): Restrict to these companies, or None for all
+
+        Returns:
+            pd.DataFrame: `company` and `total_volume`, highest first
+        """
+        totals, days = self.totals(start_date, end_date)
+        candidates = np.flatnonzero(days > 0)
+        if selected_companies is not None:
+            candidates = candidates[np.isin(self.companies[candidates], list(selected_companies))]
+        top = heapq.nlargest(k, candidates, key=totals.__getitem__)
+        return pd.DataFrame({
+            'company': self.companies[top] if top else [],
+            'total_volume': totals[top] if top else []
+        })
+
+@traced('volume_index_build')
+def load_volume_index():
+    """
+    Load the daily volume of every company from the backend into a `VolumeIndex`.
+
+    Returns:
+        VolumeIndex: Index over the full table
+    """
+    logger.info("Building volume index")
+    query = f"""
+        SELECT
+            company,
+            DATE(date) AS date,
+            SUM(CAST(volume AS FLOAT64)) AS volume
+        FROM {STOCK_TABLE}
+        GROUP BY company, DATE(date)
+        """
+    return VolumeIndex.from_frame(get_backend().query(query))
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_volume_index():
+    """
+    Return the process-wide volume index, building it on first use.
+
+    Returns:
+        VolumeIndex: Shared index
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_volume_index()
+    return _index
+
+def invalidate_volume_index():
+    """
+    Drop the shared index so the next request rebuilds it, e.g. after a data load.
+    """
+    global _index
+    with _index_lock:
+        _index = None
+
+def extend_volume_index(rows):
+    """
+    Add newly loaded rows to the shared index, if it has been built.
+
+    Args:
+        rows (pd.DataFrame): New daily rows
+    """
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index = _index.extended(rows)
+
+def top_companies_by_volume(start_date, end_date, k=10, selected_companies=None):
+    """
+    Return the top `k` companies by total trading volume over a date range.
+
+    Args:
+        start_date (date): Start date (inclusive)
+        end_date (date): End date (inclusive)
+        k (int): Number of companies
+        selected_companies (list): Restrict to these companies, or None for all
+
+    Returns:
+        pd.DataFrame: `company` and `total_volume`, highest first
+    """
+    return get_volume_index().top_k(start_date, end_date, k, selected_companies)